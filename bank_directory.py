@@ -0,0 +1,179 @@
+"""
+Annuaire local des banques et guichets
+======================================
+Les IBAN français contiennent le code banque et le code guichet du RIB. Ce
+module importe un fichier de référence des guichets (extrait du fichier des
+implantations bancaires de la Banque de France, ou export équivalent) dans
+un index local, puis retrouve nom de la banque, BIC et domiciliation du
+guichet sans appel réseau.
+
+Fichier source : CSV (séparateur ; ou ,) avec en-tête, colonnes
+code_banque, code_guichet, nom_banque, bic et, facultative, domiciliation.
+
+Format de l'index : celui de sirene_index (.idx trié et .dat, ouverts avec
+mmap, recherche dichotomique), en deux parties :
+
+- banques : code banque -> nom, BIC ;
+- guichets : code banque * 100000 + code guichet -> domiciliation, BIC du
+  guichet (vide : celui de la banque).
+
+L'ouverture ne lit que les métadonnées ; sa durée est comparée à
+BANK_DIRECTORY_LOAD_BUDGET (millisecondes) et signalée si elle le dépasse.
+
+Usage:
+    python bank_directory.py --source guichets.csv --out data/bank_directory
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sirene_index import MappedIndex, build_index
+
+BANK_DIRECTORY_DIR = os.getenv("BANK_DIRECTORY_DIR")
+# Durée maximale attendue pour l'ouverture de l'annuaire (démarrage à froid)
+BANK_DIRECTORY_LOAD_BUDGET = float(os.getenv("BANK_DIRECTORY_LOAD_BUDGET", "50"))
+
+SOURCE_COLUMNS = ["code_banque", "code_guichet", "nom_banque", "bic"]
+
+# ============ IMPORT ============
+
+def _read_header(path: str, line: str) -> Tuple[str, List[str]]:
+    """Séparateur et colonnes de l'en-tête (guillemets et BOM tolérés), ValueError explicite sinon"""
+    if not line.strip():
+        raise ValueError(f"{path} : fichier source vide ou sans en-tête")
+    delimiter = ";" if line.count(";") > line.count(",") else ","
+    columns = [c.strip().lower() for c in next(csv.reader([line.lstrip("\ufeff")], delimiter=delimiter))]
+    duplicated = sorted({c for c in columns if c and columns.count(c) > 1})
+    if duplicated:
+        raise ValueError(f"{path} : colonnes en double dans l'en-tête: {', '.join(duplicated)}")
+    missing = [c for c in SOURCE_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(
+            f"{path} : colonnes absentes de l'en-tête: {', '.join(missing)} "
+            f"(attendu: {', '.join(SOURCE_COLUMNS)}, séparateur ; ou ,)"
+        )
+    return delimiter, columns
+
+def _read_source(path: str) -> Iterator[Dict[str, str]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        delimiter, columns = _read_header(path, f.readline())
+        required = max(columns.index(c) for c in SOURCE_COLUMNS) + 1
+        reader = csv.reader(f, delimiter=delimiter)
+        for row in reader:
+            if not any(v.strip() for v in row):
+                continue
+            if len(row) < required:
+                raise ValueError(f"{path}, ligne {reader.line_num + 1} : {len(row)} champs, {required} attendus au moins")
+            yield {c: v.strip() for c, v in zip(columns, row)}
+
+def import_directory(source_path: str, out_dir: str) -> Dict[str, Any]:
+    """Importe le fichier de référence des guichets et écrit les métadonnées de l'index"""
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    banks: Dict[str, List[str]] = {}
+
+    def guichets() -> Iterator[List[str]]:
+        for row in _read_source(source_path):
+            banque, guichet = row["code_banque"].zfill(5), row["code_guichet"].zfill(5)
+            if not (banque.isdigit() and guichet.isdigit()):
+                continue
+            bank = banks.setdefault(banque, [row["nom_banque"], row["bic"]])
+            if not bank[1]:
+                bank[1] = row["bic"]
+            bic = row["bic"] if row["bic"] != bank[1] else ""
+            yield [str(int(banque) * 100000 + int(guichet)), row.get("domiciliation", ""), bic]
+
+    guichet_count = build_index(guichets(), out_dir, "guichets")
+    bank_count = build_index(([code, *bank] for code, bank in sorted(banks.items())), out_dir, "banques")
+    meta = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "byteorder": sys.byteorder,
+        "source": os.path.basename(source_path),
+        "banques": bank_count,
+        "guichets": guichet_count,
+        "seconds": round(time.perf_counter() - start, 2)
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+# ============ RECHERCHE ============
+
+class BankDirectory:
+    """Recherche banque / guichet dans un index construit par import_directory"""
+
+    def __init__(self, path: str):
+        start = time.perf_counter()
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("byteorder", sys.byteorder) != sys.byteorder:
+            raise ValueError("Annuaire bancaire construit sur une machine d'ordre d'octets différent")
+        self._banques = MappedIndex(path, "banques")
+        self._guichets = MappedIndex(path, "guichets")
+        self.load_ms = (time.perf_counter() - start) * 1000
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, code_banque: str, code_guichet: str) -> Optional[Dict[str, Any]]:
+        """
+        Banque et guichet d'un RIB
+
+        Returns:
+            {"nom", "bic", "guichet"} (guichet : domiciliation, None si
+            inconnue), ou None si la banque est absente de l'annuaire
+        """
+        if not (code_banque.isdigit() and code_guichet.isdigit()):
+            self.misses += 1
+            return None
+        bank = self._banques.get(int(code_banque))
+        if bank is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        nom, bic = bank
+        branch = self._guichets.get(int(code_banque) * 100000 + int(code_guichet))
+        return {
+            "nom": nom,
+            "bic": (branch[1] if branch and branch[1] else bic) or None,
+            "guichet": (branch[0] or None) if branch else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "banques": self._banques.count,
+            "guichets": self._guichets.count,
+            "created_at": self.meta.get("created_at"),
+            "load_ms": round(self.load_ms, 3),
+            "load_budget_ms": BANK_DIRECTORY_LOAD_BUDGET,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+_directory: Optional[BankDirectory] = None
+_directory_loaded = False
+
+def get_bank_directory() -> Optional[BankDirectory]:
+    """Annuaire configuré par BANK_DIRECTORY_DIR, ouvert au premier appel (None si absent)"""
+    global _directory, _directory_loaded
+    if not _directory_loaded:
+        _directory_loaded = True
+        if BANK_DIRECTORY_DIR and os.path.exists(os.path.join(BANK_DIRECTORY_DIR, "meta.json")):
+            _directory = BankDirectory(BANK_DIRECTORY_DIR)
+            if _directory.load_ms > BANK_DIRECTORY_LOAD_BUDGET:
+                print(f"Annuaire bancaire ouvert en {_directory.load_ms:.1f} ms "
+                      f"(budget: {BANK_DIRECTORY_LOAD_BUDGET:.0f} ms)")
+    return _directory
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import du fichier des guichets bancaires dans un index local")
+    parser.add_argument("--source", required=True, help="CSV des guichets")
+    parser.add_argument("--out", required=True, help="Répertoire de l'index")
+    args = parser.parse_args()
+
+    print(json.dumps(import_directory(args.source, args.out), indent=2))
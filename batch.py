@@ -0,0 +1,203 @@
+"""
+Moteur de vérification en lot
+=============================
+Traite un lot de documents hétérogènes (SIRET, SIREN, TVA, IBAN) en deux temps :
+
+1. toutes les validations locales (format, Luhn, MOD 97) en une seule passe ;
+2. les appels amont (Sirene, VIES) lancés en parallèle, sous un plafond de
+   concurrence propre au lot et une échéance unique pour l'ensemble du lot ;
+   les recherches Sirene sont regroupées en requêtes multicritères.
+
+Les résultats sont renvoyés dans l'ordre des documents reçus, avec une erreur
+par document le cas échéant.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from validators import (
+    validate_siret,
+    validate_siren,
+    validate_tva_intracommunautaire,
+    validate_iban_fr,
+    get_company_info_from_sirene_async,
+    check_tva_vies_async,
+    error_code,
+    normalize_identifier,
+    SIRENE_BULK_SIZE
+)
+from metrics import record_validation_failure
+
+# Nombre maximal d'appels amont simultanés pour un même lot
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "20"))
+# Durée maximale (secondes) accordée à l'ensemble des appels amont d'un lot
+BATCH_DEADLINE = float(os.getenv("BATCH_DEADLINE", "15"))
+
+BATCH_TIMEOUT_ERROR = "Délai de traitement du lot dépassé pour ce document"
+
+# Une recherche amont : (service, identifiant)
+Lookup = Tuple[str, str]
+
+def failure(error_msg: str, code: Optional[str] = None) -> Dict[str, Any]:
+    """Résultat en échec, avec le code stable du message s'il en a un"""
+    return {"success": False, "data": None, "error": error_msg, "code": code or error_code(error_msg)}
+
+def _rejected(doc_type: str, error_msg: str) -> Tuple[Dict[str, Any], None]:
+    record_validation_failure(doc_type, error_code(error_msg))
+    return failure(error_msg), None
+
+def check_document(
+    doc_type: str,
+    value: str,
+    include_company_data: bool = True,
+    verify_vies: bool = True
+) -> Tuple[Dict[str, Any], Optional[Lookup]]:
+    """
+    Validation locale d'un document
+
+    Comme les endpoints unitaires, les données renvoyées et la recherche
+    amont portent sur la forme normalisée de l'identifiant.
+
+    Returns:
+        (résultat, recherche amont à effectuer ou None)
+    """
+    identifier = normalize_identifier(doc_type, value)
+    if doc_type == "siret":
+        is_valid, error_msg = validate_siret(value)
+        if not is_valid:
+            return _rejected(doc_type, error_msg)
+        data = {"siret": identifier, "format_valid": True}
+        lookup = ("siret", identifier) if include_company_data else None
+        return {"success": True, "data": data, "error": None, "code": None}, lookup
+
+    if doc_type == "siren":
+        is_valid, error_msg = validate_siren(value)
+        if not is_valid:
+            return _rejected(doc_type, error_msg)
+        data = {"siren": identifier, "format_valid": True}
+        lookup = ("siren", identifier) if include_company_data else None
+        return {"success": True, "data": data, "error": None, "code": None}, lookup
+
+    if doc_type == "tva":
+        is_valid, country, error_msg = validate_tva_intracommunautaire(value)
+        if not is_valid:
+            return _rejected(doc_type, error_msg)
+        data = {"numero_tva": identifier, "format_valid": True, "country_code": country}
+        lookup = ("vies", identifier) if verify_vies else None
+        return {"success": True, "data": data, "error": None, "code": None}, lookup
+
+    if doc_type == "iban":
+        is_valid, details, error_msg = validate_iban_fr(value)
+        if not is_valid:
+            return _rejected(doc_type, error_msg)
+        return {"success": True, "data": details, "error": None, "code": None}, None
+
+    error_msg = f"Type de document inconnu: {doc_type}"
+    record_validation_failure("unknown", error_code(error_msg))
+    return failure(error_msg), None
+
+def lookup_call(
+    lookup: Lookup,
+    budgets: Optional[Dict[str, Any]] = None
+) -> Callable[[], Awaitable[Optional[Dict[str, Any]]]]:
+    """
+    Retourne la coroutine amont correspondant à une recherche
+
+    budgets : budgets d'appels par service amont ("sirene", "vies"), optionnels
+    """
+    budgets = budgets or {}
+    service, identifier = lookup
+    if service == "vies":
+        return lambda: check_tva_vies_async(identifier, budget=budgets.get("vies"))
+    return lambda: get_company_info_from_sirene_async(identifier, service, budget=budgets.get("sirene"), bulk=True)
+
+def is_grouped(lookup: Lookup) -> bool:
+    """
+    Recherche regroupée en requêtes Sirene multicritères (voir sirene_batcher)
+
+    Ces recherches ne passent pas par le plafond de concurrence : c'est le
+    regroupement qui borne le nombre de requêtes amont.
+    """
+    return lookup[0] != "vies" and SIRENE_BULK_SIZE > 1
+
+def merge_lookup(result: Dict[str, Any], service: str, payload: Optional[Dict[str, Any]]) -> None:
+    """Ajoute le résultat amont aux données du document, comme les endpoints unitaires"""
+    if service == "vies":
+        result["data"]["vies"] = payload
+    elif payload:
+        result["data"]["company"] = payload
+
+async def run_batch(
+    documents: List[Any],
+    concurrency: int = BATCH_CONCURRENCY,
+    deadline: Optional[float] = BATCH_DEADLINE,
+    budgets: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Vérifie un lot de documents
+
+    Args:
+        documents: objets exposant type, value, include_company_data, verify_vies
+        concurrency: nombre maximal d'appels amont simultanés
+        deadline: durée maximale (secondes) pour l'ensemble des appels amont,
+                  None pour aucune limite
+        budgets: budgets d'appels par service amont (voir lookup_call)
+
+    Returns:
+        Liste des résultats, dans l'ordre des documents
+    """
+    results: List[Dict[str, Any]] = []
+    # Une même recherche demandée plusieurs fois dans le lot n'est faite qu'une fois
+    pending: Dict[Lookup, List[int]] = {}
+
+    # 1. Validations locales, en une passe
+    for index, doc in enumerate(documents):
+        try:
+            result, lookup = check_document(
+                doc.type,
+                doc.value,
+                include_company_data=doc.include_company_data,
+                verify_vies=doc.verify_vies
+            )
+        except Exception as e:
+            result, lookup = failure(str(e)), None
+
+        results.append({"index": index, "type": doc.type, "value": doc.value, **result})
+        if lookup is not None:
+            pending.setdefault(lookup, []).append(index)
+
+    if not pending:
+        return results
+
+    # 2. Appels amont en parallèle, plafonnés et bornés dans le temps
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def bounded(call):
+        async with semaphore:
+            return await call()
+
+    tasks = {}
+    for lookup in pending:
+        call = lookup_call(lookup, budgets)
+        tasks[asyncio.create_task(call() if is_grouped(lookup) else bounded(call))] = lookup
+    done, not_done = await asyncio.wait(tasks, timeout=deadline)
+    for task in not_done:
+        task.cancel()
+
+    for task, lookup in tasks.items():
+        service = lookup[0]
+        for index in pending[lookup]:
+            result = results[index]
+            if task in not_done:
+                result["success"] = False
+                result["error"] = BATCH_TIMEOUT_ERROR
+                result["code"] = "BATCH_TIMEOUT"
+            elif task.exception() is not None:
+                result["success"] = False
+                result["error"] = str(task.exception())
+                result["code"] = "UPSTREAM_ERROR"
+            else:
+                merge_lookup(result, service, task.result())
+
+    return results
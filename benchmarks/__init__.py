@@ -0,0 +1,13 @@
+"""
+Benchmarks DocVerify
+====================
+Scripts de mesure de performance, à lancer depuis la racine du projet :
+
+    python -m benchmarks.bench_sirene_index --rows 20000000
+    python -m benchmarks.bench_bulk_validators --rows 2000000
+    python -m benchmarks.bench_validators
+    python -m benchmarks.bench_load --concurrency 50 --latency 0.05
+
+bench_validators et bench_load acceptent --save/--compare (références JSON,
+voir report.py) ; stubs.py fournit les bouchons INSEE et VIES.
+"""
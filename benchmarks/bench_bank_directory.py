@@ -0,0 +1,95 @@
+"""
+Benchmark de l'annuaire bancaire local
+======================================
+Génère un faux fichier des guichets, l'importe avec bank_directory, puis
+mesure :
+
+- le temps d'import et la taille de l'index ;
+- l'ouverture à froid, comparée au budget BANK_DIRECTORY_LOAD_BUDGET
+  (sortie en erreur s'il est dépassé) ;
+- la latence d'une recherche (moyenne, p50, p99), guichet connu, guichet
+  inconnu d'une banque connue, banque absente.
+
+Usage:
+    python -m benchmarks.bench_bank_directory --banks 400 --branches 100 --workdir /tmp/bank_bench
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import statistics
+import sys
+import time
+
+from bank_directory import BANK_DIRECTORY_LOAD_BUDGET, BankDirectory, import_directory
+
+def generate(workdir: str, banks: int, branches: int) -> str:
+    """Écrit le CSV : banks banques de branches guichets chacune"""
+    path = os.path.join(workdir, "guichets.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["code_banque", "code_guichet", "nom_banque", "bic", "domiciliation"])
+        for b in range(banks):
+            code_banque = f"{10000 + 7 * b:05d}"
+            bic = f"BANKFRPP{b % 1000:03d}"
+            for g in range(branches):
+                writer.writerow([code_banque, f"{10 * g:05d}", f"BANQUE {b}", bic, f"AGENCE {b}-{g}"])
+    return path
+
+def measure_lookups(directory: BankDirectory, banks: int, branches: int, samples: int):
+    rng = random.Random(7)
+    cases = {
+        "guichet connu": [(f"{10000 + 7 * rng.randrange(banks):05d}", f"{10 * rng.randrange(branches):05d}") for _ in range(samples)],
+        "guichet inconnu": [(f"{10000 + 7 * rng.randrange(banks):05d}", f"{10 * rng.randrange(branches) + 1:05d}") for _ in range(samples)],
+        "banque absente": [(f"{10001 + 7 * rng.randrange(banks):05d}", "00010") for _ in range(samples)]
+    }
+    results = {}
+    for label, keys in cases.items():
+        timings = []
+        for banque, guichet in keys:
+            start = time.perf_counter_ns()
+            directory.lookup(banque, guichet)
+            timings.append(time.perf_counter_ns() - start)
+        timings.sort()
+        results[label] = {
+            "mean_us": statistics.fmean(timings) / 1000,
+            "p50_us": timings[len(timings) // 2] / 1000,
+            "p99_us": timings[int(len(timings) * 0.99)] / 1000
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banks", type=int, default=400)
+    parser.add_argument("--branches", type=int, default=100, help="guichets par banque")
+    parser.add_argument("--samples", type=int, default=100_000, help="recherches mesurées")
+    parser.add_argument("--workdir", default="bank_bench")
+    parser.add_argument("--keep", action="store_true", help="conserver les fichiers générés")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    try:
+        source = generate(args.workdir, args.banks, args.branches)
+        out_dir = os.path.join(args.workdir, "index")
+        meta = import_directory(source, out_dir)
+        print(f"Import : {meta['banques']:,} banques, {meta['guichets']:,} guichets en {meta['seconds']:.2f}s")
+
+        size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+        print(f"Taille index : {size / 1e6:,.2f} Mo (CSV source : {os.path.getsize(source) / 1e6:,.2f} Mo)")
+
+        directory = BankDirectory(out_dir)
+        print(f"Ouverture à froid : {directory.load_ms:.2f} ms (budget {BANK_DIRECTORY_LOAD_BUDGET:.0f} ms)")
+
+        for label, r in measure_lookups(directory, args.banks, args.branches, args.samples).items():
+            print(f"Recherche {label:<16}: moyenne {r['mean_us']:.1f} µs, "
+                  f"p50 {r['p50_us']:.1f} µs, p99 {r['p99_us']:.1f} µs")
+        if directory.load_ms > BANK_DIRECTORY_LOAD_BUDGET:
+            sys.exit(1)
+    finally:
+        if not args.keep:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
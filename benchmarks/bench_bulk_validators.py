@@ -0,0 +1,141 @@
+"""
+Benchmark de la validation en masse
+===================================
+1. Vérifie, sur des entrées aléatoires (valides, clé fausse, mauvaise longueur,
+   séparateurs, lettres, chiffres non ASCII...), que bulk_validators renvoie
+   exactement la même validité et le même message que les fonctions unitaires.
+2. Mesure le débit (identifiants/s) de la version vectorisée, comparé à
+   celui des fonctions unitaires actuelles et d'origine
+   (legacy_validators.py). IBAN mesurés avec et sans lettres dans le BBAN,
+   ces derniers (cas courant) passant par la somme pondérée.
+
+Usage:
+    python -m benchmarks.bench_bulk_validators --rows 2000000 --check 200000
+"""
+
+import argparse
+import random
+import string
+import time
+
+from bulk_validators import (
+    validate_siren_bulk,
+    validate_siret_bulk,
+    validate_iban_fr_bulk,
+    error_messages
+)
+from benchmarks import legacy_validators as legacy
+from validators import validate_siren, validate_siret, validate_iban_fr
+
+# Caractères « pièges » : séparateurs retirés, espaces non retirés, chiffres
+# arabes, ligature (majuscule sur deux lettres), retour à la ligne
+NOISE = [" ", "-", "\t", "\n", ".", "٣", "ﬀ", "é", "x"]
+
+def luhn_complete(rng: random.Random, prefix: str) -> str:
+    """Ajoute le chiffre qui rend prefix valide selon Luhn"""
+    for last in "0123456789":
+        candidate = prefix + last
+        total = 0
+        for i, c in enumerate(reversed(candidate)):
+            d = int(c) * (2 if i % 2 else 1)
+            total += d - 9 if d > 9 else d
+        if total % 10 == 0:
+            return candidate
+    raise AssertionError("inatteignable")
+
+def random_siren(rng: random.Random) -> str:
+    return luhn_complete(rng, "".join(rng.choices(string.digits, k=8)))
+
+def random_siret(rng: random.Random) -> str:
+    siren = random_siren(rng)
+    return luhn_complete(rng, siren + "".join(rng.choices(string.digits, k=4)))
+
+def random_iban(rng: random.Random, letters: bool = True) -> str:
+    """IBAN valide : clé RIB (lettres transcodées A=1, B=2, C=3) puis clé IBAN ; BBAN tout en chiffres si not letters"""
+    rib = "".join(rng.choices(string.digits + string.ascii_uppercase[:3] if letters else string.digits, k=21))
+    rib_numeric = rib.translate(str.maketrans("ABC", "123"))
+    bban = f"{rib}{97 - int(rib_numeric + '00') % 97:02d}"
+    numeric = "".join(str(int(c, 36)) for c in bban + "FR00")
+    return f"FR{98 - int(numeric) % 97:02d}{bban}"
+
+def mutate(rng: random.Random, value: str) -> str:
+    """Altère une valeur valide d'une façon tirée au hasard"""
+    kind = rng.randrange(8)
+    if kind == 0:
+        return value
+    if kind == 1:
+        i = rng.randrange(len(value))
+        return value[:i] + rng.choice(string.digits) + value[i + 1:]
+    if kind == 2:
+        return value[:rng.randrange(len(value) + 3)]
+    if kind == 3:
+        return value + "".join(rng.choices(string.digits, k=rng.randint(1, 3)))
+    if kind == 4:
+        i = rng.randrange(len(value) + 1)
+        return value[:i] + rng.choice(NOISE) + value[i:]
+    if kind == 5:
+        return f"  {value.lower()} "
+    if kind == 6:
+        return " ".join(value[i:i + 4] for i in range(0, len(value), 4))
+    return "".join(rng.choices(string.printable + "".join(NOISE), k=rng.randint(0, 30)))
+
+def check(rows: int, seed: int) -> None:
+    """Compare résultats vectorisés et unitaires, élément par élément"""
+    rng = random.Random(seed)
+    cases = [
+        ("siren", "siren", random_siren, validate_siren_bulk, lambda v: validate_siren(v)[1]),
+        ("siret", "siret", random_siret, validate_siret_bulk, lambda v: validate_siret(v)[1]),
+        ("iban", "iban", random_iban, validate_iban_fr_bulk, lambda v: validate_iban_fr(v)[2]),
+        ("iban/chiffres", "iban", lambda r: random_iban(r, letters=False), validate_iban_fr_bulk,
+         lambda v: validate_iban_fr(v)[2])
+    ]
+    for label, kind, generate, bulk, scalar in cases:
+        values = [mutate(rng, generate(rng)) for _ in range(rows)]
+        valid, codes = bulk(values)
+        messages = error_messages(kind, values, codes)
+        for value, ok, message in zip(values, valid.tolist(), messages):
+            expected = scalar(value)
+            if ok != (expected is None) or message != expected:
+                raise AssertionError(f"{label} {value!r}: {message!r} au lieu de {expected!r}")
+        print(f"Vérification {label:<13}: {rows:,} entrées identiques "
+              f"({int(valid.sum()):,} valides)")
+
+def throughput(rows: int, seed: int) -> None:
+    rng = random.Random(seed)
+    cases = [
+        ("siren", random_siren, validate_siren_bulk, validate_siren),
+        ("siret", random_siret, validate_siret_bulk, validate_siret),
+        ("iban", random_iban, validate_iban_fr_bulk, validate_iban_fr),
+        ("iban/chiffres", lambda r: random_iban(r, letters=False), validate_iban_fr_bulk, validate_iban_fr)
+    ]
+    for label, generate, bulk, scalar in cases:
+        sample = [generate(rng) for _ in range(10_000)]
+        values = sample * (rows // len(sample))
+
+        rates = []
+        for func in (scalar, getattr(legacy, scalar.__name__)):
+            start = time.perf_counter()
+            for value in sample:
+                func(value)
+            rates.append(len(sample) / (time.perf_counter() - start))
+
+        start = time.perf_counter()
+        bulk(values)
+        bulk_rate = len(values) / (time.perf_counter() - start)
+
+        print(f"Débit {label:<13}: vectorisé {bulk_rate:>12,.0f}/s, "
+              f"unitaire {rates[0]:>12,.0f}/s (x{bulk_rate / rates[0]:.1f}), "
+              f"unitaire d'origine {rates[1]:>12,.0f}/s (x{bulk_rate / rates[1]:.1f})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000, help="identifiants par mesure de débit")
+    parser.add_argument("--check", type=int, default=200_000, help="entrées comparées par type")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    check(args.check, args.seed)
+    throughput(args.rows, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Générateur de charge en processus
+=================================
+Envoie des requêtes concurrentes à l'application FastAPI à travers son
+interface ASGI (httpx.ASGITransport) : pas de réseau ni de serveur à lancer,
+mais tout le chemin applicatif est mesuré (middlewares, clé API et quotas,
+validation Pydantic, caches, appels amont, sérialisation). INSEE et VIES sont
+remplacés par les bouchons de benchmarks/stubs.py, à latence et taux
+d'erreur configurables.
+
+Chaque scénario envoie --requests requêtes avec --concurrency requêtes en
+vol, sur un jeu de --distinct identifiants valides (les caches mémoire Sirene,
+VIES et réponses sont vidés entre les scénarios) ; débit et p50/p95/p99 sont
+mesurés côté client. Une réponse autre que 2xx, ou 200 avec success=false, est une erreur
+(l'inverse pour les scénarios */invalid, faits d'entrées mal formées).
+
+Usage:
+    python -m benchmarks.bench_load --concurrency 50 --requests 2000 --latency 0.05
+    python -m benchmarks.bench_load --only batch --error-rate 0.02 --save benchmarks/results/load.json
+    python -m benchmarks.bench_load --compare benchmarks/results/load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.bench_bulk_validators import random_iban, random_siren, random_siret
+from benchmarks.bench_validators import french_vat
+from benchmarks.report import Summary, compare, print_table, save_baseline, summarize
+from benchmarks.stubs import StubConfig, stub_http_client
+
+BENCH_KEY = "bench_key"
+
+# Une requête : (méthode, chemin, corps JSON ou octets, en-têtes supplémentaires)
+RequestSpec = Tuple[str, str, object, Dict[str, str]]
+
+class Identifiers:
+    """Jeu d'identifiants valides parcouru au hasard"""
+
+    def __init__(self, rng: random.Random, size: int):
+        self.rng = rng
+        self.sirets = [random_siret(rng) for _ in range(size)]
+        self.sirens = [random_siren(rng) for _ in range(size)]
+        self.tvas = [french_vat(s) for s in self.sirens]
+        self.ibans = [random_iban(rng) for _ in range(size)]
+
+    def pick(self, values: List[str]) -> str:
+        return self.rng.choice(values)
+
+    def document(self) -> Dict[str, str]:
+        kind = self.rng.choice(("siret", "siren", "tva", "iban"))
+        values = {"siret": self.sirets, "siren": self.sirens, "tva": self.tvas, "iban": self.ibans}[kind]
+        return {"type": kind, "value": self.pick(values)}
+
+def scenarios(ids: Identifiers, batch_size: int) -> Dict[str, Callable[[], RequestSpec]]:
+    """Nom du scénario -> fabrique de requêtes"""
+
+    def file_body() -> bytes:
+        lines = ["value,type"] + [f"{d['value']},{d['type']}" for d in (ids.document() for _ in range(batch_size))]
+        return ("\n".join(lines) + "\n").encode()
+
+    return {
+        "siret": lambda: ("POST", "/api/v1/verify/siret", {"siret": ids.pick(ids.sirets)}, {}),
+        "siret/local": lambda: ("POST", "/api/v1/verify/siret", {"siret": ids.pick(ids.sirets), "include_company_data": False}, {}),
+        "siret/invalid": lambda: ("POST", "/api/v1/verify/siret", {"siret": ids.pick(ids.sirets)[:-1]}, {}),
+        "siren": lambda: ("POST", "/api/v1/verify/siren", {"siren": ids.pick(ids.sirens)}, {}),
+        "tva": lambda: ("POST", "/api/v1/verify/tva", {"numero_tva": ids.pick(ids.tvas)}, {}),
+        "iban": lambda: ("POST", "/api/v1/verify/iban", {"iban": ids.pick(ids.ibans)}, {}),
+        "batch": lambda: ("POST", "/api/v1/verify/batch", [ids.document() for _ in range(batch_size)], {}),
+        "file": lambda: ("POST", "/api/v1/verify/file?enrich=true", file_body(), {"Content-Type": "text/csv"}),
+        "jobs": lambda: ("POST", "/api/v1/jobs", [ids.document() for _ in range(batch_size)], {}),
+        "stats": lambda: ("GET", "/api/v1/stats", None, {}),
+        "health": lambda: ("GET", "/health", None, {})
+    }
+
+def _failed(response: httpx.Response, rejected: bool = False) -> bool:
+    """rejected : la requête doit être refusée (success=false, scénarios */invalid)"""
+    if response.status_code >= 300:
+        return True
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        return isinstance(body, dict) and (body.get("success") is False) != rejected
+    return rejected
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    make_request: Callable[[], RequestSpec],
+    total: int,
+    concurrency: int,
+    rejected: bool = False
+) -> Summary:
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, path, body, headers = make_request()
+            headers = {"X-API-Key": BENCH_KEY, **headers}
+            start = time.perf_counter()
+            try:
+                if isinstance(body, bytes):
+                    response = await client.request(method, path, content=body, headers=headers)
+                else:
+                    response = await client.request(method, path, json=body, headers=headers)
+                # Le corps est lu en entier : le streaming NDJSON est mesuré jusqu'à la synthèse
+                failed = _failed(response, rejected)
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+async def run(args: argparse.Namespace) -> Dict[str, Summary]:
+    # Environnement de l'application, à fixer avant son import
+    os.environ["JOBS_WORKERS"] = "0"
+    os.environ["JOBS_DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}"
+
+    import main
+    from response_cache import response_cache
+    from upstream import start_http_client
+    from validators import sirene_cache, vies_cache
+
+    main.API_KEYS[BENCH_KEY] = {
+        "name": "Benchmark", "tier": "premium", "daily_limit": 10**12, "rate_limit": 10**9, "burst": 10**9
+    }
+
+    config = StubConfig(args.latency, args.jitter, args.error_rate, args.not_found_rate, args.seed)
+    # Le client bouchonné est installé avant le démarrage : le lifespan le conserve
+    await start_http_client(stub_http_client(config))
+
+    ids = Identifiers(random.Random(args.seed), args.distinct)
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name, make_request in scenarios(ids, args.batch_size).items():
+                if args.only and not any(name.startswith(prefix) for prefix in args.only.split(",")):
+                    continue
+                sirene_cache.l1.clear()
+                vies_cache.l1.clear()
+                response_cache.cache.l1.clear()
+                calls = dict(config.calls)
+                results[name] = await run_scenario(
+                    client, make_request, args.requests, args.concurrency, rejected=name.endswith("/invalid")
+                )
+                results[name]["upstream_calls"] = sum(config.calls.values()) - sum(calls.values())
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Charge concurrente sur l'API, services amont bouchonnés")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000, help="requêtes par scénario")
+    parser.add_argument("--batch-size", type=int, default=50, help="documents par batch, fichier ou job")
+    parser.add_argument("--distinct", type=int, default=5000, help="identifiants distincts")
+    parser.add_argument("--latency", type=float, default=0.05, help="latence moyenne des bouchons (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="gigue maximale des bouchons (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part d'erreurs 5xx des bouchons")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="part de 404 Sirene / valid=false VIES")
+    parser.add_argument("--only", help="scénarios à lancer (préfixes séparés par des virgules)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="fichier JSON de référence à écrire")
+    parser.add_argument("--compare", help="fichier JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10, help="régression tolérée (0.10 = 10 %%)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+    print("\nAppels amont par scénario : " + json.dumps({k: r["upstream_calls"] for k, r in results.items()}))
+    if args.save:
+        save_baseline(args.save, "load", results, vars(args))
+    if args.compare and not compare(args.compare, results, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
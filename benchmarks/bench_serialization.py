@@ -0,0 +1,157 @@
+"""
+Micro-benchmarks de la sérialisation des réponses
+=================================================
+Coût CPU par réponse et débit en octets des corps JSON / NDJSON, pour des
+réponses réalistes (fiche Sirene, résultat VIES, IBAN, échecs) :
+
+- fastapi : chemin d'origine, la réponse (dictionnaire) est validée contre
+  le response_model de la route puis sérialisée par FastAPI, comme quand
+  l'endpoint renvoie un dictionnaire ; NDJSON : json.dumps par ligne ;
+- fast : FastJSONResponse / dumps_lines (serialization.py), sans modèle.
+
+Chaque scénario est exécuté en --rounds tours de --calls réponses ; la
+latence d'un tour est ramenée à une réponse.
+
+Usage:
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --save benchmarks/results/serialization.json
+    python -m benchmarks.bench_serialization --compare benchmarks/results/serialization.json
+"""
+
+import argparse
+import inspect
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from benchmarks.bench_bulk_validators import random_iban, random_siret
+from benchmarks.bench_validators import french_vat
+from benchmarks.report import Summary, compare, print_table, save_baseline, summarize
+from benchmarks.stubs import _etablissement
+from serialization import FastJSONResponse, api_response, dumps_lines
+
+def sample_results(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    """Résultats de batch variés : SIRET avec fiche, TVA avec VIES, IBAN, échecs"""
+    from validators import _parse_sirene_data, validate_iban_fr
+
+    results = []
+    for index in range(count):
+        kind = ("siret", "tva", "iban", "error")[index % 4]
+        if kind == "siret":
+            value = random_siret(rng)
+            company = _parse_sirene_data({"etablissement": _etablissement(value)}, "siret")
+            data = {"siret": value, "format_valid": True, "company": company}
+        elif kind == "tva":
+            value = french_vat(random_siret(rng)[:9])
+            data = {"numero_tva": value, "format_valid": True, "country_code": "FR", "vies": {
+                "valid": True, "name": f"ENTREPRISE {value[4:]}", "address": "1 RUE DE LA PAIX\n75002 PARIS",
+                "request_date": "2024-01-01+01:00", "checked_at": "VIES"
+            }}
+        elif kind == "iban":
+            value = random_iban(rng)
+            data = validate_iban_fr(value)[1]
+        else:
+            value = "123"
+            results.append({"index": index, "type": "siret", "value": value, "success": False, "data": None,
+                            "error": "Le SIRET doit contenir exactement 14 chiffres", "code": "SIRET_FORMAT"})
+            continue
+        results.append({"index": index, "type": kind, "value": value, "success": True, "data": data, "error": None, "code": None})
+    return results
+
+def scenarios(rng: random.Random) -> Dict[str, tuple]:
+    """Nom du scénario -> (chemin de la route, corps de réponse ou lignes NDJSON)"""
+    results = sample_results(rng, 1000)
+    return {
+        "siret": ("/api/v1/verify/siret", api_response(True, results[0]["data"])),
+        "iban": ("/api/v1/verify/iban", api_response(True, results[2]["data"])),
+        "batch/100": ("/api/v1/verify/batch", {"success": True, "results": results[:100], "total": 100}),
+        "job/1000": ("/api/v1/jobs/{job_id}", {
+            "job_id": "0" * 32, "status": "done", "total": 1000, "processed": 1000,
+            "created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:01:00",
+            "results": results, "offset": 0, "next_offset": None
+        }),
+        "ndjson/1000": (None, results)
+    }
+
+def _run(coroutine) -> Any:
+    """Exécute une coroutine qui ne suspend jamais, sans le coût d'une boucle d'événements"""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError("coroutine suspendue")
+
+def fastapi_renderer(path: str) -> Callable[[Any], bytes]:
+    """Rendu par FastAPI avec le response_model de la route (chemin d'origine)"""
+    import main
+
+    field = next(r.response_field for r in main.app.routes if getattr(r, "path", None) == path)
+    # Les versions récentes de FastAPI sérialisent directement en JSON (dump_json)
+    options = {"dump_json": True} if "dump_json" in inspect.signature(serialize_response).parameters else {}
+
+    def render(payload: Any) -> bytes:
+        content = _run(serialize_response(field=field, response_content=payload, **options))
+        return content if options else JSONResponse(content).body
+
+    return render
+
+def legacy_lines(results: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in results).encode("utf-8")
+
+def measure(render: Callable[[Any], bytes], payload: Any, rounds: int, calls: int) -> Summary:
+    size = len(render(payload))
+    per_call = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(calls):
+            render(payload)
+        per_call.append((time.perf_counter() - t0) / calls)
+    elapsed = sum(per_call) * calls
+    summary = summarize(per_call, elapsed)
+    summary["count"] = rounds * calls
+    summary["throughput"] = rounds * calls / elapsed if elapsed > 0 else 0.0
+    summary["bytes"] = size
+    summary["mb_per_s"] = size * summary["throughput"] / 1e6
+    return summary
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Coût de sérialisation des réponses")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--only", help="ne lancer que les scénarios commençant par ce préfixe")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="fichier JSON de référence à écrire")
+    parser.add_argument("--compare", help="fichier JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10, help="régression tolérée (0.10 = 10 %%)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, (path, payload) in scenarios(random.Random(args.seed)).items():
+        if args.only and not name.startswith(args.only):
+            continue
+        if path is None:
+            legacy, fast = legacy_lines, dumps_lines
+        else:
+            legacy, fast = fastapi_renderer(path), lambda content: FastJSONResponse(content).body
+        # Même contenu JSON par les deux chemins
+        assert json.loads(legacy(payload).splitlines()[0]) == json.loads(fast(payload).splitlines()[0]), name
+        results[f"{name}/fastapi"] = measure(legacy, payload, args.rounds, args.calls)
+        results[f"{name}/fast"] = measure(fast, payload, args.rounds, args.calls)
+
+    print_table(results)
+    print("\nTaille et débit des corps :")
+    for name, r in results.items():
+        print(f"  {name:<22} {r['bytes']:>9,} octets  {r['mb_per_s']:>8.1f} Mo/s")
+    if args.save:
+        save_baseline(args.save, "serialization", results, vars(args))
+    if args.compare and not compare(args.compare, results, args.threshold, latency="p50"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Durées de vie du cache partagé entre processus
+==============================================
+Avec CACHE_BACKEND_URL, un worker qui lit une entrée écrite par un autre la
+recopie dans son cache mémoire : elle doit y expirer à la même date que chez
+l'auteur, pas après la durée par défaut du cache. Le script le vérifie avec
+un fichier SQLite partagé et deux processus neufs :
+
+- l'auteur vérifie deux numéros de TVA auprès du bouchon VIES, l'un valide,
+  l'autre en erreur (fault MS_UNAVAILABLE, VIES_ERROR_TTL court), et
+  recherche un SIRET inconnu (404, SIRENE_NEGATIVE_TTL court) ;
+- le lecteur relit les trois entrées (depuis le backend partagé), puis de
+  nouveau depuis son cache mémoire une fois les durées courtes écoulées.
+
+L'erreur VIES et le 404 doivent avoir disparu chez le lecteur à l'heure
+prévue (sortie en erreur sinon) ; le résultat valide, lui, reste en cache.
+Les durées de lecture (backend partagé, puis mémoire) sont affichées.
+
+Usage:
+    python -m benchmarks.bench_shared_cache
+    python -m benchmarks.bench_shared_cache --ttl 2 --backend redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple
+
+VALID_TVA = "FR40303265045"
+ERROR_TVA = "FR83404833048"
+UNKNOWN_SIRET = "73282932000074"
+
+def _write() -> Dict[str, object]:
+    """Processus auteur : résultats amont mis en cache (valide, erreur, inconnu)"""
+    from benchmarks.stubs import StubConfig, stub_http_client
+    from upstream import close_http_client, start_http_client
+    from validators import check_tva_vies_async, get_company_info_from_sirene_async
+
+    async def run() -> Dict[str, object]:
+        config = StubConfig(latency=0.0, jitter=0.0)
+        await start_http_client(stub_http_client(config))
+        try:
+            valid = await check_tva_vies_async(VALID_TVA)
+            config.error_rate = 1.0
+            error = await check_tva_vies_async(ERROR_TVA)
+            config.error_rate, config.not_found_rate = 0.0, 1.0
+            unknown = await get_company_info_from_sirene_async(UNKNOWN_SIRET, "siret")
+        finally:
+            await close_http_client()
+        return {"valid": valid.get("valid"), "error": error.get("fault"), "unknown": unknown}
+
+    return asyncio.run(run())
+
+def _read(ttl: float) -> Dict[str, Tuple[bool, bool, float, float]]:
+    """
+    Processus lecteur : pour chaque entrée, (trouvée dans le backend partagé,
+    trouvée en mémoire après ttl, durée de la 1re lecture, de la 2e) en ms
+    """
+    from validators import _sirene_cache_key, _vies_cache_key, sirene_cache, vies_cache
+
+    entries = {
+        "vies/valid": (vies_cache, _vies_cache_key(VALID_TVA)),
+        "vies/error": (vies_cache, _vies_cache_key(ERROR_TVA)),
+        "sirene/404": (sirene_cache, _sirene_cache_key(UNKNOWN_SIRET, "siret"))
+    }
+    first = {}
+    for name, (cache, key) in entries.items():
+        start = time.perf_counter()
+        found, _ = cache.get(key)
+        first[name] = (found, (time.perf_counter() - start) * 1000)
+    time.sleep(ttl + 0.5)
+    results = {}
+    for name, (cache, key) in entries.items():
+        cache.backend = None  # relu depuis la seule copie en mémoire
+        start = time.perf_counter()
+        found, _ = cache.get(key)
+        results[name] = (first[name][0], found, first[name][1], (time.perf_counter() - start) * 1000)
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ttl", type=float, default=1.0, help="VIES_ERROR_TTL et SIRENE_NEGATIVE_TTL (s)")
+    parser.add_argument("--backend", help="CACHE_BACKEND_URL (SQLite temporaire par défaut)")
+    args = parser.parse_args()
+
+    backend = args.backend or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cache.db')}"
+    # Hérité par les processus neufs (spawn), qui lisent la configuration à l'import
+    os.environ.update({
+        "CACHE_BACKEND_URL": backend,
+        "VIES_ERROR_TTL": str(args.ttl),
+        "SIRENE_NEGATIVE_TTL": str(args.ttl),
+        "SIRENE_BULK_SIZE": "1",
+        "SIRENE_INDEX_DIR": ""
+    })
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as writer:
+        written = writer.submit(_write).result()
+    with ProcessPoolExecutor(1, mp_context=context) as reader:
+        read = reader.submit(_read, args.ttl).result()
+
+    print(f"Backend : {backend}, durée courte : {args.ttl:g} s")
+    print(f"Écrit : {written}\n")
+    expected = {"vies/valid": True, "vies/error": False, "sirene/404": False}
+    print(f"{'entrée':<12} {'partagée':>9} {'après':>7} {'lecture L2':>11} {'lecture L1':>11}")
+    ok = True
+    for name, (shared, later, first_ms, second_ms) in read.items():
+        print(f"{name:<12} {str(shared):>9} {str(later):>7} {first_ms:>8.3f} ms {second_ms:>8.3f} ms")
+        if not shared or later != expected[name]:
+            ok = False
+    if not ok:
+        print("\nDurée de vie non respectée d'un processus à l'autre")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark de l'index local Sirene
+=================================
+Génère un faux fichier StockUniteLegale et un faux StockEtablissement,
+les importe avec sirene_index, puis mesure :
+
+- le temps d'import (lignes/s) ;
+- la taille de l'index sur disque ;
+- la latence d'une recherche (moyenne, p50, p99), trouvée ou absente.
+
+Usage:
+    python -m benchmarks.bench_sirene_index --rows 20000000 --workdir /tmp/sirene_bench
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import statistics
+import time
+
+from sirene_index import SireneIndex, import_stock_files
+
+UNITE_HEADER = [
+    "siren", "statutDiffusionUniteLegale", "dateCreationUniteLegale", "sigleUniteLegale",
+    "prenom1UniteLegale", "nomUniteLegale", "categorieJuridiqueUniteLegale",
+    "activitePrincipaleUniteLegale", "etatAdministratifUniteLegale", "denominationUniteLegale"
+]
+
+ETAB_HEADER = [
+    "siren", "nic", "siret", "statutDiffusionEtablissement", "dateCreationEtablissement",
+    "numeroVoieEtablissement", "typeVoieEtablissement", "libelleVoieEtablissement",
+    "codePostalEtablissement", "libelleCommuneEtablissement", "etatAdministratifEtablissement",
+    "activitePrincipaleEtablissement"
+]
+
+def generate(workdir: str, rows: int, shuffle: bool):
+    """Écrit les deux CSV : rows unités légales et rows établissements (1 par unité)"""
+    rng = random.Random(42)
+    sirens = range(100000000, 100000000 + 7 * rows, 7)
+    order = list(sirens) if shuffle else sirens
+    if shuffle:
+        rng.shuffle(order)
+
+    unites = os.path.join(workdir, "StockUniteLegale.csv")
+    etabs = os.path.join(workdir, "StockEtablissement.csv")
+    with open(unites, "w", newline="") as fu, open(etabs, "w", newline="") as fe:
+        wu, we = csv.writer(fu), csv.writer(fe)
+        wu.writerow(UNITE_HEADER)
+        we.writerow(ETAB_HEADER)
+        for siren in order:
+            naf = f"{siren % 99:02d}.{siren % 9}{siren % 7}Z"
+            etat = "A" if siren % 5 else "C"
+            wu.writerow([siren, "O", "2001-05-12", "", "", "", "5710", naf, etat, f"SOCIETE {siren}"])
+            we.writerow([siren, "00017", f"{siren}00017", "O", "2001-05-12", str(siren % 200),
+                         "RUE", f"DE LA REPUBLIQUE {siren % 97}", f"{75000 + siren % 20:05d}",
+                         "PARIS", etat, naf])
+    return unites, etabs, sirens
+
+def measure_lookups(index: SireneIndex, sirens, samples: int):
+    rng = random.Random(7)
+    count = len(sirens)
+    found = [str(sirens[rng.randrange(count)]) for _ in range(samples)]
+    missing = [str(sirens[rng.randrange(count)] + 1) for _ in range(samples)]
+
+    results = {}
+    for label, keys, kind, suffix in [
+        ("siren trouvé", found, "siren", ""),
+        ("siret trouvé", found, "siret", "00017"),
+        ("siren absent", missing, "siren", "")
+    ]:
+        timings = []
+        for key in keys:
+            start = time.perf_counter_ns()
+            index.lookup(key + suffix, kind)
+            timings.append(time.perf_counter_ns() - start)
+        timings.sort()
+        results[label] = {
+            "mean_us": statistics.fmean(timings) / 1000,
+            "p50_us": timings[len(timings) // 2] / 1000,
+            "p99_us": timings[int(len(timings) * 0.99)] / 1000
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000_000, help="lignes par fichier stock")
+    parser.add_argument("--samples", type=int, default=100_000, help="recherches mesurées")
+    parser.add_argument("--workdir", default="sirene_bench")
+    parser.add_argument("--shuffle", action="store_true", help="fichiers non triés (tri externe)")
+    parser.add_argument("--keep", action="store_true", help="conserver les fichiers générés")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    try:
+        start = time.perf_counter()
+        unites, etabs, sirens = generate(args.workdir, args.rows, args.shuffle)
+        print(f"Génération : {args.rows:,} lignes x 2 en {time.perf_counter() - start:.1f}s")
+
+        out_dir = os.path.join(args.workdir, "index")
+        meta = import_stock_files(out_dir, unites, etabs)
+        for name in ("siren", "siret"):
+            m = meta[name]
+            print(f"Import {name} : {m['count']:,} lignes en {m['seconds']:.1f}s "
+                  f"({m['count'] / max(m['seconds'], 1e-9):,.0f} lignes/s)")
+
+        size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+        csv_size = os.path.getsize(unites) + os.path.getsize(etabs)
+        print(f"Taille index : {size / 1e6:,.1f} Mo (CSV source : {csv_size / 1e6:,.1f} Mo)")
+
+        start = time.perf_counter()
+        index = SireneIndex(out_dir)
+        print(f"Ouverture index : {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        for label, r in measure_lookups(index, sirens, args.samples).items():
+            print(f"Recherche {label:<13}: moyenne {r['mean_us']:.1f} µs, "
+                  f"p50 {r['p50_us']:.1f} µs, p99 {r['p99_us']:.1f} µs")
+    finally:
+        if not args.keep:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
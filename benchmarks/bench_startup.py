@@ -0,0 +1,147 @@
+"""
+Démarrage à froid
+=================
+Chaque mesure tourne dans un processus Python neuf (LAZY_STARTUP=true, comme
+en serverless) :
+
+- import de main (python -X importtime) : durée totale, comparée au budget
+  --budget (sortie en erreur s'il est dépassé), et paquets les plus coûteux ;
+- modules différés : httpx, le parseur XML, uvicorn et numpy ne doivent
+  pas être chargés par l'import (sortie en erreur sinon) ;
+- première réponse : import, démarrage de l'application (lifespan), puis une
+  requête locale (IBAN) et /openapi.json, avec le schéma précalculé
+  (openapi_schema.py) et sans.
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --budget 600 --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Modules que l'import de main ne doit pas charger (chargés au premier usage)
+DEFERRED_MODULES = ("httpx", "xml.etree.ElementTree", "uvicorn", "numpy", "h2")
+
+# Exécuté dans le processus mesuré : durées (ms) depuis le début du script
+FIRST_RESPONSE = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def call(app, method, path, body=b""):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "server": ("bench", 80), "client": ("127.0.0.1", 1),
+             "headers": [(b"host", b"bench"), (b"content-type", b"application/json"),
+                         (b"x-api-key", b"demo_key_123")]}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+async def run():
+    timings = {"import": (imported - start) * 1000}
+    async with main.app.router.lifespan_context(main.app):
+        timings["startup"] = (time.perf_counter() - start) * 1000
+        assert await call(main.app, "POST", "/api/v1/verify/iban", b'{"iban": "FR7630006000011234567890189"}') == 200
+        timings["first_request"] = (time.perf_counter() - start) * 1000
+        before = time.perf_counter()
+        assert await call(main.app, "GET", "/openapi.json") == 200
+        timings["openapi"] = (time.perf_counter() - before) * 1000
+    timings["deferred_loaded"] = [m for m in sys.argv[1:] if m in sys.modules]
+    print(json.dumps(timings))
+
+asyncio.run(run())
+"""
+
+def _env(**extra: str) -> Dict[str, str]:
+    return {**os.environ, "LAZY_STARTUP": "true", "JOBS_WORKERS": "0",
+            "JOBS_DB_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}", **extra}
+
+def import_profile() -> Tuple[float, Dict[str, float]]:
+    """Durée d'import de main (ms) et temps propre cumulé par paquet de premier niveau"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=_env(), capture_output=True, text=True, check=True
+    )
+    total = 0.0
+    packages: Dict[str, float] = defaultdict(float)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+        if name.rstrip() == " main":
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+def first_response(openapi_file: str) -> Dict[str, object]:
+    completed = subprocess.run(
+        [sys.executable, "-c", FIRST_RESPONSE, *DEFERRED_MODULES],
+        env=_env(OPENAPI_SCHEMA_FILE=openapi_file), capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="processus par mesure (médiane)")
+    parser.add_argument("--budget", type=float, default=700.0, help="durée d'import de main tolérée (ms)")
+    parser.add_argument("--top", type=int, default=10, help="paquets les plus coûteux affichés")
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    total = statistics.median(t for t, _ in profiles)
+    packages: Dict[str, List[float]] = defaultdict(list)
+    for _, per_package in profiles:
+        for name, ms in per_package.items():
+            packages[name].append(ms)
+    print(f"Import de main : {total:.1f} ms (médiane de {args.runs}, budget {args.budget:.0f} ms)")
+    print(f"\nPaquets les plus coûteux (temps propre) :")
+    ranked = sorted(((statistics.median(v), k) for k, v in packages.items()), reverse=True)
+    for ms, name in ranked[:args.top]:
+        print(f"  {name:<24} {ms:>8.1f} ms")
+
+    workdir = tempfile.mkdtemp()
+    schema_file = os.path.join(workdir, "openapi.json")
+    subprocess.run(
+        [sys.executable, "openapi_schema.py", "--out", schema_file],
+        env=_env(), capture_output=True, check=True
+    )
+    deferred_loaded = set()
+    print(f"\n{'schéma OpenAPI':<16} {'import':>10} {'démarrage':>10} {'1re requête':>12} {'/openapi.json':>14}")
+    for label, path in (("précalculé", schema_file), ("généré", os.path.join(workdir, "absent.json"))):
+        runs = [first_response(path) for _ in range(args.runs)]
+        for r in runs:
+            deferred_loaded.update(r["deferred_loaded"])
+        m = {k: statistics.median(r[k] for r in runs) for k in ("import", "startup", "first_request", "openapi")}
+        print(f"{label:<16} {m['import']:>7.1f} ms {m['startup']:>7.1f} ms {m['first_request']:>9.1f} ms {m['openapi']:>11.1f} ms")
+
+    failed = False
+    if deferred_loaded:
+        print(f"\nModules différés chargés au démarrage : {', '.join(sorted(deferred_loaded))}")
+        failed = True
+    if total > args.budget:
+        print(f"\nBudget d'import dépassé : {total:.1f} ms > {args.budget:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Micro-benchmarks des validateurs unitaires
+==========================================
+Mesure validate_luhn, validate_siret, validate_tva_intracommunautaire et
+validate_iban_fr sur des entrées valides et invalides. Chaque scénario est
+exécuté en --rounds tours de --calls appels ; la latence d'un tour est
+ramenée à un appel, et p50/p95/p99 sont calculés sur les tours.
+
+Avec --legacy, les mêmes scénarios sont mesurés sur les validateurs
+d'origine (legacy_validators.py) et le gain est affiché ; --check N vérifie
+d'abord, sur N entrées altérées par type, que les deux versions renvoient
+exactement les mêmes résultats (ou lèvent la même exception). Seules
+exceptions : les numéros de TVA acceptés par la version d'origine peuvent
+désormais être refusés pour leur format national ou leur clé de contrôle
+(vat_numbers.py, voir bench_vat.py), et les IBAN pour leur clé RIB.
+
+Objectif de gain (x5, TARGET_GAIN) : --legacy l'indique pour chaque
+scénario, « sous l'objectif » ou « PLUS LENT » sinon. Aucun chemin n'est
+plus lent qu'à l'origine, mais l'objectif n'est atteint que pour Luhn,
+SIRET (hors longueur fausse) et TVA française (x5 à x6, tva/bad_key à la
+limite). Restent en deçà, mesures de --legacy :
+
+- siret/bad_length (x4 à x4,5) : l'origine refusait déjà vite ;
+- iban/valid (x4 à x4,5) et iban/bad_key (environ x2) : BBAN avec lettres
+  (random_iban), converties pour le MOD 97 ; l'IBAN valide construit en
+  plus son dictionnaire de détails, comme à l'origine ;
+- tva/foreign (x1,2 à x1,3) et iban/bad_country (x1,5) : l'origine ne
+  vérifiait que le code pays ; la TVA étrangère calcule en plus la clé du
+  pays (vat_numbers.py), ce qui exclut x5.
+
+Usage:
+    python -m benchmarks.bench_validators --check 200000 --legacy
+    python -m benchmarks.bench_validators --save benchmarks/results/validators.json
+    python -m benchmarks.bench_validators --compare benchmarks/results/validators.json
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks import legacy_validators as legacy
+from benchmarks.bench_bulk_validators import mutate, random_iban, random_siren, random_siret
+from benchmarks.report import Summary, compare, print_table, save_baseline, summarize
+from validators import (
+    error_code,
+    validate_iban_fr,
+    validate_luhn,
+    validate_siren,
+    validate_siret,
+    validate_tva_intracommunautaire
+)
+
+# Gain de débit visé par rapport aux validateurs d'origine (--legacy)
+TARGET_GAIN = 5
+
+def french_vat(siren: str) -> str:
+    return f"FR{(12 + 3 * (int(siren) % 97)) % 97:02d}{siren}"
+
+def scenarios(rng: random.Random, size: int) -> Dict[str, tuple]:
+    """Nom du scénario -> (fonction, entrées) ; la fonction est aussi cherchée dans legacy par son nom"""
+    sirets = [random_siret(rng) for _ in range(size)]
+    sirens = [random_siren(rng) for _ in range(size)]
+    ibans = [random_iban(rng) for _ in range(size)]
+    return {
+        "luhn/valid": (validate_luhn, sirets),
+        "luhn/invalid": (validate_luhn, [s[:-1] + str((int(s[-1]) + 1) % 10) for s in sirets]),
+        "siret/valid": (validate_siret, sirets),
+        "siret/spaced": (validate_siret, [f"{s[:3]} {s[3:6]} {s[6:9]} {s[9:]}" for s in sirets]),
+        "siret/bad_key": (validate_siret, [s[:-1] + str((int(s[-1]) + 1) % 10) for s in sirets]),
+        "siret/bad_length": (validate_siret, [s[:-2] for s in sirets]),
+        "tva/valid": (validate_tva_intracommunautaire, [french_vat(s) for s in sirens]),
+        "tva/bad_key": (validate_tva_intracommunautaire, [f"FR00{s}" for s in sirens]),
+        "tva/foreign": (validate_tva_intracommunautaire, [f"DE{rng.randrange(10**8, 10**9)}" for _ in range(size)]),
+        "iban/valid": (validate_iban_fr, ibans),
+        "iban/bad_key": (validate_iban_fr, [i[:2] + f"{(int(i[2:4]) + 1) % 100:02d}" + i[4:] for i in ibans]),
+        "iban/bad_country": (validate_iban_fr, ["DE" + i[2:] for i in ibans])
+    }
+
+def measure(func: Callable, inputs: List[str], rounds: int, calls: int) -> Summary:
+    n = len(inputs)
+    per_call = []
+    for r in range(rounds):
+        offset = (r * calls) % n
+        batch = (inputs[offset:] + inputs[:offset])[:calls]
+        t0 = time.perf_counter()
+        for value in batch:
+            func(value)
+        per_call.append((time.perf_counter() - t0) / calls)
+    # Débit calculé sur les seuls appels (hors préparation des tours)
+    elapsed = sum(per_call) * calls
+    summary = summarize(per_call, elapsed)
+    summary["count"] = rounds * calls
+    summary["throughput"] = rounds * calls / elapsed if elapsed > 0 else 0.0
+    return summary
+
+def _outcome(func: Callable, value) -> tuple:
+    try:
+        return ("ok", func(value))
+    except Exception as e:
+        return ("raise", type(e).__name__)
+
+# Refus absents de la version d'origine : règles nationales de TVA, clé RIB
+_STRICTER_CODES = {
+    "tva": ("TVA_CHECKSUM", "TVA_COUNTRY_FORMAT"),
+    "iban": ("IBAN_RIB_KEY",)
+}
+
+# Détails ajoutés depuis la version d'origine
+_ADDED_DETAILS = ("rib_check_valid", "banque")
+
+def _compatible(kind: str, actual: tuple, expected: tuple) -> bool:
+    if actual == expected:
+        return True
+    if kind == "iban" and actual[0] == "ok" and actual[1][0] and expected[0] == "ok" and expected[1][0]:
+        details = {k: v for k, v in actual[1][1].items() if k not in _ADDED_DETAILS}
+        return (True, details, None) == expected[1]
+    if kind not in _STRICTER_CODES or expected[0] != "ok" or actual[0] != "ok" or not expected[1][0]:
+        return False
+    return not actual[1][0] and error_code(actual[1][-1]) in _STRICTER_CODES[kind]
+
+def check(rows: int, seed: int) -> None:
+    """Compare validateurs actuels et d'origine sur des entrées altérées au hasard"""
+    rng = random.Random(seed)
+    cases = [
+        ("luhn", lambda: random_siret(rng), validate_luhn),
+        ("siren", lambda: random_siren(rng), validate_siren),
+        ("siret", lambda: random_siret(rng), validate_siret),
+        ("tva", lambda: french_vat(random_siren(rng)), validate_tva_intracommunautaire),
+        ("tva", lambda: rng.choice(["DE", "EL", "XX", "fr", "IT"]) + str(rng.randrange(10**10)), validate_tva_intracommunautaire),
+        ("iban", lambda: random_iban(rng), validate_iban_fr)
+    ]
+    for kind, generate, func in cases:
+        reference = getattr(legacy, func.__name__)
+        for _ in range(rows):
+            value = mutate(rng, generate())
+            expected = _outcome(reference, value)
+            actual = _outcome(func, value)
+            if not _compatible(kind, actual, expected):
+                raise AssertionError(f"{kind} {value!r}: {actual!r} au lieu de {expected!r}")
+        print(f"Vérification {kind:<5}: {rows:,} entrées conformes")
+    # Entrées non textuelles acceptées par validate_luhn d'origine (str(number))
+    for value in (0, 79927398713, 79927398710, -18):
+        assert _outcome(validate_luhn, value) == _outcome(legacy.validate_luhn, value), value
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks des validateurs unitaires")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--only", help="ne lancer que les scénarios commençant par ce préfixe")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--check", type=int, default=0, help="entrées comparées aux validateurs d'origine, par type")
+    parser.add_argument("--legacy", action="store_true", help="mesurer aussi les validateurs d'origine")
+    parser.add_argument("--save", help="fichier JSON de référence à écrire")
+    parser.add_argument("--compare", help="fichier JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10, help="régression tolérée (0.10 = 10 %%)")
+    args = parser.parse_args()
+
+    if args.check:
+        check(args.check, args.seed)
+
+    rng = random.Random(args.seed)
+    results = {}
+    legacy_results = {}
+    for name, (func, inputs) in scenarios(rng, min(args.calls, 10000)).items():
+        if args.only and not name.startswith(args.only):
+            continue
+        func(inputs[0])
+        results[name] = measure(func, inputs, args.rounds, args.calls)
+        if args.legacy:
+            legacy_results[name] = measure(getattr(legacy, func.__name__), inputs, args.rounds, args.calls)
+
+    print_table(results)
+    if args.legacy:
+        print(f"\nGain par rapport aux validateurs d'origine (débit, objectif x{TARGET_GAIN:g}) :")
+        for name, r in results.items():
+            gain = r["throughput"] / legacy_results[name]["throughput"]
+            status = "" if gain >= TARGET_GAIN else "  sous l'objectif" if gain >= 1 else "  PLUS LENT"
+            print(f"  {name:<18} x{gain:.1f}{status}")
+    if args.save:
+        save_baseline(args.save, "validators", results, vars(args))
+    if args.compare and not compare(args.compare, results, args.threshold, latency="p50"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
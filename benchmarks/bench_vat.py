@@ -0,0 +1,102 @@
+"""
+Micro-benchmark des règles nationales de TVA
+============================================
+Mesure validate_tva_intracommunautaire (format et clé de contrôle de
+chaque État membre, vat_numbers.py) : numéros valides par pays, puis
+numéros de tous pays à clé altérée ou de mauvaise longueur, refusés
+localement au lieu d'un appel VIES.
+
+Usage:
+    python -m benchmarks.bench_vat
+    python -m benchmarks.bench_vat --save benchmarks/results/vat.json
+    python -m benchmarks.bench_vat --compare benchmarks/results/vat.json
+"""
+
+import argparse
+import random
+import string
+import sys
+from typing import Dict, List
+
+from benchmarks.bench_bulk_validators import random_siren
+from benchmarks.bench_validators import french_vat, measure
+from benchmarks.report import compare, print_table, save_baseline
+from validators import validate_tva_intracommunautaire
+from vat_numbers import VAT_RULES
+
+# Gabarits des numéros tirés au hasard (# : chiffre, L : lettre), puis
+# gardés s'ils passent la clé de contrôle du pays
+TEMPLATES = {
+    "AT": "U########", "BE": "0#########", "BG": "#########", "CY": "0#######L",
+    "CZ": "2#######", "DE": "1########", "DK": "1#######", "EE": "10#######",
+    "EL": "#########", "ES": "A#######L", "FI": "########", "HR": "###########",
+    "HU": "########", "IE": "#######L", "IT": "#######01##", "LT": "#######1#",
+    "LU": "########", "LV": "4##########", "MT": "1#######", "NL": "#########B01",
+    "PL": "##########", "PT": "1########", "RO": "1#######", "SE": "##########01",
+    "SI": "1#######", "SK": "2#2#######"
+}
+
+def random_vat(rng: random.Random, country: str) -> str:
+    """Numéro de TVA valide du pays"""
+    if country == "FR":
+        return french_vat(random_siren(rng))
+    check = VAT_RULES[country].check
+    while True:
+        number = "".join(
+            rng.choice(string.digits) if c == "#" else rng.choice("ABCDEFGHIJKLMNOPQRSTUVW") if c == "L" else c
+            for c in TEMPLATES[country]
+        )
+        if check(number):
+            return country + number
+
+def alter_key(value: str) -> str:
+    """Dernier chiffre (ou lettre) changé : clé de contrôle fausse le plus souvent"""
+    last = value[-1]
+    if last.isdigit():
+        return value[:-1] + str((int(last) + 1) % 10)
+    return value[:-1] + ("A" if last != "A" else "B")
+
+def scenarios(rng: random.Random, size: int) -> Dict[str, List[str]]:
+    countries = sorted(VAT_RULES)
+    valid = {country: [random_vat(rng, country) for _ in range(size)] for country in countries}
+    mixed = [valid[rng.choice(countries)][i] for i in range(size)]
+    return {
+        **{f"valid/{country}": values for country, values in valid.items()},
+        "mixed/bad_key": [alter_key(v) for v in mixed],
+        "mixed/bad_length": [v[:-2] for v in mixed]
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Règles nationales de TVA")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--only", help="ne lancer que les scénarios commençant par ce préfixe")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="fichier JSON de référence à écrire")
+    parser.add_argument("--compare", help="fichier JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10, help="régression tolérée (0.10 = 10 %%)")
+    args = parser.parse_args()
+
+    results = {}
+    rejected = {}
+    for name, inputs in scenarios(random.Random(args.seed), min(args.calls, 2000)).items():
+        if args.only and not name.startswith(args.only):
+            continue
+        outcomes = [validate_tva_intracommunautaire(v)[0] for v in inputs]
+        if name.startswith("valid/"):
+            assert all(outcomes), name
+        rejected[name] = outcomes.count(False) / len(outcomes)
+        results[name] = measure(validate_tva_intracommunautaire, inputs, args.rounds, args.calls)
+
+    print_table(results)
+    print("\nPart des numéros refusés localement :")
+    for name, share in rejected.items():
+        if not name.startswith("valid/"):
+            print(f"  {name:<18} {share:.1%}")
+    if args.save:
+        save_baseline(args.save, "vat", results, vars(args))
+    if args.compare and not compare(args.compare, results, args.threshold, latency="p50"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Micro-benchmark de l'encodage et du décodage SOAP VIES
+======================================================
+Compare vies_client (enveloppe pré-encodée, réponse lue en un parcours) à
+l'implémentation d'origine (enveloppe formatée en f-string, réponse parsée
+par ElementTree puis trois recherches .//), sur des réponses enregistrées
+du service : numéros valides et invalides, préfixes d'espace de noms
+différents, entités XML, faults SOAP et page d'erreur d'un proxy.
+
+Avant de mesurer, chaque réponse est décodée par les deux versions et les
+résultats comparés (valid, name, address) ; les faults doivent donner la
+bonne classe d'erreur (réessayable ou refus).
+
+Usage:
+    python -m benchmarks.bench_vies
+    python -m benchmarks.bench_vies --save benchmarks/results/vies.json
+    python -m benchmarks.bench_vies --compare benchmarks/results/vies.json
+"""
+
+import argparse
+import sys
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Optional, Tuple
+
+from benchmarks.bench_validators import measure
+from benchmarks.report import compare, print_table, save_baseline
+from vies_client import REJECTED_FAULTS, RETRYABLE_FAULTS, ViesError, encode_request, parse_response
+
+# (code HTTP, corps) des réponses enregistrées
+RECORDED: Dict[str, Tuple[int, bytes]] = {
+    "valid/fr": (200, b"""<env:Envelope xmlns:env="http://schemas.xmlsoap.org/soap/envelope/"><env:Header/><env:Body><ns2:checkVatResponse xmlns:ns2="urn:ec.europa.eu:taxud:vies:services:checkVat:types"><ns2:countryCode>FR</ns2:countryCode><ns2:vatNumber>40303265045</ns2:vatNumber><ns2:requestDate>2024-03-12+01:00</ns2:requestDate><ns2:valid>true</ns2:valid><ns2:name>SA SODIMAS</ns2:name><ns2:address>11 RUE AMPERE
+26600 PONT DE L ISERE</ns2:address></ns2:checkVatResponse></env:Body></env:Envelope>"""),
+    "valid/de": (200, b"""<env:Envelope xmlns:env="http://schemas.xmlsoap.org/soap/envelope/"><env:Header/><env:Body><ns2:checkVatResponse xmlns:ns2="urn:ec.europa.eu:taxud:vies:services:checkVat:types"><ns2:countryCode>DE</ns2:countryCode><ns2:vatNumber>136695976</ns2:vatNumber><ns2:requestDate>2024-03-12+01:00</ns2:requestDate><ns2:valid>true</ns2:valid><ns2:name>---</ns2:name><ns2:address>---</ns2:address></ns2:checkVatResponse></env:Body></env:Envelope>"""),
+    "valid/entities": (200, b"""<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+  <soap:Body>
+    <checkVatResponse xmlns="urn:ec.europa.eu:taxud:vies:services:checkVat:types">
+      <countryCode>BE</countryCode>
+      <vatNumber>0403170701</vatNumber>
+      <requestDate>2024-03-12+01:00</requestDate>
+      <valid>true</valid>
+      <name>NV BARCO &amp; PARTNERS &#8211; R&amp;D</name>
+      <address>President Kennedypark 35
+8500 Kortrijk</address>
+    </checkVatResponse>
+  </soap:Body>
+</soap:Envelope>"""),
+    "invalid": (200, b"""<env:Envelope xmlns:env="http://schemas.xmlsoap.org/soap/envelope/"><env:Header/><env:Body><ns2:checkVatResponse xmlns:ns2="urn:ec.europa.eu:taxud:vies:services:checkVat:types"><ns2:countryCode>FR</ns2:countryCode><ns2:vatNumber>00000000000</ns2:vatNumber><ns2:requestDate>2024-03-12+01:00</ns2:requestDate><ns2:valid>false</ns2:valid><ns2:name>---</ns2:name><ns2:address>---</ns2:address></ns2:checkVatResponse></env:Body></env:Envelope>"""),
+    "fault/MS_UNAVAILABLE": (500, b"""<env:Envelope xmlns:env="http://schemas.xmlsoap.org/soap/envelope/"><env:Header/><env:Body><env:Fault><faultcode>env:Server</faultcode><faultstring>MS_UNAVAILABLE</faultstring></env:Fault></env:Body></env:Envelope>"""),
+    "fault/MS_MAX_CONCURRENT_REQ": (500, b"""<env:Envelope xmlns:env="http://schemas.xmlsoap.org/soap/envelope/"><env:Header/><env:Body><env:Fault><faultcode>env:Server</faultcode><faultstring>MS_MAX_CONCURRENT_REQ</faultstring></env:Fault></env:Body></env:Envelope>"""),
+    "fault/INVALID_INPUT": (500, b"""<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body><soap:Fault><faultcode>soap:Server</faultcode><faultstring>INVALID_INPUT</faultstring></soap:Fault></soap:Body></soap:Envelope>"""),
+    "proxy/503": (503, b"""<html><head><title>503 Service Unavailable</title></head><body><h1>Service Unavailable</h1></body></html>"""),
+    "proxy/403": (403, b"""<html><head><title>403 Forbidden</title></head><body><h1>Forbidden</h1></body></html>""")
+}
+
+# ============ VERSION D'ORIGINE ============
+
+def legacy_request(numero_tva: str) -> bytes:
+    numero_tva = numero_tva.strip().upper().replace(" ", "")
+    country_code = numero_tva[:2]
+    vat_number = numero_tva[2:]
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
+                  xmlns:urn="urn:ec.europa.eu:taxud:vies:services:checkVat:types">
+    <soapenv:Header/>
+    <soapenv:Body>
+        <urn:checkVat>
+            <urn:countryCode>{country_code}</urn:countryCode>
+            <urn:vatNumber>{vat_number}</urn:vatNumber>
+        </urn:checkVat>
+    </soapenv:Body>
+</soapenv:Envelope>""".encode()
+
+def legacy_parse(status_code: int, content: bytes) -> Optional[Dict[str, Any]]:
+    if status_code == 200:
+        root = ET.fromstring(content)
+        ns = {
+            'soap': 'http://schemas.xmlsoap.org/soap/envelope/',
+            'vies': 'urn:ec.europa.eu:taxud:vies:services:checkVat:types'
+        }
+        valid = root.find('.//vies:valid', ns)
+        name = root.find('.//vies:name', ns)
+        address = root.find('.//vies:address', ns)
+        return {
+            "valid": valid.text == "true" if valid is not None else False,
+            "name": name.text if name is not None else None,
+            "address": address.text if address is not None else None
+        }
+    return None
+
+def parse(response: Tuple[int, bytes]) -> Optional[Dict[str, Any]]:
+    try:
+        return parse_response(*response)
+    except ViesError:
+        return None
+
+# ============ VÉRIFICATION ============
+
+def check() -> bool:
+    ok = True
+    for name, (status, content) in RECORDED.items():
+        try:
+            result = parse_response(status, content)
+        except ViesError as e:
+            known = e.code in RETRYABLE_FAULTS or e.code in REJECTED_FAULTS or e.code.startswith("HTTP_")
+            if not known or e.retryable == (e.code in REJECTED_FAULTS):
+                print(f"  {name}: {type(e).__name__} {e.code} inattendu")
+                ok = False
+            continue
+        legacy = legacy_parse(status, content)
+        if {k: result[k] for k in legacy} != legacy or not result["request_date"]:
+            print(f"  {name}: {result} != {legacy}")
+            ok = False
+    for numero in ("FR40303265045", "DE136695976", "ATU13585627", "NL004495445B01"):
+        if ET.fromstring(encode_request(numero)).find(".//{*}vatNumber").text != numero[2:]:
+            print(f"  requête {numero} incorrecte")
+            ok = False
+    # Une saisie hors format ne doit pas casser l'enveloppe
+    ET.fromstring(encode_request("FR<x>&'\""))
+    return ok
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Encodage et décodage SOAP VIES")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--legacy", action="store_true", help="mesurer aussi la version d'origine")
+    parser.add_argument("--save", help="fichier JSON de référence à écrire")
+    parser.add_argument("--compare", help="fichier JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10, help="régression tolérée (0.10 = 10 %%)")
+    args = parser.parse_args()
+
+    if not check():
+        print("Décodage différent de la version d'origine")
+        sys.exit(1)
+
+    numbers = ["FR40303265045", "DE136695976", "BE0403170701", "NL004495445B01"] * 25
+    results = {"encode": measure(encode_request, numbers, args.rounds, args.calls)}
+    if args.legacy:
+        results["encode/legacy"] = measure(legacy_request, numbers, args.rounds, args.calls)
+    for name, response in RECORDED.items():
+        responses = [response] * args.calls
+        results[f"parse/{name}"] = measure(parse, responses, args.rounds, args.calls)
+        if args.legacy and response[0] == 200:
+            results[f"parse/{name}/legacy"] = measure(lambda r: legacy_parse(*r), responses, args.rounds, args.calls)
+
+    print_table(results)
+    if args.save:
+        save_baseline(args.save, "vies", results, vars(args))
+    if args.compare and not compare(args.compare, results, args.threshold, latency="p50"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
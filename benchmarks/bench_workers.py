@@ -0,0 +1,227 @@
+"""
+Montée en charge avec le nombre de workers gunicorn
+===================================================
+Lance les bouchons INSEE/VIES en HTTP, puis l'API sous gunicorn
+(gunicorn.conf.py) avec 1, 2, 4... workers, et la charge avec plusieurs
+processus clients pendant --duration secondes par configuration, après une
+phase de chauffe (caches de chaque worker remplis). Pour chaque nombre de
+workers : débit, p50/p95/p99, accélération et efficacité par rapport à un
+worker, mémoire propre (PSS) moyenne par worker, qui reste basse quand le
+maître précharge l'application (--no-preload pour comparer).
+
+Les processus clients partagent la machine avec les workers : sur une
+machine de N cœurs, la montée en charge n'est mesurable que jusqu'à
+environ N workers moins le nombre de processus clients (--clients).
+
+Usage:
+    python -m benchmarks.bench_workers --workers 1,2,4,8 --duration 10
+    python -m benchmarks.bench_workers --scenario iban --clients 4 --save benchmarks/results/workers.json
+    python -m benchmarks.bench_workers --compare benchmarks/results/workers.json
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import runpy
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.bench_load import BENCH_KEY, Identifiers, _failed, scenarios
+from benchmarks.report import Summary, compare, print_table, save_baseline, summarize
+
+def bench_app():
+    """Application servie par gunicorn (benchmarks.bench_workers:bench_app()), avec la clé du benchmark"""
+    import main
+
+    main.API_KEYS[BENCH_KEY] = {
+        "name": "Benchmark", "tier": "premium", "daily_limit": 10**12, "rate_limit": 10**9, "burst": 10**9
+    }
+    return main.app
+
+# ============ PROCESSUS SERVEURS ============
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} : le processus s'est arrêté (code {process.returncode})")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} : pas de réponse après {timeout:.0f}s")
+
+def _stop(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def _children(pid: int) -> List[int]:
+    children = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # Champ 4 (ppid), après le nom entre parenthèses
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return children
+
+def _pss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def worker_memory(master_pid: int) -> Optional[float]:
+    """PSS moyenne des workers (Mo) : pages partagées réparties entre les processus qui les partagent"""
+    values = [v for v in (_pss_mb(pid) for pid in _children(master_pid)) if v is not None]
+    return sum(values) / len(values) if values else None
+
+# ============ CLIENTS ============
+
+def _client(url: str, scenario: str, concurrency: int, duration: float, seed: int, distinct: int) -> Tuple[List[float], int, float]:
+    """Un processus client : concurrency requêtes en vol pendant duration secondes"""
+    make_request = scenarios(Identifiers(random.Random(seed), distinct), 50)[scenario]
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(client: httpx.AsyncClient, deadline: float) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            method, path, body, headers = make_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers={"X-API-Key": BENCH_KEY, **headers})
+                failed = _failed(response, scenario.endswith("/invalid"))
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    async def run() -> float:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(client, start + duration) for _ in range(concurrency)))
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    return latencies, errors, elapsed
+
+def drive(url: str, args: argparse.Namespace, duration: float) -> Summary:
+    with ProcessPoolExecutor(args.clients) as pool:
+        futures = [
+            pool.submit(_client, url, args.scenario, args.concurrency, duration, args.seed + i, args.distinct)
+            for i in range(args.clients)
+        ]
+        outcomes = [f.result() for f in futures]
+    latencies = [latency for lats, _, _ in outcomes for latency in lats]
+    return summarize(latencies, max(elapsed for _, _, elapsed in outcomes), sum(errors for _, errors, _ in outcomes))
+
+def run_workers(count: int, stubs_url: str, args: argparse.Namespace) -> Summary:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(count),
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+        "GUNICORN_PRELOAD": "false" if args.no_preload else "true",
+        "SIRENE_BASE_URL": f"{stubs_url}/sirene",
+        "VIES_URL": f"{stubs_url}/vies",
+        "JOBS_WORKERS": "0",
+        "JOBS_DB_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}"
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "benchmarks.bench_workers:bench_app()", "-c", "gunicorn.conf.py"],
+        env=env, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(f"{url}/health", server)
+        drive(url, args, args.warmup)
+        result = drive(url, args, args.duration)
+        memory = worker_memory(server.pid)
+        if memory is not None:
+            result["pss_mb"] = round(memory, 1)
+        return result
+    finally:
+        _stop(server)
+
+def main() -> None:
+    cpus = runpy.run_path("gunicorn.conf.py")["available_cpus"]()
+    default_workers = sorted({n for n in (1, 2, 4, 8, 16, 32) if n <= cpus} | {cpus})
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)), help="nombres de workers, séparés par des virgules")
+    parser.add_argument("--scenario", default="siret", help="scénario de bench_load (siret, siret/local, iban, tva...)")
+    parser.add_argument("--duration", type=float, default=10.0, help="durée de mesure par configuration (s)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="durée de chauffe (s)")
+    # Peu de connexions par client : au-delà, le pool httpx limite le client avant le serveur
+    parser.add_argument("--concurrency", type=int, default=16, help="requêtes en vol par processus client")
+    parser.add_argument("--clients", type=int, default=max(1, cpus // 4), help="processus clients")
+    parser.add_argument("--distinct", type=int, default=1000, help="identifiants distincts")
+    parser.add_argument("--latency", type=float, default=0.05, help="latence moyenne des bouchons (s)")
+    parser.add_argument("--no-preload", action="store_true", help="chaque worker importe l'application")
+    parser.add_argument("--verbose", action="store_true", help="afficher les journaux de gunicorn")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="fichier JSON de référence à écrire")
+    parser.add_argument("--compare", help="fichier JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10, help="régression tolérée (0.10 = 10 %%)")
+    args = parser.parse_args()
+
+    counts = [int(n) for n in args.workers.split(",")]
+    stubs_port = _free_port()
+    stubs = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stubs", "--port", str(stubs_port), "--latency", str(args.latency)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    stubs_url = f"http://127.0.0.1:{stubs_port}"
+    results: Dict[str, Summary] = {}
+    try:
+        _wait_ready(f"{stubs_url}/token", stubs)
+        for count in counts:
+            results[f"workers={count}"] = run_workers(count, stubs_url, args)
+    finally:
+        _stop(stubs)
+
+    print(f"Cœurs disponibles : {cpus}, processus clients : {args.clients}, scénario : {args.scenario}\n")
+    print_table(results)
+    first = results[f"workers={counts[0]}"]["throughput"]
+    print("\nMontée en charge :")
+    for count in counts:
+        r = results[f"workers={count}"]
+        speedup = r["throughput"] / first if first else 0.0
+        memory = f", PSS {r['pss_mb']:.1f} Mo/worker" if "pss_mb" in r else ""
+        print(f"  {count:>3} workers : x{speedup:.2f} (efficacité {speedup * counts[0] / count:.0%}){memory}")
+    if args.save:
+        save_baseline(args.save, "workers", results, vars(args))
+    if args.compare and not compare(args.compare, results, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
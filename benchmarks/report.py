@@ -0,0 +1,101 @@
+"""
+Résumés, affichage et références (baselines) JSON des benchmarks
+================================================================
+Chaque benchmark produit un dictionnaire {scénario: résumé}, où un résumé
+contient count, errors, throughput (opérations/s) et les latences p50, p95,
+p99 (secondes). save_baseline l'écrit avec le commit courant ; compare
+signale les scénarios dont le débit baisse ou le p99 monte au-delà d'un seuil.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+Summary = Dict[str, float]
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Percentile q (0-1) d'une liste déjà triée"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Summary:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "throughput": len(ordered) / elapsed if elapsed > 0 else 0.0,
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99)
+    }
+
+def _format_latency(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    if seconds >= 1e-6:
+        return f"{seconds * 1e6:.2f} µs"
+    return f"{seconds * 1e9:.0f} ns"
+
+def print_table(results: Dict[str, Summary]) -> None:
+    width = max([len(name) for name in results] + [10])
+    print(f"{'scénario':<{width}}  {'débit/s':>12}  {'p50':>10}  {'p95':>10}  {'p99':>10}  {'erreurs':>7}")
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['throughput']:>12,.0f}  {_format_latency(r['p50']):>10}  "
+              f"{_format_latency(r['p95']):>10}  {_format_latency(r['p99']):>10}  {r['errors']:>7}")
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def save_baseline(path: str, benchmark: str, results: Dict[str, Summary], params: Dict[str, Any]) -> None:
+    """Écrit les résultats avec le commit, la machine et les paramètres du run"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "benchmark": benchmark,
+            "commit": _git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "params": params,
+            "results": results
+        }, f, indent=2)
+    print(f"\nRéférence enregistrée : {path}")
+
+def compare(path: str, results: Dict[str, Summary], threshold: float = 0.10, latency: str = "p99") -> bool:
+    """
+    Compare les résultats à une référence enregistrée
+
+    latency : percentile comparé (p50 pour les micro-benchmarks, dont le p99
+    mesure surtout le bruit du système).
+
+    Returns:
+        True si aucun scénario ne régresse de plus de threshold (débit ou latence)
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    print(f"\nComparaison avec {path} (commit {baseline.get('commit')}) :")
+    ok = True
+    for name, r in results.items():
+        ref = baseline["results"].get(name)
+        if ref is None:
+            print(f"  {name}: absent de la référence")
+            continue
+        throughput = r["throughput"] / ref["throughput"] - 1 if ref["throughput"] else 0.0
+        delta = r[latency] / ref[latency] - 1 if ref[latency] else 0.0
+        regression = throughput < -threshold or delta > threshold
+        ok = ok and not regression
+        flag = "RÉGRESSION" if regression else "ok"
+        print(f"  {name}: débit {throughput:+.1%}, {latency} {delta:+.1%}  {flag}")
+    return ok
@@ -0,0 +1,259 @@
+"""
+Bouchons des services INSEE (Sirene) et VIES
+============================================
+Applications ASGI qui imitent les réponses des deux services amont, avec une
+latence (moyenne + gigue) et un taux d'erreur configurables :
+
+- Sirene : GET .../siret/{siret} et .../siren/{siren}, réponses JSON au
+  format de l'API (une part not_found_rate de 404), et recherche
+  multicritère POST .../siret ou .../siren (q=siret:X OR siret:Y...) ;
+  les erreurs sont des 503 ;
+- jeton INSEE : POST /token (client credentials) ; avec token_ttl, les
+  requêtes Sirene sans jeton valide reçoivent un 401 (revoke_tokens simule
+  une révocation) ;
+- VIES : POST de l'enveloppe SOAP checkVat, réponse SOAP avec valid=true
+  (valid=false pour une part not_found_rate) ; les erreurs sont des faults
+  SOAP MS_UNAVAILABLE (INVALID_INPUT pour une enveloppe illisible).
+
+En benchmark, stub_http_client monte les bouchons directement dans le client
+httpx partagé (aucun réseau). Ils peuvent aussi être servis en HTTP pour
+tester un serveur déployé :
+
+    python -m benchmarks.stubs --port 9000 --latency 0.08 --error-rate 0.01
+    SIRENE_BASE_URL=http://127.0.0.1:9000/sirene \\
+    VIES_URL=http://127.0.0.1:9000/vies uvicorn main:app
+
+Avec --token-ttl, ajouter INSEE_TOKEN_URL=http://127.0.0.1:9000/token et
+des identifiants quelconques (INSEE_CLIENT_ID / INSEE_CLIENT_SECRET).
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import time
+from typing import Dict, Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+_BULK_RE = re.compile(r"(?:siret|siren):(\d+)")
+_VAT_RE = re.compile(rb"<urn:countryCode>(\w+)</urn:countryCode>\s*<urn:vatNumber>(\w+)</urn:vatNumber>")
+
+VIES_RESPONSE = """<?xml version="1.0" encoding="UTF-8"?>
+<env:Envelope xmlns:env="http://schemas.xmlsoap.org/soap/envelope/">
+<env:Header/>
+<env:Body>
+<ns2:checkVatResponse xmlns:ns2="urn:ec.europa.eu:taxud:vies:services:checkVat:types">
+<ns2:countryCode>{country}</ns2:countryCode>
+<ns2:vatNumber>{number}</ns2:vatNumber>
+<ns2:requestDate>2024-01-01+01:00</ns2:requestDate>
+<ns2:valid>{valid}</ns2:valid>
+<ns2:name>{name}</ns2:name>
+<ns2:address>{address}</ns2:address>
+</ns2:checkVatResponse>
+</env:Body>
+</env:Envelope>"""
+
+VIES_FAULT = """<?xml version="1.0" encoding="UTF-8"?>
+<env:Envelope xmlns:env="http://schemas.xmlsoap.org/soap/envelope/">
+<env:Body>
+<env:Fault><faultcode>env:Server</faultcode><faultstring>{code}</faultstring></env:Fault>
+</env:Body>
+</env:Envelope>"""
+
+class StubConfig:
+    """Comportement des bouchons (modifiable pendant un benchmark)"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        error_rate: float = 0.0,
+        not_found_rate: float = 0.0,
+        seed: int = 0,
+        token_ttl: Optional[float] = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.rng = random.Random(seed)
+        self.token_ttl = token_ttl
+        self.tokens: Dict[str, float] = {}
+        self.calls = {"sirene": 0, "vies": 0, "token": 0}
+
+    async def delay(self) -> None:
+        wait = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def fails(self) -> bool:
+        return self.rng.random() < self.error_rate
+
+    def not_found(self) -> bool:
+        return self.rng.random() < self.not_found_rate
+
+    def issue_token(self, ttl: float) -> str:
+        token = f"stub-{self.calls['token']}"
+        self.tokens[token] = time.time() + ttl
+        return token
+
+    def authorized(self, request: Request) -> bool:
+        if self.token_ttl is None:
+            return True
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        return self.tokens.get(token, 0) > time.time()
+
+    def revoke_tokens(self) -> None:
+        self.tokens.clear()
+
+def _unite_legale(siren: str) -> dict:
+    return {
+        "siren": siren,
+        "denominationUniteLegale": f"ENTREPRISE {siren}",
+        "categorieJuridiqueUniteLegale": "5710",
+        "activitePrincipaleUniteLegale": "62.01Z",
+        "dateCreationUniteLegale": "2010-01-01",
+        "etatAdministratifUniteLegale": "A"
+    }
+
+def _etablissement(siret: str) -> dict:
+    return {
+        "siret": siret,
+        "siren": siret[:9],
+        "uniteLegale": _unite_legale(siret[:9]),
+        "adresseEtablissement": {
+            "numeroVoieEtablissement": "1",
+            "libelleVoieEtablissement": "DE LA PAIX",
+            "codePostalEtablissement": "75002",
+            "libelleCommuneEtablissement": "PARIS 2"
+        },
+        "activitePrincipaleEtablissement": "62.01Z",
+        "dateCreationEtablissement": "2010-01-01",
+        "etatAdministratifEtablissement": "A"
+    }
+
+UNAUTHORIZED = {"fault": {"code": 900901, "message": "Invalid Credentials"}}
+
+def build_stub_app(
+    config: StubConfig,
+    sirene_prefix: str = "",
+    vies_path: str = "",
+    token_path: str = "/token"
+) -> Starlette:
+    """
+    Application ASGI des bouchons
+
+    sirene_prefix : préfixe des routes Sirene (avant /siret/... et /siren/...) ;
+    vies_path : chemin du service VIES ; token_path : chemin du service de jetons.
+    """
+
+    async def token(request: Request) -> Response:
+        config.calls["token"] += 1
+        form = await request.form()
+        if form.get("grant_type") != "client_credentials" or "authorization" not in request.headers:
+            return JSONResponse({"error": "invalid_client"}, status_code=401)
+        ttl = config.token_ttl or 3600
+        return JSONResponse({"access_token": config.issue_token(ttl), "token_type": "Bearer", "expires_in": ttl})
+
+    async def sirene(request: Request) -> Response:
+        config.calls["sirene"] += 1
+        if not config.authorized(request):
+            return JSONResponse(UNAUTHORIZED, status_code=401)
+        await config.delay()
+        if config.fails():
+            return JSONResponse({"header": {"statut": 503, "message": "Service indisponible"}}, status_code=503)
+        identifier = request.path_params["identifier"]
+        if config.not_found():
+            return JSONResponse({"header": {"statut": 404, "message": "Aucun élément trouvé"}}, status_code=404)
+        if request.path_params["kind"] == "siret":
+            return JSONResponse({"header": {"statut": 200}, "etablissement": _etablissement(identifier)})
+        return JSONResponse({"header": {"statut": 200}, "uniteLegale": _unite_legale(identifier)})
+
+    async def sirene_bulk(request: Request) -> Response:
+        config.calls["sirene"] += 1
+        if not config.authorized(request):
+            return JSONResponse(UNAUTHORIZED, status_code=401)
+        form = await request.form()
+        await config.delay()
+        if config.fails():
+            return JSONResponse({"header": {"statut": 503, "message": "Service indisponible"}}, status_code=503)
+        identifiers = [i for i in _BULK_RE.findall(form.get("q", "")) if not config.not_found()]
+        if not identifiers:
+            return JSONResponse({"header": {"statut": 404, "message": "Aucun élément trouvé"}}, status_code=404)
+        header = {"statut": 200, "total": len(identifiers), "nombre": len(identifiers)}
+        if request.path_params["kind"] == "siret":
+            return JSONResponse({"header": header, "etablissements": [_etablissement(i) for i in identifiers]})
+        return JSONResponse({"header": header, "unitesLegales": [_unite_legale(i) for i in identifiers]})
+
+    async def vies(request: Request) -> Response:
+        config.calls["vies"] += 1
+        body = await request.body()
+        await config.delay()
+        if config.fails():
+            return Response(VIES_FAULT.format(code="MS_UNAVAILABLE"), status_code=500, media_type="text/xml")
+        match = _VAT_RE.search(body)
+        if match is None:
+            return Response(VIES_FAULT.format(code="INVALID_INPUT"), status_code=500, media_type="text/xml")
+        country, number = match.group(1).decode(), match.group(2).decode()
+        valid = not config.not_found()
+        return Response(
+            VIES_RESPONSE.format(
+                country=country,
+                number=number,
+                valid="true" if valid else "false",
+                name=f"ENTREPRISE {number}" if valid else "---",
+                address="1 RUE DE LA PAIX\n75002 PARIS" if valid else "---"
+            ),
+            media_type="text/xml"
+        )
+
+    return Starlette(routes=[
+        Route(sirene_prefix + "/{kind:str}/{identifier:str}", sirene, methods=["GET"]),
+        Route(sirene_prefix + "/{kind:str}", sirene_bulk, methods=["POST"]),
+        Route(vies_path, vies, methods=["POST"]),
+        Route(token_path, token, methods=["POST"])
+    ])
+
+def stub_http_client(config: StubConfig) -> httpx.AsyncClient:
+    """Client httpx dont les appels Sirene et VIES sont servis en mémoire par les bouchons"""
+    from insee_auth import INSEE_TOKEN_URL
+    from validators import SIRENE_BASE_URL, VIES_URL
+
+    sirene_url = httpx.URL(SIRENE_BASE_URL)
+    vies_url = httpx.URL(VIES_URL)
+    token_url = httpx.URL(INSEE_TOKEN_URL)
+    app = build_stub_app(
+        config,
+        sirene_prefix=sirene_url.path.rstrip("/"),
+        vies_path=vies_url.path,
+        token_path=token_url.path
+    )
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(mounts={
+        f"{url.scheme}://{url.host}": transport
+        for url in (sirene_url, vies_url, token_url)
+    })
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bouchons HTTP Sirene (/sirene) et VIES (/vies)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.05, help="latence moyenne (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="gigue maximale (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--not-found-rate", type=float, default=0.0)
+    parser.add_argument("--token-ttl", type=float, help="exiger un jeton INSEE de cette durée de vie (s)")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StubConfig(args.latency, args.jitter, args.error_rate, args.not_found_rate, token_ttl=args.token_ttl)
+    uvicorn.run(build_stub_app(config, sirene_prefix="/sirene", vies_path="/vies"), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Disjoncteurs et délais adaptatifs pour les services amont
+=========================================================
+Un disjoncteur par service (Sirene) ou par code pays (VIES, dont la
+disponibilité varie d'un État membre à l'autre) :
+
+- fermé : les appels passent ; après BREAKER_FAILURE_THRESHOLD échecs
+  consécutifs (erreur réseau, délai dépassé, 5xx), il s'ouvre ;
+- ouvert : les appels échouent immédiatement, sans attendre le délai,
+  pendant BREAKER_RESET_TIMEOUT secondes ;
+- semi-ouvert : un seul appel d'essai à la fois ; un succès referme le
+  disjoncteur, un échec le rouvre.
+
+Le délai accordé à chaque appel suit la latence observée : 3 x le p99 des
+derniers appels réussis, borné entre UPSTREAM_MIN_TIMEOUT et le délai
+maximal du service.
+"""
+
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+UPSTREAM_MIN_TIMEOUT = float(os.getenv("UPSTREAM_MIN_TIMEOUT", "2"))
+
+# Latences conservées, nombre minimal avant d'adapter le délai, et marge sur le p99
+LATENCY_WINDOW = 256
+LATENCY_MIN_SAMPLES = 20
+TIMEOUT_P99_FACTOR = 3.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Disjoncteur d'un service amont, avec délai adaptatif"""
+
+    def __init__(
+        self,
+        name: str,
+        max_timeout: float,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+        min_timeout: float = UPSTREAM_MIN_TIMEOUT
+    ):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._new_samples = 0
+        self._p99: Optional[float] = None
+        self._timeout = max_timeout
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        """Indique si un appel peut être tenté maintenant"""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_started = None
+        # Semi-ouvert : un essai à la fois (un essai resté sans réponse expire)
+        if self._probe_started is not None and now - self._probe_started < self.max_timeout:
+            self.rejected += 1
+            return False
+        self._probe_started = now
+        return True
+
+    def record_success(self, latency: float) -> None:
+        self.failures = 0
+        self.state = CLOSED
+        self._probe_started = None
+        self._latencies.append(latency)
+        self._new_samples += 1
+        # Le p99 est recalculé par paquets de 16 mesures : coût amorti constant
+        if self._new_samples >= 16 and len(self._latencies) >= LATENCY_MIN_SAMPLES:
+            self._new_samples = 0
+            ordered = sorted(self._latencies)
+            self._p99 = ordered[int(0.99 * (len(ordered) - 1))]
+            self._timeout = min(self.max_timeout, max(self.min_timeout, self._p99 * TIMEOUT_P99_FACTOR))
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+
+    def timeout(self) -> float:
+        """Délai à accorder au prochain appel"""
+        return self._timeout
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "timeout": round(self._timeout, 3),
+            "p99_latency": round(self._p99, 3) if self._p99 is not None else None,
+            "rejected": self.rejected,
+            "opened": self.opened
+        }
+
+class BreakerGroup:
+    """Disjoncteurs d'un même service, un par clé (code pays VIES), créés à la demande"""
+
+    def __init__(self, name: str, max_timeout: float):
+        self.name = name
+        self.max_timeout = max_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(f"{self.name}:{key}", self.max_timeout)
+        return breaker
+
+    def stats(self) -> Dict[str, Any]:
+        return {key: breaker.stats() for key, breaker in sorted(self._breakers.items())}
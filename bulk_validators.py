@@ -0,0 +1,242 @@
+"""
+Validation en masse SIREN / SIRET / IBAN
+========================================
+Variante vectorisée des fonctions de validators.py pour les gros volumes
+(fichiers fournisseurs, imports). Les identifiants sont nettoyés comme dans
+les fonctions unitaires, rangés dans une matrice de chiffres de largeur fixe
+(une ligne par identifiant), puis Luhn et MOD 97 sont calculés avec NumPy :
+Luhn colonne par colonne, MOD 97 en une somme pondérée (poids 10^k mod 97)
+pour les IBAN sans lettre, colonne par colonne pour les autres.
+
+Chaque fonction renvoie deux tableaux de même longueur que l'entrée :
+
+- valid : booléens ;
+- codes : 0 si valide, sinon un code d'erreur (voir *_ERRORS ci-dessous).
+
+error_messages() retrouve les messages exacts des fonctions unitaires.
+
+Les rares identifiants contenant des caractères non ASCII (chiffres arabes,
+ligatures...) sont confiés aux fonctions unitaires, pour garder exactement
+le même comportement.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from validators import validate_siren, validate_siret, validate_iban_fr
+
+# Codes d'erreur, avec les messages des fonctions unitaires
+SIREN_ERRORS = {
+    1: "Le SIREN doit contenir exactement 9 chiffres",
+    2: "Le SIREN n'est pas valide (échec de l'algorithme de Luhn)"
+}
+
+SIRET_ERRORS = {
+    1: "Le SIRET doit contenir exactement 14 chiffres",
+    2: "Le SIRET n'est pas valide (échec de l'algorithme de Luhn)",
+    3: f"Le SIREN contenu dans le SIRET n'est pas valide: {SIREN_ERRORS[2]}"
+}
+
+IBAN_ERRORS = {
+    1: "L'IBAN doit commencer par 'FR' pour la France",
+    2: "Un IBAN français doit contenir 27 caractères (trouvé: {length})",
+    3: "Format IBAN invalide",
+    4: "Clé de contrôle IBAN invalide",
+    5: "Clé RIB invalide"
+}
+
+# Somme des chiffres de 2*d, pour les positions doublées de Luhn
+_LUHN_DOUBLED = np.array([0, 2, 4, 6, 8, 1, 3, 5, 7, 9], dtype=np.uint8)
+
+# Lettre (A=0 ... Z=25) -> chiffre de la clé RIB
+_RIB_LETTERS = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 1, 2, 3, 4, 5, 6, 7, 8, 9, 2, 3, 4, 5, 6, 7, 8, 9], dtype=np.uint8)
+
+# Poids des 23 chiffres d'un BBAN (ou RIB) pour son reste modulo 97 : le
+# chiffre de rang k, depuis la fin, compte pour 10^k mod 97
+_BBAN_WEIGHTS = np.array([pow(10, k, 97) for k in range(22, -1, -1)], dtype=np.int64)
+# Décalage du reste du BBAN derrière "FR" (1527) et la clé : 10^6 mod 97
+_IBAN_SHIFT = 10**6 % 97
+
+_ORD_0 = ord("0")
+_ORD_A = ord("A")
+
+BulkResult = Tuple[np.ndarray, np.ndarray]
+
+# ============ OUTILS ============
+
+def _clean_digits(value: str) -> str:
+    """Même nettoyage que validate_siren / validate_siret"""
+    return value.strip().replace(" ", "").replace("-", "")
+
+def _clean_iban(value: str) -> str:
+    """Même nettoyage que validate_iban_fr"""
+    return value.strip().upper().replace(" ", "").replace("-", "")
+
+def _byte_matrix(cleaned: List[str], width: int) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    """
+    Range les identifiants ASCII dans une matrice (n, width) d'octets
+
+    Returns:
+        (matrice, longueurs, positions des identifiants non ASCII)
+    """
+    fallback = [i for i, value in enumerate(cleaned) if not value.isascii()]
+    if fallback:
+        cleaned = list(cleaned)
+        for i in fallback:
+            cleaned[i] = ""
+    lengths = np.fromiter(map(len, cleaned), dtype=np.int64, count=len(cleaned))
+    # Les chaînes plus longues que width sont tronquées : la longueur les écarte
+    matrix = np.array(cleaned, dtype=f"S{width}").view(np.uint8).reshape(len(cleaned), width)
+    return matrix, lengths, fallback
+
+def _luhn(digits: np.ndarray) -> np.ndarray:
+    """Luhn sur chaque ligne d'une matrice de chiffres (0-9)"""
+    width = digits.shape[1]
+    plain = digits[:, width - 1::-2].sum(axis=1, dtype=np.int64)
+    doubled = _LUHN_DOUBLED[digits[:, width - 2::-2]].sum(axis=1, dtype=np.int64)
+    return (plain + doubled) % 10 == 0
+
+def _scalar_code(errors: dict, message: Optional[str]) -> int:
+    """Code correspondant au message d'une fonction unitaire"""
+    if message is None:
+        return 0
+    for code, template in errors.items():
+        if message == template or ("{length}" in template and message.startswith(template.split("{")[0])):
+            return code
+    raise ValueError(f"Message de validation inattendu: {message}")
+
+def _empty() -> BulkResult:
+    return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.uint8)
+
+# ============ SIREN / SIRET ============
+
+def _validate_digits_bulk(values: Sequence[str], width: int) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    """Format (width chiffres) et Luhn sur tout le tableau"""
+    matrix, lengths, fallback = _byte_matrix([_clean_digits(v) for v in values], width)
+    digits = matrix - np.uint8(_ORD_0)
+    codes = np.full(len(values), 1, dtype=np.uint8)
+    formatted = (lengths == width) & (digits <= 9).all(axis=1)
+    codes[formatted] = np.where(_luhn(digits[formatted]), 0, 2)
+    return digits, codes, fallback
+
+def validate_siren_bulk(values: Sequence[str]) -> BulkResult:
+    """
+    Valide un tableau de SIREN (équivalent vectorisé de validate_siren)
+
+    Returns:
+        (valid, codes) - codes : voir SIREN_ERRORS
+    """
+    if len(values) == 0:
+        return _empty()
+    _, codes, fallback = _validate_digits_bulk(values, 9)
+    for i in fallback:
+        codes[i] = _scalar_code(SIREN_ERRORS, validate_siren(values[i])[1])
+    return codes == 0, codes
+
+def validate_siret_bulk(values: Sequence[str]) -> BulkResult:
+    """
+    Valide un tableau de SIRET (équivalent vectorisé de validate_siret)
+
+    Returns:
+        (valid, codes) - codes : voir SIRET_ERRORS
+    """
+    if len(values) == 0:
+        return _empty()
+    digits, codes, fallback = _validate_digits_bulk(values, 14)
+    # SIREN contenu dans le SIRET, pour les SIRET dont la clé Luhn est bonne
+    checked = codes == 0
+    codes[checked] = np.where(_luhn(digits[checked, :9]), 0, 3)
+    for i in fallback:
+        codes[i] = _scalar_code(SIRET_ERRORS, validate_siret(values[i])[1])
+    return codes == 0, codes
+
+# ============ IBAN ============
+
+def _mod97(values: np.ndarray) -> np.ndarray:
+    """
+    Reste modulo 97 du BBAN + "FR" + clé, sans construire de grand entier
+
+    values : matrice (n, 27) des valeurs de caractères (0-9, A=10 ... Z=35)
+    """
+    remainder = np.zeros(values.shape[0], dtype=np.int64)
+    for column in list(range(4, 27)) + [0, 1, 2, 3]:
+        v = values[:, column].astype(np.int64)
+        remainder = (remainder * np.where(v >= 10, 100, 10) + v) % 97
+    return remainder
+
+def _rib_mod97(digits: np.ndarray) -> np.ndarray:
+    """Reste modulo 97 du RIB complet (23 chiffres, clé comprise) : une somme pondérée"""
+    return np.einsum("ij,j->i", digits, _BBAN_WEIGHTS, dtype=np.int64) % 97
+
+def validate_iban_fr_bulk(values: Sequence[str]) -> BulkResult:
+    """
+    Valide un tableau d'IBAN français (équivalent vectorisé de validate_iban_fr)
+
+    Seule la validité est calculée ; validate_iban_fr reste la fonction à
+    utiliser pour obtenir le détail du RIB.
+
+    Returns:
+        (valid, codes) - codes : voir IBAN_ERRORS
+    """
+    if len(values) == 0:
+        return _empty()
+    matrix, lengths, fallback = _byte_matrix([_clean_iban(v) for v in values], 27)
+
+    digits = matrix - np.uint8(_ORD_0)
+    letters = matrix - np.uint8(_ORD_A)
+    is_digit = digits <= 9
+    is_alnum = is_digit | (letters <= 25)
+
+    codes = np.full(len(values), 4, dtype=np.uint8)
+    formatted = is_digit[:, 2:4].all(axis=1) & is_alnum[:, 4:].all(axis=1)
+    codes[~formatted] = 3
+    codes[lengths != 27] = 2
+    codes[(matrix[:, 0] != ord("F")) | (matrix[:, 1] != ord("R"))] = 1
+
+    checked = codes == 4
+    # BBAN tout en chiffres (cas courant) : un seul reste, en somme pondérée,
+    # replié pour l'IBAN (BBAN * 10^6 + 1527 * 100 + clé) et repris pour le
+    # RIB, comme dans validate_iban_fr
+    plain = checked & is_digit[:, 4:].all(axis=1)
+    remainder = _rib_mod97(digits[plain, 4:])
+    key = digits[plain, 2].astype(np.int64) * 10 + digits[plain, 3]
+    iban_valid = (remainder * _IBAN_SHIFT + 152700 + key) % 97 == 1
+    codes[plain] = np.where(iban_valid, np.where(remainder == 0, 0, 5), 4)
+
+    # BBAN avec lettres : reste calculé colonne par colonne
+    mixed = checked & ~plain
+    chars = np.where(is_digit[mixed], digits[mixed], letters[mixed] + np.uint8(10))
+    codes[mixed] = np.where(_mod97(chars) == 1, 0, 4)
+
+    # Clé RIB (lettres transcodées) sur ces IBAN, si leur clé est bonne
+    checked = mixed & (codes == 0)
+    rib_digits = np.where(is_digit[checked, 4:], digits[checked, 4:], _RIB_LETTERS[np.minimum(letters[checked, 4:], 25)])
+    rib_valid = is_digit[checked, 25:27].all(axis=1) & (_rib_mod97(rib_digits) == 0)
+    codes[checked] = np.where(rib_valid, 0, 5)
+
+    for i in fallback:
+        codes[i] = _scalar_code(IBAN_ERRORS, validate_iban_fr(values[i])[2])
+    return codes == 0, codes
+
+# ============ MESSAGES ============
+
+def error_messages(kind: str, values: Sequence[str], codes: np.ndarray) -> List[Optional[str]]:
+    """
+    Messages d'erreur des fonctions unitaires pour un tableau de codes
+
+    Args:
+        kind: "siren", "siret" ou "iban"
+        values: identifiants passés à la fonction de validation
+        codes: codes renvoyés par celle-ci
+    """
+    errors = {"siren": SIREN_ERRORS, "siret": SIRET_ERRORS, "iban": IBAN_ERRORS}[kind]
+    messages: List[Optional[str]] = []
+    for value, code in zip(values, codes.tolist()):
+        if code == 0:
+            messages.append(None)
+        elif kind == "iban" and code == 2:
+            messages.append(errors[2].format(length=len(_clean_iban(value))))
+        else:
+            messages.append(errors[code])
+    return messages
@@ -0,0 +1,513 @@
+"""
+Cache à deux niveaux pour les données amont
+===========================================
+- Niveau 1 : LRU en mémoire du processus, avec TTL et taille bornée.
+- Niveau 2 (optionnel) : backend partagé entre les workers gunicorn.
+  Redis si CACHE_BACKEND_URL commence par redis://, sinon un fichier SQLite
+  local (sqlite:///chemin/cache.db) qui joue le même rôle sur une seule machine.
+
+Les valeurs None sont mises en cache (cache négatif) : un get renvoie donc
+un couple (trouvé, valeur).
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from metrics import cache_requests
+
+class TTLCache:
+    """LRU en mémoire avec expiration par entrée"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        found, value, _ = self.get_entry(key)
+        return found, value
+
+    def get_entry(self, key: str) -> Tuple[bool, Any, float]:
+        """Comme get, avec la date d'enregistrement de la valeur (time.time())"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None, 0.0
+            expires_at, value, stored_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return False, None, 0.0
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value, stored_at
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, stored_at: Optional[float] = None) -> None:
+        """stored_at : date de la valeur si elle vient d'ailleurs (cache partagé), sinon maintenant"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock:
+            self._data[key] = (expires_at, value, stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# ============ BACKENDS PARTAGÉS ============
+# Ils servent aussi de compteurs atomiques pour les quotas (voir quota.py).
+
+class RedisBackend:
+    """Backend partagé Redis (nécessite le paquet redis)"""
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._redis.set(key, value, px=max(1, int(ttl * 1000)))
+
+    def incr_many(self, increments: Dict[str, int], ttl: float) -> Dict[str, int]:
+        """Incrémente plusieurs compteurs en un aller-retour, renvoie les nouveaux totaux"""
+        pipe = self._redis.pipeline(transaction=False)
+        for key, amount in increments.items():
+            pipe.incrby(key, amount)
+            pipe.pexpire(key, max(1, int(ttl * 1000)))
+        replies = pipe.execute()
+        return {key: int(total) for key, total in zip(increments, replies[0::2])}
+
+# Intervalle (secondes) entre deux purges des entrées expirées du fichier SQLite
+CACHE_PURGE_INTERVAL = float(os.getenv("CACHE_PURGE_INTERVAL", "60"))
+
+class SQLiteBackend:
+    """
+    Backend partagé local : un fichier SQLite en mode WAL
+
+    Remplace Redis quand tous les workers tournent sur la même machine.
+    Les entrées expirées ne sont jamais relues ; elles sont supprimées au
+    fil des écritures, au plus une fois par purge_interval secondes et par
+    processus, pour que le fichier ne grossisse pas indéfiniment.
+    """
+
+    def __init__(self, path: str, purge_interval: float = CACHE_PURGE_INTERVAL):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self.purged = 0
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            "key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Connexion par thread et par processus : un worker gunicorn forké
+        # depuis le maître (preload_app) n'utilise pas celle du maître
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl)
+        )
+        if now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            self.purged += conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,)).rowcount
+        conn.commit()
+
+    def incr_many(self, increments: Dict[str, int], ttl: float) -> Dict[str, int]:
+        """Incrémente plusieurs compteurs en une transaction, renvoie les nouveaux totaux"""
+        conn = self._conn()
+        now = time.time()
+        totals = {}
+        with conn:
+            conn.execute("DELETE FROM counters WHERE expires_at < ?", (now,))
+            for key, amount in increments.items():
+                totals[key] = conn.execute(
+                    "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value, "
+                    "expires_at = excluded.expires_at RETURNING value",
+                    (key, amount, now + ttl)
+                ).fetchone()[0]
+        return totals
+
+def backend_from_url(url: Optional[str]):
+    """Construit le backend partagé décrit par une URL (ou None)"""
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    raise ValueError(f"Backend de cache non supporté: {url}")
+
+# ============ CACHE À DEUX NIVEAUX ============
+
+class TieredCache:
+    """
+    Cache L1 (mémoire) + L2 (partagé, optionnel)
+
+    Les erreurs du backend partagé sont ignorées : le cache dégrade vers
+    le seul niveau mémoire plutôt que de faire échouer la requête.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, backend=None):
+        self.name = name
+        self.ttl = ttl
+        self.l1 = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.backend = backend
+        self.l2_hits = 0
+        self.backend_errors = 0
+        self._metric_hit = cache_requests.labels(name, "hit")
+        self._metric_shared_hit = cache_requests.labels(name, "shared_hit")
+        self._metric_miss = cache_requests.labels(name, "miss")
+
+    def _count(self, found: bool, shared: bool = False) -> None:
+        if not found:
+            self._metric_miss.inc()
+        elif shared:
+            self._metric_shared_hit.inc()
+        else:
+            self._metric_hit.inc()
+
+    def _l2_key(self, key: str) -> str:
+        return f"docverify:{self.name}:{key}"
+
+    def _l2_get(self, key: str) -> Tuple[bool, Any, float, float]:
+        """(trouvé, valeur, date d'enregistrement, durée de vie restante)"""
+        try:
+            raw = self.backend.get(self._l2_key(key))
+        except Exception:
+            self.backend_errors += 1
+            return False, None, 0.0, 0.0
+        if raw is None:
+            return False, None, 0.0, 0.0
+        entry = json.loads(raw)
+        # Entrées écrites sans date : considérées comme anciennes, et sans
+        # expiration : durée par défaut du cache
+        remaining = entry["e"] - time.time() if "e" in entry else self.ttl
+        if remaining <= 0:
+            return False, None, 0.0, 0.0
+        self.l2_hits += 1
+        return True, entry["v"], entry.get("t", 0.0), remaining
+
+    def _l2_set(self, key: str, value: Any, ttl: float, stored_at: float) -> None:
+        try:
+            payload = {"v": value, "t": stored_at, "e": stored_at + ttl}
+            self.backend.set(self._l2_key(key), json.dumps(payload).encode(), ttl)
+        except Exception:
+            self.backend_errors += 1
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        found, value, _ = self.get_with_age(key)
+        return found, value
+
+    def get_with_age(self, key: str) -> Tuple[bool, Any, float]:
+        """(trouvé, valeur, âge de la valeur en secondes)"""
+        found, value, stored_at = self.l1.get_entry(key)
+        if not found and self.backend is not None:
+            found, value, stored_at, remaining = self._l2_get(key)
+            if found:
+                # Recopiée en mémoire pour sa durée restante, pas la durée par défaut
+                self.l1.set(key, value, remaining, stored_at)
+            self._count(found, shared=True)
+        else:
+            self._count(found)
+        return found, value, time.time() - stored_at if found else 0.0
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        stored_at = time.time()
+        self.l1.set(key, value, ttl, stored_at)
+        if self.backend is not None:
+            self._l2_set(key, value, ttl, stored_at)
+
+    async def aget(self, key: str) -> Tuple[bool, Any]:
+        """Comme get, mais l'accès au backend partagé ne bloque pas la boucle"""
+        found, value, _ = await self.aget_with_age(key)
+        return found, value
+
+    async def aget_with_age(self, key: str) -> Tuple[bool, Any, float]:
+        found, value, stored_at = self.l1.get_entry(key)
+        if not found and self.backend is not None:
+            found, value, stored_at, remaining = await asyncio.to_thread(self._l2_get, key)
+            if found:
+                # Recopiée en mémoire pour sa durée restante, pas la durée par défaut
+                self.l1.set(key, value, remaining, stored_at)
+            self._count(found, shared=True)
+        else:
+            self._count(found)
+        return found, value, time.time() - stored_at if found else 0.0
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        stored_at = time.time()
+        self.l1.set(key, value, ttl, stored_at)
+        if self.backend is not None:
+            await asyncio.to_thread(self._l2_set, key, value, ttl, stored_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs de succès/échecs du cache"""
+        hits = self.l1.hits
+        misses = self.l1.misses - self.l2_hits
+        lookups = hits + self.l2_hits + misses
+        return {
+            "size": len(self.l1),
+            "maxsize": self.l1.maxsize,
+            "hits": hits,
+            "shared_hits": self.l2_hits,
+            "misses": misses,
+            "evictions": self.l1.evictions,
+            "hit_ratio": round((hits + self.l2_hits) / lookups, 4) if lookups else None,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "backend_errors": self.backend_errors
+        }
+
+# Backend partagé commun à tous les caches du processus
+shared_backend = backend_from_url(os.getenv("CACHE_BACKEND_URL"))
+
+# ============ DÉDUPLICATION DES APPELS EN COURS ============
+
+class SingleFlight:
+    """
+    Fusionne les appels concurrents portant sur la même clé
+
+    Le premier appelant lance l'appel amont ; les suivants attendent son
+    résultat au lieu d'en lancer un nouveau. L'appel tourne dans sa propre
+    tâche : l'annulation d'un appelant n'interrompt pas les autres.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Évite l'avertissement "exception never retrieved" si plus personne n'attend
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
+
+# ============ REGROUPEMENT DES RECHERCHES ============
+
+class MicroBatcher:
+    """
+    Regroupe des recherches unitaires en requêtes groupées
+
+    Les clés demandées pendant window secondes (ou jusqu'à max_size clés) sont
+    envoyées ensemble à fetch(group, keys), qui renvoie {clé: valeur} ; une
+    clé absente de la réponse vaut None. Seules les clés d'un même groupe
+    (ex. type de recherche) sont regroupées, et une clé déjà demandée
+    partage la requête en cours. Une exception de fetch est renvoyée à tous
+    les appelants du lot.
+    """
+
+    def __init__(self, fetch, window: float, max_size: int):
+        self.fetch = fetch
+        self.window = window
+        self.max_size = max_size
+        self._futures: Dict[Tuple[Any, str], asyncio.Future] = {}
+        self._pending: Dict[Any, Dict[str, asyncio.Future]] = {}
+        self._timers: Dict[Any, asyncio.TimerHandle] = {}
+        self._sending: set = set()
+        self.requests = 0
+        self.keys = 0
+        self.coalesced = 0
+
+    async def load(self, group: Any, key: str) -> Any:
+        future = self._futures.get((group, key))
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = self._futures[(group, key)] = loop.create_future()
+        batch = self._pending.setdefault(group, {})
+        batch[key] = future
+        if len(batch) >= self.max_size:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = loop.call_later(self.window, self._flush, group)
+        # L'annulation d'un appelant n'annule pas la recherche des autres
+        return await asyncio.shield(future)
+
+    def _flush(self, group: Any) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group, None)
+        if batch:
+            task = asyncio.ensure_future(self._send(group, batch))
+            # Référence conservée jusqu'à la fin de l'envoi
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, group: Any, batch: Dict[str, asyncio.Future]) -> None:
+        self.requests += 1
+        self.keys += len(batch)
+        try:
+            values = await self.fetch(group, list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Évite l'avertissement "exception never retrieved" si plus personne n'attend
+                    future.exception()
+            return
+        finally:
+            for key in batch:
+                self._futures.pop((group, key), None)
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": sum(len(batch) for batch in self._pending.values()),
+            "requests": self.requests,
+            "keys": self.keys,
+            "coalesced": self.coalesced
+        }
+
+# ============ RAFRAÎCHISSEMENT EN TÂCHE DE FOND ============
+
+class BackgroundRefresher:
+    """
+    Rafraîchissements de valeurs en cache, hors du chemin des requêtes
+
+    Une clé n'est rafraîchie qu'une fois à la fois ; au plus concurrency
+    rafraîchissements tournent ensemble, et au-delà de max_pending en attente
+    les nouvelles demandes sont ignorées (la valeur en cache reste servie).
+    """
+
+    def __init__(self, name: str, concurrency: int, max_pending: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def schedule(self, key: str, fn) -> bool:
+        """Programme fn() (coroutine) pour la clé, sans attendre ; False si ignoré"""
+        if key not in self._tasks and len(self._tasks) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._start(key, fn)
+        return True
+
+    async def refresh(self, key: str, fn) -> None:
+        """Comme schedule, mais attend la fin du rafraîchissement (préchargement)"""
+        await asyncio.gather(asyncio.shield(self._start(key, fn)), return_exceptions=True)
+
+    def _start(self, key: str, fn) -> asyncio.Task:
+        task = self._tasks.get(key)
+        if task is None:
+            self.scheduled += 1
+            task = self._tasks[key] = asyncio.ensure_future(self._run(fn))
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    async def _run(self, fn) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            await fn()
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if task.cancelled() or task.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    async def stop(self) -> None:
+        """Annule les rafraîchissements en cours (arrêt de l'application)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._tasks),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
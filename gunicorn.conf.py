@@ -0,0 +1,102 @@
+"""
+Configuration gunicorn de l'API (plusieurs processus)
+=====================================================
+    gunicorn main:app -c gunicorn.conf.py
+
+- Workers : WEB_CONCURRENCY, par défaut un par cœur réellement disponible
+  (affinité du processus et quota CPU du conteneur, cgroup v1 ou v2).
+- Worker uvicorn : boucle uvloop et parseur httptools quand ils sont
+  installés (uvicorn[standard]), asyncio et h11 sinon.
+- Recyclage : chaque worker est remplacé après GUNICORN_MAX_REQUESTS
+  requêtes (plus une gigue, pour ne pas tous les redémarrer ensemble), en
+  laissant GUNICORN_GRACEFUL_TIMEOUT secondes aux requêtes en cours.
+- Préchargement (GUNICORN_PRELOAD) : l'application est importée dans le
+  processus maître, qui ouvre aussi l'index Sirene et l'annuaire bancaire
+  avant de forker ; modules, tables de référence et pages des index sont
+  partagés en copie sur écriture au lieu d'être chargés par chaque worker.
+  Connexions, pools HTTP et tâches de fond sont créés par chaque worker au
+  démarrage de l'application (lifespan), jamais dans le maître.
+"""
+
+import gc
+import os
+from importlib.util import find_spec
+
+PORT = int(os.getenv("PORT", "8000"))
+GUNICORN_MAX_REQUESTS = int(os.getenv("GUNICORN_MAX_REQUESTS", "20000"))
+GUNICORN_GRACEFUL_TIMEOUT = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+GUNICORN_PRELOAD = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+def available_cpus() -> int:
+    """Cœurs utilisables : affinité du processus, bornée par le quota CPU du cgroup"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()[:2]
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota + 0.5)))
+    return max(1, cpus)
+
+# ============ PROCESSUS ============
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{PORT}")
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or available_cpus()
+# Boucle et parseur « auto » : uvloop et httptools s'ils sont importables
+# (uvicorn.workers, obsolète, si le paquet uvicorn-worker est absent)
+worker_class = (
+    "uvicorn_worker.UvicornWorker" if find_spec("uvicorn_worker") else "uvicorn.workers.UvicornWorker"
+)
+preload_app = GUNICORN_PRELOAD
+
+# ============ RECYCLAGE ============
+
+max_requests = GUNICORN_MAX_REQUESTS
+max_requests_jitter = GUNICORN_MAX_REQUESTS // 10
+graceful_timeout = GUNICORN_GRACEFUL_TIMEOUT
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# ============ HOOKS ============
+
+def when_ready(server):
+    """Maître prêt, avant le premier fork : données partagées ouvertes une fois pour tous"""
+    if preload_app:
+        from bank_directory import get_bank_directory
+        from sirene_index import get_sirene_index
+
+        get_sirene_index()
+        get_bank_directory()
+        # Objets du maître exclus du ramasse-miettes : ses passages dans les
+        # workers ne réécrivent pas leurs en-têtes, les pages restent partagées
+        gc.collect()
+        gc.freeze()
+    server.log.info(
+        "%d workers, boucle %s, HTTP %s, préchargement %s",
+        workers,
+        "uvloop" if find_spec("uvloop") else "asyncio",
+        "httptools" if find_spec("httptools") else "h11",
+        "oui" if preload_app else "non"
+    )
+
+def child_exit(server, worker):
+    """Worker arrêté : ses métriques Prometheus ne sont plus agrégées comme vivantes"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,205 @@
+"""
+Jetons OAuth2 pour l'API Sirene de l'INSEE
+==========================================
+Jeton d'accès obtenu par client credentials (INSEE_CLIENT_ID /
+INSEE_CLIENT_SECRET, clé et secret de l'application sur le portail INSEE)
+auprès de INSEE_TOKEN_URL :
+
+- un seul jeton par processus, partagé par toutes les requêtes : l'en-tête
+  Authorization est lu en mémoire, sans attente ;
+- le premier jeton est obtenu au démarrage (au premier appel Sirene avec
+  LAZY_STARTUP, voir main.py), puis renouvelé en tâche de fond
+  INSEE_TOKEN_REFRESH_MARGIN secondes avant son expiration (au plus tard à
+  mi-vie) ; en cas d'échec, nouvel essai avec un délai croissant tant que le
+  jeton courant reste valide ;
+- un 401 de l'API (jeton révoqué) déclenche un renouvellement unique,
+  partagé par les requêtes concernées, qui sont rejouées une fois.
+
+Sans INSEE_CLIENT_ID, les requêtes partent sans authentification.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from upstream import get_http_client, get_sync_http_client
+
+INSEE_TOKEN_URL = os.getenv("INSEE_TOKEN_URL", "https://api.insee.fr/token")
+INSEE_CLIENT_ID = os.getenv("INSEE_CLIENT_ID")
+INSEE_CLIENT_SECRET = os.getenv("INSEE_CLIENT_SECRET")
+INSEE_TOKEN_REFRESH_MARGIN = float(os.getenv("INSEE_TOKEN_REFRESH_MARGIN", "300"))
+
+# Durée de vie supposée d'un jeton sans expires_in ni date d'expiration lisible
+DEFAULT_TOKEN_LIFETIME = 3600
+# Délais entre deux essais de renouvellement après un échec (secondes)
+RETRY_MIN_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    """Date d'expiration (exp) d'un jeton JWT, sans vérifier sa signature"""
+    try:
+        from jose import jwt
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except Exception:
+        return None
+    return float(exp) if exp else None
+
+class TokenManager:
+    """Jeton d'accès client credentials, partagé et renouvelé avant expiration"""
+
+    def __init__(
+        self,
+        token_url: str,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        refresh_margin: float = INSEE_TOKEN_REFRESH_MARGIN
+    ):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.token: Optional[str] = None
+        self.expires_at = 0.0
+        self._refresh_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+        self._scheduler: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    def header(self) -> Dict[str, str]:
+        """En-tête Authorization du jeton courant (vide sans identifiants ou sans jeton)"""
+        if self.token is None:
+            return {}
+        return {"Authorization": f"Bearer {self.token}"}
+
+    # ============ OBTENTION ============
+
+    def _store(self, data: Dict[str, Any]) -> None:
+        token = data["access_token"]
+        now = time.time()
+        if data.get("expires_in"):
+            expires_at = now + float(data["expires_in"])
+        else:
+            expires_at = _jwt_expiry(token) or now + DEFAULT_TOKEN_LIFETIME
+        lifetime = max(0.0, expires_at - now)
+        self.token = token
+        self.expires_at = expires_at
+        self._refresh_at = now + max(lifetime - self.refresh_margin, lifetime / 2)
+        self.refreshes += 1
+
+    def _request(self) -> Tuple[Dict[str, str], Tuple[str, str]]:
+        return {"grant_type": "client_credentials"}, (self.client_id, self.client_secret)
+
+    async def _fetch(self) -> None:
+        data, auth = self._request()
+        try:
+            response = await get_http_client("sirene").post(self.token_url, data=data, auth=auth, timeout=10)
+            response.raise_for_status()
+            self._store(response.json())
+        except Exception:
+            self.failures += 1
+            raise
+
+    def fetch_sync(self) -> None:
+        """Obtention bloquante d'un jeton (fonctions synchrones, scripts)"""
+        data, auth = self._request()
+        try:
+            response = get_sync_http_client("sirene").post(self.token_url, data=data, auth=auth, timeout=10)
+            response.raise_for_status()
+            self._store(response.json())
+        except Exception:
+            self.failures += 1
+            raise
+
+    def ensure_sync(self) -> None:
+        """Version synchrone : obtient un jeton s'il n'y en a pas de valide"""
+        if self.enabled and (self.token is None or time.time() >= self.expires_at):
+            self.fetch_sync()
+
+    async def refresh(self, stale: Optional[str] = None) -> None:
+        """
+        Renouvelle le jeton ; les appels simultanés partagent un seul renouvellement
+
+        stale : jeton refusé par l'API ; s'il a déjà été remplacé, rien à faire.
+        """
+        if stale is not None and self.token != stale:
+            return
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._fetch())
+            self._refreshing.add_done_callback(self._refreshed)
+        await asyncio.shield(self._refreshing)
+
+    def _refreshed(self, task: asyncio.Task) -> None:
+        self._refreshing = None
+        # Évite l'avertissement "exception never retrieved" si plus personne n'attend
+        if not task.cancelled():
+            task.exception()
+
+    # ============ RENOUVELLEMENT EN TÂCHE DE FOND ============
+
+    async def _refresh_loop(self) -> None:
+        delay = RETRY_MIN_DELAY
+        while True:
+            await asyncio.sleep(max(0.0, self._refresh_at - time.time()))
+            if time.time() < self._refresh_at:
+                # Jeton renouvelé entre-temps (premier jeton, 401)
+                continue
+            try:
+                await self.refresh()
+                delay = RETRY_MIN_DELAY
+            except Exception as e:
+                print(f"Erreur lors du renouvellement du jeton INSEE: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    async def start(self) -> None:
+        """Obtient le premier jeton et démarre le renouvellement en tâche de fond"""
+        if not self.enabled or self._scheduler is not None:
+            return
+        # Tâche créée avant l'attente : deux premiers appels simultanés n'en lancent qu'une
+        self._scheduler = asyncio.create_task(self._refresh_loop())
+        try:
+            await self.refresh()
+        except Exception as e:
+            # L'application démarre quand même : la tâche de fond réessaie
+            print(f"Erreur lors de l'obtention du jeton INSEE: {e}")
+
+    async def ensure(self) -> None:
+        """
+        Avant un appel Sirene : démarre le renouvellement s'il ne l'est pas
+        encore (LAZY_STARTUP), et renouvelle un jeton absent ou expiré
+        """
+        if not self.enabled:
+            return
+        if self._scheduler is None:
+            await self.start()
+        if self.token is None or time.time() >= self.expires_at:
+            await self.refresh()
+
+    async def stop(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            await asyncio.gather(self._scheduler, return_exceptions=True)
+            self._scheduler = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "expires_in": round(self.expires_at - time.time()) if self.token is not None else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures
+        }
+
+insee_tokens = TokenManager(INSEE_TOKEN_URL, INSEE_CLIENT_ID, INSEE_CLIENT_SECRET)
+
+async def start_insee_auth() -> None:
+    """Premier jeton et renouvellement automatique (appelé au démarrage de l'application)"""
+    await insee_tokens.start()
+
+async def stop_insee_auth() -> None:
+    await insee_tokens.stop()
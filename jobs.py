@@ -0,0 +1,338 @@
+"""
+Jobs de vérification asynchrones
+================================
+Pour les gros lots (revues KYB), POST /api/v1/jobs enregistre les documents
+et rend la main aussitôt avec un identifiant de job ; GET /api/v1/jobs/{id}
+donne l'avancement et les résultats, page par page.
+
+- Stockage : SQLite (JOBS_DB_URL=sqlite:///chemin/jobs.db), partagé par tous
+  les processus de la machine. Les jobs survivent à un redémarrage.
+- Traitement : JOBS_WORKERS workers asyncio par processus, démarrés avec
+  l'application, ou un processus dédié (python jobs.py, avec JOBS_WORKERS=0
+  côté API). Chaque worker réserve un paquet de documents pour une durée
+  limitée (bail). Les documents d'un worker arrêté sont rendus à la file ;
+  ceux d'un processus tué sont repris à l'expiration du bail.
+- Quotas amont : tous les workers, tous processus confondus, puisent dans un
+  même budget d'appels par service (INSEE, VIES), compté dans la base.
+  Les réponses servies par le cache ou l'index local ne consomment rien.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from batch import run_batch
+from serialization import dumps, loads
+
+JOBS_DB_URL = os.getenv("JOBS_DB_URL", "sqlite:///jobs.db")
+# Workers par processus (0 : traitement confié à un processus dédié)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+# Documents réservés à la fois par un worker, et appels amont simultanés
+JOBS_CHUNK = int(os.getenv("JOBS_CHUNK", "50"))
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "10"))
+# Durée (secondes) d'une réservation avant reprise par un autre worker
+JOBS_LEASE = float(os.getenv("JOBS_LEASE", "300"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+JOBS_MAX_DOCUMENTS = int(os.getenv("JOBS_MAX_DOCUMENTS", "100000"))
+
+# Budget d'appels amont des jobs : LIMIT appels par fenêtre de PERIOD secondes
+# (0 : pas de limite). Par défaut, le quota public de l'API Sirene.
+JOBS_SIRENE_LIMIT = int(os.getenv("JOBS_SIRENE_LIMIT", "30"))
+JOBS_SIRENE_PERIOD = float(os.getenv("JOBS_SIRENE_PERIOD", "60"))
+JOBS_VIES_LIMIT = int(os.getenv("JOBS_VIES_LIMIT", "10"))
+JOBS_VIES_PERIOD = float(os.getenv("JOBS_VIES_PERIOD", "1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    document TEXT NOT NULL,
+    result TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    UNIQUE (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS job_items_pending ON job_items (id) WHERE result IS NULL;
+CREATE TABLE IF NOT EXISTS rate_budget (
+    name TEXT NOT NULL,
+    window INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (name, window)
+);
+"""
+
+# Un document réservé : (id de ligne, id du job, position dans le job, document)
+Item = Tuple[int, str, int, Dict[str, Any]]
+
+# ============ STOCKAGE ============
+
+class JobStore:
+    """
+    File de jobs persistante dans un fichier SQLite en mode WAL
+
+    Une connexion par thread, comme SQLiteBackend : les appels se font depuis
+    la boucle via asyncio.to_thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction en écriture, prise d'emblée pour sérialiser les réservations"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def create_job(self, owner: str, documents: List[Dict[str, Any]]) -> str:
+        """Enregistre un job et ses documents, renvoie l'identifiant du job"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, owner, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, owner, len(documents), now, now)
+            )
+            conn.executemany(
+                "INSERT INTO job_items (job_id, idx, document) VALUES (?, ?, ?)",
+                ((job_id, idx, dumps(doc).decode()) for idx, doc in enumerate(documents))
+            )
+        return job_id
+
+    def claim(self, limit: int, lease: float) -> List[Item]:
+        """Réserve les plus anciens documents non traités et sans bail en cours"""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, job_id, idx, document FROM job_items "
+                "WHERE result IS NULL AND lease_until < ? ORDER BY id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE job_items SET lease_until = ? WHERE id = ?",
+                ((now + lease, row[0]) for row in rows)
+            )
+        return [(item_id, job_id, idx, loads(doc)) for item_id, job_id, idx, doc in rows]
+
+    def release(self, item_ids: List[int]) -> None:
+        """Rend des documents réservés à la file, sans attendre la fin du bail"""
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE job_items SET lease_until = 0 WHERE id = ? AND result IS NULL",
+                ((item_id,) for item_id in item_ids)
+            )
+
+    def complete(self, done: List[Tuple[int, str, Dict[str, Any]]]) -> None:
+        """
+        Enregistre les résultats (id de ligne, id du job, résultat)
+
+        Un document déjà terminé par un autre worker n'est pas compté deux fois.
+        """
+        processed: Dict[str, int] = {}
+        with self._transaction() as conn:
+            for item_id, job_id, result in done:
+                cursor = conn.execute(
+                    "UPDATE job_items SET result = ? WHERE id = ? AND result IS NULL",
+                    (dumps(result).decode(), item_id)
+                )
+                processed[job_id] = processed.get(job_id, 0) + cursor.rowcount
+            now = time.time()
+            conn.executemany(
+                "UPDATE jobs SET processed = processed + ?, updated_at = ? WHERE id = ?",
+                ((count, now, job_id) for job_id, count in processed.items())
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT id, owner, total, processed, created_at, updated_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, owner, total, processed, created_at, updated_at = row
+        return {
+            "job_id": job_id,
+            "owner": owner,
+            "status": "done" if processed >= total else ("running" if processed else "queued"),
+            "total": total,
+            "processed": processed,
+            "created_at": datetime.fromtimestamp(created_at).isoformat(),
+            "updated_at": datetime.fromtimestamp(updated_at).isoformat()
+        }
+
+    def get_results(self, job_id: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """Résultats disponibles parmi les documents [offset, offset + limit)"""
+        rows = self._conn().execute(
+            "SELECT result FROM job_items WHERE job_id = ? AND idx >= ? AND idx < ? "
+            "AND result IS NOT NULL ORDER BY idx",
+            (job_id, offset, offset + limit)
+        ).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def take_budget(self, name: str, limit: int, period: float) -> float:
+        """
+        Consomme un appel du budget name (limit appels par fenêtre de period s)
+
+        Returns:
+            0 si l'appel est accordé, sinon le délai (s) avant la fenêtre suivante
+        """
+        now = time.time()
+        window = int(now // period)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO rate_budget (name, window, used) VALUES (?, ?, 1) "
+                "ON CONFLICT (name, window) DO UPDATE SET used = used + 1 WHERE used < ?",
+                (name, window, limit)
+            )
+            conn.execute("DELETE FROM rate_budget WHERE name = ? AND window < ?", (name, window))
+        if cursor.rowcount:
+            return 0
+        return (window + 1) * period - now
+
+def store_from_url(url: str) -> JobStore:
+    """Construit le stockage des jobs décrit par une URL"""
+    if url.startswith("sqlite:///"):
+        return JobStore(url[len("sqlite:///"):])
+    raise ValueError(f"Stockage de jobs non supporté: {url}")
+
+_store: Optional[JobStore] = None
+
+def get_job_store() -> JobStore:
+    """Stockage configuré par JOBS_DB_URL, ouvert au premier appel"""
+    global _store
+    if _store is None:
+        _store = store_from_url(JOBS_DB_URL)
+    return _store
+
+# ============ BUDGET D'APPELS AMONT ============
+
+class RateBudget:
+    """Au plus limit appels par fenêtre de period secondes, partagé via le JobStore"""
+
+    def __init__(self, store: JobStore, name: str, limit: int, period: float):
+        self.store = store
+        self.name = name
+        self.limit = limit
+        self.period = period
+
+    async def acquire(self) -> None:
+        """Attend qu'un appel soit disponible dans le budget, puis le consomme"""
+        while True:
+            wait = await asyncio.to_thread(self.store.take_budget, self.name, self.limit, self.period)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+def upstream_budgets(store: JobStore) -> Dict[str, RateBudget]:
+    """Budgets des jobs par service amont, au format attendu par run_batch"""
+    budgets = {}
+    if JOBS_SIRENE_LIMIT > 0:
+        budgets["sirene"] = RateBudget(store, "sirene", JOBS_SIRENE_LIMIT, JOBS_SIRENE_PERIOD)
+    if JOBS_VIES_LIMIT > 0:
+        budgets["vies"] = RateBudget(store, "vies", JOBS_VIES_LIMIT, JOBS_VIES_PERIOD)
+    return budgets
+
+# ============ WORKERS ============
+
+async def process_chunk(store: JobStore, budgets: Dict[str, RateBudget]) -> int:
+    """
+    Réserve et traite un paquet de documents
+
+    Returns:
+        Nombre de documents traités (0 si la file est vide)
+    """
+    items = await asyncio.to_thread(store.claim, JOBS_CHUNK, JOBS_LEASE)
+    if not items:
+        return 0
+    try:
+        documents = [SimpleNamespace(**doc) for _, _, _, doc in items]
+        results = await run_batch(documents, concurrency=JOBS_CONCURRENCY, deadline=None, budgets=budgets)
+    except BaseException:
+        # Arrêt du worker ou erreur inattendue : les documents retournent dans la file
+        await asyncio.shield(asyncio.to_thread(store.release, [item[0] for item in items]))
+        raise
+    done = []
+    for (item_id, job_id, idx, _), result in zip(items, results):
+        result["index"] = idx
+        done.append((item_id, job_id, result))
+    await asyncio.to_thread(store.complete, done)
+    return len(done)
+
+async def _worker(store: JobStore, budgets: Dict[str, RateBudget]) -> None:
+    while True:
+        try:
+            processed = await process_chunk(store, budgets)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Erreur du worker de jobs: {e}")
+            processed = 0
+        if not processed:
+            await asyncio.sleep(JOBS_POLL_INTERVAL)
+
+_workers: List[asyncio.Task] = []
+
+async def start_job_workers(count: int = JOBS_WORKERS) -> None:
+    """Démarre les workers du processus (appelé au démarrage de l'application)"""
+    if count <= 0:
+        return
+    store = get_job_store()
+    budgets = upstream_budgets(store)
+    for _ in range(count):
+        _workers.append(asyncio.create_task(_worker(store, budgets)))
+
+async def stop_job_workers() -> None:
+    """Arrête les workers ; les documents en cours sont rendus à la file"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+if __name__ == "__main__":
+    from upstream import start_http_client, close_http_client
+    from insee_auth import start_insee_auth, stop_insee_auth
+
+    async def main():
+        await start_http_client()
+        await start_insee_auth()
+        await start_job_workers(max(1, JOBS_WORKERS))
+        try:
+            await asyncio.gather(*_workers)
+        finally:
+            await stop_job_workers()
+            await stop_insee_auth()
+            await close_http_client()
+
+    asyncio.run(main())
@@ -6,28 +6,56 @@ Auteur: DocVerify France
 Version: 1.0.0
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
-import uvicorn
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 import hashlib
 import os
+import asyncio
+from contextlib import asynccontextmanager
 
 from validators import (
     validate_siret,
     validate_siren,
     validate_tva_intracommunautaire,
     validate_iban_fr,
-    get_company_info_from_sirene,
-    check_tva_vies
+    get_company_info_from_sirene_async,
+    check_tva_vies_async,
+    sirene_cache,
+    vies_cache,
+    vies_flight,
+    sirene_batcher,
+    sirene_breaker,
+    vies_breakers,
+    sirene_refresher,
+    vies_refresher,
+    normalize_identifier,
+    error_code
 )
+from upstream import start_http_client, close_http_client, pool_stats
+from insee_auth import insee_tokens, start_insee_auth, stop_insee_auth
+from batch import run_batch
+from stream_verify import stream_verification, NDJSONStreamingResponse
+from jobs import get_job_store, start_job_workers, stop_job_workers, JOBS_MAX_DOCUMENTS
+from quota import rate_limiter, start_usage_flusher, stop_usage_flusher
+from metrics import MetricsMiddleware, record_validation_failure, render_metrics
+from sirene_index import get_sirene_index
+from bank_directory import get_bank_directory
+from serialization import FastJSONResponse, api_response
+from rejection import RejectionLane, rejection_response, rejection_stats
+from prewarm import start_prewarm, stop_prewarm, prewarm_stats
+from openapi_schema import install_openapi
+from response_cache import response_cache, response_key, sirene_response_ttl, vies_response_ttl, RESPONSE_CACHE_TTL
 
 # Configuration
 API_VERSION = "1.0.0"
 API_TITLE = "API Vérification Documents France"
+# Démarrage à froid (serverless) : pools amont et jeton INSEE créés au
+# premier appel amont plutôt qu'au démarrage
+LAZY_STARTUP = os.getenv("LAZY_STARTUP", "false").lower() == "true"
 API_DESCRIPTION = """
 ## 🇫🇷 API de Vérification de Documents Français
 
@@ -54,8 +82,27 @@ Cette API vous permet de vérifier en temps réel la validité de documents offi
 - Enrichissement de données
 """
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ouvre les pools de connexions amont, obtient le jeton INSEE (différés avec LAZY_STARTUP), démarre les workers de jobs, le flush des quotas et le préchargement ; arrêt inverse"""
+    await start_http_client(eager=not LAZY_STARTUP)
+    if not LAZY_STARTUP:
+        await start_insee_auth()
+    await start_job_workers()
+    await start_usage_flusher()
+    await start_prewarm()
+    yield
+    await stop_prewarm()
+    await sirene_refresher.stop()
+    await vies_refresher.stop()
+    await stop_usage_flusher()
+    await stop_job_workers()
+    await stop_insee_auth()
+    await close_http_client()
+
 # Initialiser l'app FastAPI
 app = FastAPI(
+    lifespan=lifespan,
     title=API_TITLE,
     description=API_DESCRIPTION,
     version=API_VERSION,
@@ -67,7 +114,14 @@ app = FastAPI(
     }
 )
 
+# Schéma OpenAPI précalculé s'il est à jour (openapi_schema.py)
+install_openapi(app)
+
 # CORS
+# Voie rapide des entrées invalides, au plus près de l'application : les
+# réponses passent par les middlewares CORS et métriques. check_api_key
+# est défini plus bas.
+app.add_middleware(RejectionLane, authorize=lambda x_api_key: check_api_key(x_api_key), routes=app.routes)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -76,6 +130,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métriques Prometheus (latence par route), voir /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Modèles de données
 class SIRETRequest(BaseModel):
     siret: str = Field(..., description="Numéro SIRET à 14 chiffres", example="12345678901234")
@@ -92,25 +149,86 @@ class TVARequest(BaseModel):
 class IBANRequest(BaseModel):
     iban: str = Field(..., description="IBAN français (27 caractères)", example="FR7612345678901234567890123")
 
+class BatchItem(BaseModel):
+    type: Literal["siret", "siren", "tva", "iban"] = Field(..., description="Type de document", example="siret")
+    value: str = Field(..., description="Numéro à vérifier", example="12345678901234")
+    include_company_data: bool = Field(default=True, description="Inclure les données de l'entreprise (SIRET/SIREN)")
+    verify_vies: bool = Field(default=True, description="Vérifier avec VIES (TVA)")
+
+class BatchItemResult(BaseModel):
+    index: int
+    type: str
+    value: str
+    success: bool
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    code: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    success: bool
+    results: List[BatchItemResult]
+    total: int
+
+class JobCreated(BaseModel):
+    job_id: str
+    status: str
+    total: int
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "done"]
+    total: int
+    processed: int
+    created_at: str
+    updated_at: str
+    results: List[BatchItemResult]
+    offset: int
+    next_offset: Optional[int] = None
+
 class APIResponse(BaseModel):
     success: bool
     data: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    code: Optional[str] = None
     timestamp: str
 
 # Système d'authentification simple (à améliorer en production)
+# rate_limit : requêtes par seconde, burst : rafale maximale
 API_KEYS = {
-    "demo_key_123": {"name": "Demo User", "tier": "free", "daily_limit": 100},
-    "premium_key_456": {"name": "Premium User", "tier": "premium", "daily_limit": 10000}
+    "demo_key_123": {"name": "Demo User", "tier": "free", "daily_limit": 100, "rate_limit": 2, "burst": 10},
+    "premium_key_456": {"name": "Premium User", "tier": "premium", "daily_limit": 10000, "rate_limit": 50, "burst": 100}
 }
 
-def verify_api_key(x_api_key: str = Header(None)):
-    """Vérifie la clé API - Retourne 403 si manquante ou invalide"""
+def check_api_key(x_api_key: Optional[str]) -> dict:
+    """
+    Vérifie la clé API - Lève une erreur 403 si manquante ou invalide
+    
+    Applique aussi le débit et le quota journalier de la clé (429 au-delà,
+    avec un en-tête Retry-After).
+    """
     if x_api_key is None:
         raise HTTPException(status_code=403, detail="Clé API manquante")
     if x_api_key not in API_KEYS:
         raise HTTPException(status_code=403, detail="Clé API invalide")
-    return API_KEYS[x_api_key]
+    
+    user = API_KEYS[x_api_key]
+    allowed, retry_after, error_msg = rate_limiter.check(
+        x_api_key,
+        rate_limit=user["rate_limit"],
+        burst=user["burst"],
+        daily_limit=user["daily_limit"]
+    )
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=error_msg,
+            headers={"Retry-After": str(retry_after)}
+        )
+    return {**user, "used_today": rate_limiter.used_today(x_api_key)}
+
+async def verify_api_key(x_api_key: str = Header(None)):
+    """Dépendance des routes authentifiées (voir check_api_key)"""
+    return check_api_key(x_api_key)
 
 # Routes
 
@@ -125,20 +243,54 @@ async def root():
             "siret": "/api/v1/verify/siret",
             "siren": "/api/v1/verify/siren",
             "tva": "/api/v1/verify/tva",
-            "iban": "/api/v1/verify/iban"
+            "iban": "/api/v1/verify/iban",
+            "batch": "/api/v1/verify/batch",
+            "file": "/api/v1/verify/file",
+            "jobs": "/api/v1/jobs"
         }
     }
 
 @app.get("/health")
 async def health_check():
     """Health check de l'API"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    sirene_index = get_sirene_index()
+    bank_directory = get_bank_directory()
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "cache": {
+            "sirene": {**sirene_cache.stats(), "bulk": sirene_batcher.stats(), "refresh": sirene_refresher.stats()},
+            "vies": {**vies_cache.stats(), **vies_flight.stats(), "refresh": vies_refresher.stats()},
+            "responses": response_cache.stats(),
+            "prewarm": prewarm_stats()
+        },
+        "circuit_breakers": {
+            "sirene": sirene_breaker.stats(),
+            "vies": vies_breakers.stats()
+        },
+        "upstream_pools": {
+            "sirene": pool_stats("sirene"),
+            "vies": pool_stats("vies")
+        },
+        "insee_auth": insee_tokens.stats(),
+        "rejection_lane": rejection_stats(),
+        "sirene_index": sirene_index.stats() if sirene_index is not None else None,
+        "bank_directory": bank_directory.stats() if bank_directory is not None else None,
+        "rate_limiter": rate_limiter.stats()
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Métriques au format Prometheus"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 # ============ ENDPOINTS DE VÉRIFICATION ============
 
 @app.post("/api/v1/verify/siret", response_model=APIResponse)
 async def verify_siret_endpoint(
     request: SIRETRequest,
+    http_request: Request,
     user: dict = Depends(verify_api_key)
 ):
     """
@@ -152,33 +304,34 @@ async def verify_siret_endpoint(
     - Données de l'entreprise (si demandé)
     - Statut de l'établissement
     """
+    siret = normalize_identifier("siret", request.siret)
+    cache_key = response_key("siret", siret, company=request.include_company_data)
+    cached = await response_cache.lookup(http_request, cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         # Validation format
         is_valid, error_msg = validate_siret(request.siret)
         
         if not is_valid:
-            return APIResponse(
-                success=False,
-                error=error_msg,
-                timestamp=datetime.now().isoformat()
-            )
+            record_validation_failure("siret", error_code(error_msg))
+            return rejection_response(error_msg)
         
         response_data = {
-            "siret": request.siret,
+            "siret": siret,
             "format_valid": True
         }
+        ttl = RESPONSE_CACHE_TTL
         
         # Récupérer les données entreprise si demandé
         if request.include_company_data:
-            company_data = get_company_info_from_sirene(request.siret, "siret")
+            company_data = await get_company_info_from_sirene_async(siret, "siret")
             if company_data:
                 response_data["company"] = company_data
+            ttl = sirene_response_ttl(company_data)
         
-        return APIResponse(
-            success=True,
-            data=response_data,
-            timestamp=datetime.now().isoformat()
-        )
+        return await response_cache.store(http_request, cache_key, api_response(True, response_data), ttl)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -186,6 +339,7 @@ async def verify_siret_endpoint(
 @app.post("/api/v1/verify/siren", response_model=APIResponse)
 async def verify_siren_endpoint(
     request: SIRENRequest,
+    http_request: Request,
     user: dict = Depends(verify_api_key)
 ):
     """
@@ -199,33 +353,34 @@ async def verify_siren_endpoint(
     - Données de l'entreprise (si demandé)
     - Liste des établissements
     """
+    siren = normalize_identifier("siren", request.siren)
+    cache_key = response_key("siren", siren, company=request.include_company_data)
+    cached = await response_cache.lookup(http_request, cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         # Validation format
         is_valid, error_msg = validate_siren(request.siren)
         
         if not is_valid:
-            return APIResponse(
-                success=False,
-                error=error_msg,
-                timestamp=datetime.now().isoformat()
-            )
+            record_validation_failure("siren", error_code(error_msg))
+            return rejection_response(error_msg)
         
         response_data = {
-            "siren": request.siren,
+            "siren": siren,
             "format_valid": True
         }
+        ttl = RESPONSE_CACHE_TTL
         
         # Récupérer les données entreprise si demandé
         if request.include_company_data:
-            company_data = get_company_info_from_sirene(request.siren, "siren")
+            company_data = await get_company_info_from_sirene_async(siren, "siren")
             if company_data:
                 response_data["company"] = company_data
+            ttl = sirene_response_ttl(company_data)
         
-        return APIResponse(
-            success=True,
-            data=response_data,
-            timestamp=datetime.now().isoformat()
-        )
+        return await response_cache.store(http_request, cache_key, api_response(True, response_data), ttl)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -233,6 +388,7 @@ async def verify_siren_endpoint(
 @app.post("/api/v1/verify/tva", response_model=APIResponse)
 async def verify_tva_endpoint(
     request: TVARequest,
+    http_request: Request,
     user: dict = Depends(verify_api_key)
 ):
     """
@@ -246,33 +402,34 @@ async def verify_tva_endpoint(
     - Statut VIES (si demandé)
     - Informations entreprise associée
     """
+    numero_tva = normalize_identifier("tva", request.numero_tva)
+    cache_key = response_key("tva", numero_tva, vies=request.verify_vies)
+    cached = await response_cache.lookup(http_request, cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         # Validation format
         is_valid, country, error_msg = validate_tva_intracommunautaire(request.numero_tva)
         
         if not is_valid:
-            return APIResponse(
-                success=False,
-                error=error_msg,
-                timestamp=datetime.now().isoformat()
-            )
+            record_validation_failure("tva", error_code(error_msg))
+            return rejection_response(error_msg)
         
         response_data = {
-            "numero_tva": request.numero_tva.upper(),
+            "numero_tva": numero_tva,
             "format_valid": True,
             "country_code": country
         }
+        ttl = RESPONSE_CACHE_TTL
         
         # Vérification VIES si demandé
         if request.verify_vies:
-            vies_result = check_tva_vies(request.numero_tva)
+            vies_result = await check_tva_vies_async(numero_tva)
             response_data["vies"] = vies_result
+            ttl = vies_response_ttl(vies_result)
         
-        return APIResponse(
-            success=True,
-            data=response_data,
-            timestamp=datetime.now().isoformat()
-        )
+        return await response_cache.store(http_request, cache_key, api_response(True, response_data), ttl)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -280,6 +437,7 @@ async def verify_tva_endpoint(
 @app.post("/api/v1/verify/iban", response_model=APIResponse)
 async def verify_iban_endpoint(
     request: IBANRequest,
+    http_request: Request,
     user: dict = Depends(verify_api_key)
 ):
     """
@@ -293,38 +451,40 @@ async def verify_iban_endpoint(
     - Validité de la clé de contrôle
     - Détails du compte (code banque, guichet, compte, clé)
     """
+    cache_key = response_key("iban", normalize_identifier("iban", request.iban))
+    cached = await response_cache.lookup(http_request, cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         # Validation IBAN
         is_valid, details, error_msg = validate_iban_fr(request.iban)
         
         if not is_valid:
-            return APIResponse(
-                success=False,
-                error=error_msg,
-                timestamp=datetime.now().isoformat()
-            )
+            record_validation_failure("iban", error_code(error_msg))
+            return rejection_response(error_msg)
         
-        return APIResponse(
-            success=True,
-            data=details,
-            timestamp=datetime.now().isoformat()
-        )
+        return await response_cache.store(http_request, cache_key, api_response(True, details), RESPONSE_CACHE_TTL)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ============ ENDPOINT BATCH (Premium) ============
 
-@app.post("/api/v1/verify/batch")
+@app.post("/api/v1/verify/batch", response_model=BatchResponse)
 async def verify_batch_endpoint(
-    requests: list,
+    documents: List[BatchItem],
     user: dict = Depends(verify_api_key)
 ):
     """
     Vérification en lot (réservé aux utilisateurs Premium)
     
-    Permet de vérifier plusieurs documents en une seule requête.
-    Maximum 100 documents par batch.
+    Permet de vérifier plusieurs documents (SIRET, SIREN, TVA, IBAN) en une
+    seule requête. Maximum 100 documents par batch.
+    
+    Les validations locales sont faites en une passe, puis les appels INSEE
+    et VIES sont lancés en parallèle. Les résultats sont renvoyés dans l'ordre
+    des documents, avec une erreur par document le cas échéant.
     """
     if user["tier"] != "premium":
         raise HTTPException(
@@ -332,22 +492,121 @@ async def verify_batch_endpoint(
             detail="Fonctionnalité réservée aux utilisateurs Premium"
         )
     
-    if len(requests) > 100:
+    if len(documents) > 100:
         raise HTTPException(
             status_code=400,
             detail="Maximum 100 documents par batch"
         )
     
-    results = []
-    for req in requests:
-        # Traiter chaque requête...
-        pass
+    results = await run_batch(documents)
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "results": results,
         "total": len(results)
-    }
+    })
+
+@app.post("/api/v1/verify/file")
+async def verify_file_endpoint(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    type: Optional[Literal["siret", "siren", "tva", "iban"]] = None,
+    enrich: bool = False,
+    user: dict = Depends(verify_api_key)
+):
+    """
+    Vérification d'un fichier complet (réservé aux utilisateurs Premium)
+    
+    Le corps de la requête est un fichier CSV (avec en-tête, colonnes `value`
+    et `type`) ou NDJSON (un objet `{"type", "value"}` par ligne), sans limite
+    de taille. Le format est déduit du Content-Type si `format` est omis ;
+    `type` fixe le type de document pour les fichiers sans colonne `type`.
+    
+    Les résultats sont renvoyés en NDJSON (`application/x-ndjson`), dans
+    l'ordre du fichier, au fur et à mesure de la lecture. La dernière ligne
+    est une synthèse : `{"summary": true, "total", "valid", "invalid", "error"}`.
+    
+    Avec `enrich=true`, les données Sirene et VIES sont ajoutées comme pour
+    l'endpoint batch.
+    """
+    if user["tier"] != "premium":
+        raise HTTPException(
+            status_code=403,
+            detail="Fonctionnalité réservée aux utilisateurs Premium"
+        )
+    
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    
+    return NDJSONStreamingResponse(
+        stream_verification(request.stream(), format, default_type=type, enrich=enrich)
+    )
+
+# ============ JOBS ASYNCHRONES (Premium) ============
+
+@app.post("/api/v1/jobs", response_model=JobCreated, status_code=202)
+async def create_job_endpoint(
+    documents: List[BatchItem],
+    user: dict = Depends(verify_api_key)
+):
+    """
+    Crée un job de vérification (réservé aux utilisateurs Premium)
+    
+    Même format que l'endpoint batch, jusqu'à JOBS_MAX_DOCUMENTS documents.
+    Le job est traité en arrière-plan : suivre son avancement avec
+    `GET /api/v1/jobs/{job_id}`.
+    """
+    if user["tier"] != "premium":
+        raise HTTPException(
+            status_code=403,
+            detail="Fonctionnalité réservée aux utilisateurs Premium"
+        )
+    
+    if not documents:
+        raise HTTPException(status_code=400, detail="Aucun document à vérifier")
+    
+    if len(documents) > JOBS_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximum {JOBS_MAX_DOCUMENTS} documents par job"
+        )
+    
+    job_id = await asyncio.to_thread(
+        get_job_store().create_job,
+        user["name"],
+        [doc.model_dump() for doc in documents]
+    )
+    
+    return {"job_id": job_id, "status": "queued", "total": len(documents)}
+
+@app.get("/api/v1/jobs/{job_id}", response_model=JobStatus)
+async def get_job_endpoint(
+    job_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    user: dict = Depends(verify_api_key)
+):
+    """
+    Avancement et résultats d'un job
+    
+    Les résultats sont paginés par position dans le job : la page contient
+    les documents déjà traités parmi `[offset, offset + limit)`. Tant que le
+    job n'est pas terminé, une page peut donc être incomplète.
+    """
+    store = get_job_store()
+    job = await asyncio.to_thread(store.get_job, job_id)
+    
+    if job is None or job.pop("owner") != user["name"]:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    
+    results = await asyncio.to_thread(store.get_results, job_id, offset, limit)
+    
+    return FastJSONResponse({
+        **job,
+        "results": results,
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < job["total"] else None
+    })
 
 # ============ STATISTIQUES ============
 
@@ -358,11 +617,14 @@ async def get_stats(user: dict = Depends(verify_api_key)):
         "user": user["name"],
         "tier": user["tier"],
         "daily_limit": user["daily_limit"],
-        "used_today": 0,  # À implémenter avec une vraie DB
-        "remaining": user["daily_limit"]
+        "rate_limit": user["rate_limit"],
+        "used_today": user["used_today"],
+        "remaining": max(0, user["daily_limit"] - user["used_today"])
     }
 
 if __name__ == "__main__":
+    import uvicorn
+
     # Récupérer le port depuis la variable d'environnement (Render le fournit)
     port = int(os.getenv("PORT", 8000))
     # En production, désactiver le reload
@@ -0,0 +1,218 @@
+"""
+Métriques Prometheus
+====================
+Exposées sur /metrics :
+
+- docverify_http_request_duration_seconds : latence par route, méthode et statut ;
+- docverify_upstream_request_duration_seconds, docverify_upstream_requests_total,
+  docverify_upstream_in_flight : appels INSEE / VIES (latence, issue, en cours) ;
+- docverify_upstream_pool_connections, docverify_upstream_pool_max_connections :
+  occupation des pools de connexions amont (taux d'utilisation =
+  active / max, sommés sur les workers) ;
+- docverify_cache_requests_total : succès/échecs des caches (taux de succès =
+  (hit + shared_hit) / total) ;
+- docverify_validation_failures_total : échecs de validation par document et
+  code d'erreur (champ code des réponses) ;
+- docverify_fast_rejections_total : parmi eux, requêtes unitaires refusées
+  par la voie rapide, par code d'erreur.
+
+En mode multi-processus (gunicorn), définir PROMETHEUS_MULTIPROC_DIR vers un
+répertoire vide au démarrage : chaque worker écrit ses valeurs dans des
+fichiers mmap, agrégées à la lecture de /metrics. Le coût par mesure est de
+l'ordre de la microseconde ; les séries étiquetées sont créées une fois puis
+réutilisées.
+"""
+
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest
+)
+from prometheus_client import multiprocess
+
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UPSTREAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+http_request_duration = Histogram(
+    "docverify_http_request_duration_seconds",
+    "Durée de traitement des requêtes HTTP",
+    ["route", "method", "status"],
+    buckets=HTTP_BUCKETS
+)
+upstream_request_duration = Histogram(
+    "docverify_upstream_request_duration_seconds",
+    "Durée des appels aux services amont",
+    ["upstream"],
+    buckets=UPSTREAM_BUCKETS
+)
+upstream_requests = Counter(
+    "docverify_upstream_requests_total",
+    "Appels aux services amont, par issue (code HTTP, timeout, error, circuit_open)",
+    ["upstream", "outcome"]
+)
+upstream_in_flight = Gauge(
+    "docverify_upstream_in_flight",
+    "Appels aux services amont en cours",
+    ["upstream"],
+    multiprocess_mode="livesum"
+)
+upstream_pool_connections = Gauge(
+    "docverify_upstream_pool_connections",
+    "Connexions ouvertes des pools amont, par état (active, idle)",
+    ["upstream", "state"],
+    multiprocess_mode="livesum"
+)
+upstream_pool_max_connections = Gauge(
+    "docverify_upstream_pool_max_connections",
+    "Taille maximale des pools amont",
+    ["upstream"],
+    multiprocess_mode="livesum"
+)
+cache_requests = Counter(
+    "docverify_cache_requests_total",
+    "Lectures de cache, par résultat (hit, shared_hit, miss)",
+    ["cache", "result"]
+)
+validation_failures = Counter(
+    "docverify_validation_failures_total",
+    "Documents refusés par la validation locale, par code d'erreur",
+    ["document", "reason"]
+)
+fast_rejections = Counter(
+    "docverify_fast_rejections_total",
+    "Requêtes unitaires refusées par la voie rapide (voir rejection.py), par code d'erreur",
+    ["document", "code"]
+)
+
+# ============ REQUÊTES HTTP ============
+
+class MetricsMiddleware:
+    """Middleware ASGI : mesure chaque requête HTTP, étiquetée par modèle de route"""
+
+    def __init__(self, app):
+        self.app = app
+        self._series: Dict[Tuple[str, str, int], object] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Modèle de route (/api/v1/jobs/{job_id}) plutôt que le chemin, pour borner les séries
+            route = scope.get("route")
+            key = (getattr(route, "path", "other"), scope["method"], status)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = http_request_duration.labels(key[0], key[1], str(status))
+            series.observe(time.perf_counter() - start)
+
+# ============ APPELS AMONT ============
+
+class _UpstreamSeries:
+    """Séries d'un service amont, créées une seule fois"""
+
+    __slots__ = ("upstream", "in_flight", "duration", "outcomes")
+
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.in_flight = upstream_in_flight.labels(upstream)
+        self.duration = upstream_request_duration.labels(upstream)
+        self.outcomes: Dict[str, object] = {}
+
+    def count(self, outcome: str) -> None:
+        """Compte un appel par issue (code HTTP, timeout, error, circuit_open)"""
+        counter = self.outcomes.get(outcome)
+        if counter is None:
+            counter = self.outcomes[outcome] = upstream_requests.labels(self.upstream, outcome)
+        counter.inc()
+
+_upstream_children: Dict[str, _UpstreamSeries] = {}
+
+def _upstream_series(upstream: str) -> _UpstreamSeries:
+    series = _upstream_children.get(upstream)
+    if series is None:
+        series = _upstream_children[upstream] = _UpstreamSeries(upstream)
+    return series
+
+class UpstreamCall:
+    """
+    Mesure un appel amont (à utiliser avec with)
+
+    Renseigner status avec le code HTTP reçu ; une exception est comptée
+    comme timeout ou error. duration est disponible après le bloc.
+    """
+
+    __slots__ = ("series", "status", "duration", "_start")
+
+    def __init__(self, upstream: str):
+        self.series = _upstream_series(upstream)
+        self.status: Optional[int] = None
+        self.duration = 0.0
+
+    def __enter__(self) -> "UpstreamCall":
+        self.series.in_flight.inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self._start
+        self.series.in_flight.dec()
+        self.series.duration.observe(self.duration)
+        if exc_type is not None:
+            outcome = "timeout" if "Timeout" in exc_type.__name__ else "error"
+        else:
+            outcome = str(self.status)
+        self.series.count(outcome)
+
+def upstream_call(upstream: str) -> UpstreamCall:
+    return UpstreamCall(upstream)
+
+def record_pool_usage(upstream: str, active: int, idle: int, max_connections: int) -> None:
+    """Relevé périodique de l'occupation d'un pool de connexions (voir upstream.py)"""
+    upstream_pool_connections.labels(upstream, "active").set(active)
+    upstream_pool_connections.labels(upstream, "idle").set(idle)
+    upstream_pool_max_connections.labels(upstream).set(max_connections)
+
+def record_circuit_open(upstream: str) -> None:
+    """Appel refusé par le disjoncteur, sans contact avec le service"""
+    _upstream_series(upstream).count("circuit_open")
+
+# ============ VALIDATION ============
+
+def record_validation_failure(document: str, code: Optional[str]) -> None:
+    """Échec de validation, étiqueté par le code stable du message (validators.error_code)"""
+    validation_failures.labels(document, code or "other").inc()
+
+def record_fast_rejection(document: str, code: Optional[str]) -> None:
+    fast_rejections.labels(document, code or "other").inc()
+
+# ============ EXPOSITION ============
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Corps et Content-Type de /metrics (agrégés sur tous les workers si besoin)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,94 @@
+"""
+Schéma OpenAPI précalculé
+=========================
+FastAPI construit le schéma OpenAPI au premier appel de /openapi.json (ou
+/docs) : quelques dizaines de millisecondes, payées après chaque démarrage
+à froid. Le schéma est généré une fois, à la construction de l'image :
+
+    python openapi_schema.py --out openapi.json
+
+puis relu tel quel depuis OPENAPI_SCHEMA_FILE. L'empreinte du code qui
+décrit l'API (tous les modules de l'application chargés par main, où sont
+déclarés routes, modèles et valeurs par défaut) est rangée à côté, dans
+OPENAPI_SCHEMA_FILE.fingerprint, pour que le schéma servi reste identique
+au schéma généré. Si l'un de ces modules a changé, le fichier est ignoré et
+le schéma est généré comme avant.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+OPENAPI_SCHEMA_FILE = os.getenv("OPENAPI_SCHEMA_FILE", os.path.join(APP_DIR, "openapi.json"))
+
+def fingerprint_file(path: str) -> str:
+    """Fichier d'empreinte associé à un schéma enregistré"""
+    return f"{path}.fingerprint"
+
+def app_sources() -> List[str]:
+    """Modules de l'application chargés (noms de fichiers relatifs à APP_DIR)"""
+    sources = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and path.endswith(".py") and os.path.dirname(os.path.abspath(path)) == APP_DIR:
+            sources.add(os.path.basename(path))
+    return sorted(sources)
+
+def source_fingerprint(sources: List[str]) -> str:
+    """Empreinte (SHA-256 tronqué) des modules qui déclarent routes et modèles"""
+    digest = hashlib.sha256()
+    for name in sources:
+        digest.update(name.encode() + b"\0")
+        with open(os.path.join(APP_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def load_schema(path: str) -> Optional[Dict[str, Any]]:
+    """Schéma enregistré, ou None s'il est absent, illisible ou d'une autre version du code"""
+    try:
+        with open(fingerprint_file(path), encoding="utf-8") as f:
+            recorded = json.load(f)
+        if source_fingerprint(recorded["sources"]) != recorded["fingerprint"]:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def install_openapi(app, path: str = OPENAPI_SCHEMA_FILE) -> None:
+    """Remplace app.openapi : schéma précalculé s'il est à jour, généré sinon"""
+    generate: Callable[[], Dict[str, Any]] = app.openapi
+
+    def openapi() -> Dict[str, Any]:
+        if app.openapi_schema is None:
+            app.openapi_schema = load_schema(path) or generate()
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+def export_schema(out: str) -> Dict[str, Any]:
+    """Génère le schéma de l'application et l'écrit, avec l'empreinte des modules à côté"""
+    from fastapi import FastAPI
+
+    import main
+
+    schema = FastAPI.openapi(main.app)
+    sources = app_sources()
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False, separators=(",", ":"))
+    with open(fingerprint_file(out), "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": source_fingerprint(sources), "sources": sources}, f)
+    return schema
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère le schéma OpenAPI de l'API")
+    parser.add_argument("--out", default=OPENAPI_SCHEMA_FILE, help="Fichier JSON à écrire")
+    args = parser.parse_args()
+
+    schema = export_schema(args.out)
+    print(f"{args.out} : {len(schema.get('paths', {}))} routes")
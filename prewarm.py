@@ -0,0 +1,141 @@
+"""
+Préchargement des identifiants les plus demandés
+================================================
+Les identifiants listés dans SWR_HOT_FILE (un par ligne, type déduit du
+format ou précisé en « type,valeur » : siret, siren, tva) sont rafraîchis
+toutes les SWR_HOT_INTERVAL secondes, dès le démarrage : leurs fiches
+Sirene et résultats VIES restent en cache et frais, sans qu'une requête
+n'attende l'amont ni ne reçoive une donnée périmée.
+
+Seules les entrées absentes ou proches de leur durée « douce » (plus de
+SWR_HOT_MARGIN de celle-ci) sont rafraîchies, par paquets, avec la même
+limite de concurrence que les rafraîchissements en tâche de fond. Avec
+CACHE_BACKEND_URL, le rafraîchissement fait par un worker sert à tous.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from validators import (
+    SIRENE_SOFT_TTL,
+    VIES_SOFT_TTL,
+    normalize_identifier,
+    refresh_sirene,
+    refresh_vies,
+    validate_siren,
+    validate_siret,
+    validate_tva_intracommunautaire
+)
+
+SWR_HOT_FILE = os.getenv("SWR_HOT_FILE")
+SWR_HOT_INTERVAL = float(os.getenv("SWR_HOT_INTERVAL", "600"))
+# Part de la durée douce au-delà de laquelle une entrée est rafraîchie
+SWR_HOT_MARGIN = float(os.getenv("SWR_HOT_MARGIN", "0.8"))
+# Identifiants rafraîchis ensemble (mémoire bornée pour les longues listes)
+PREWARM_CHUNK = 100
+
+_VALIDATORS = {
+    "siret": validate_siret,
+    "siren": validate_siren,
+    "tva": validate_tva_intracommunautaire
+}
+
+def guess_type(value: str) -> Optional[str]:
+    """Type d'un identifiant d'après son format (14 ou 9 chiffres, préfixe pays)"""
+    compact = value.replace(" ", "")
+    if compact.isdigit():
+        return {14: "siret", 9: "siren"}.get(len(compact))
+    if len(compact) > 2 and compact[:2].isalpha():
+        return "tva"
+    return None
+
+def load_hot_list(path: str) -> List[Tuple[str, str]]:
+    """(type, identifiant normalisé) du fichier ; lignes vides, # et invalides ignorées"""
+    entries = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if "," in line:
+                type, value = (part.strip() for part in line.split(",", 1))
+                type = type.lower()
+            else:
+                type, value = guess_type(line), line
+            if type not in _VALIDATORS:
+                continue
+            entry = (type, normalize_identifier(type, value))
+            if not _VALIDATORS[type](entry[1])[0]:
+                continue
+            if entry not in seen:
+                seen.add(entry)
+                entries.append(entry)
+    return entries
+
+async def _refresh(type: str, identifier: str) -> bool:
+    if type == "tva":
+        return await refresh_vies(identifier, min_age=VIES_SOFT_TTL * SWR_HOT_MARGIN)
+    return await refresh_sirene(identifier, type, min_age=SIRENE_SOFT_TTL * SWR_HOT_MARGIN)
+
+class Prewarmer:
+    """Rafraîchissement périodique d'une liste d'identifiants"""
+
+    def __init__(self, entries: List[Tuple[str, str]]):
+        self.entries = entries
+        self.runs = 0
+        self.refreshed = 0
+
+    async def run_once(self) -> int:
+        """Un passage sur la liste ; nombre d'entrées rafraîchies"""
+        refreshed = 0
+        for start in range(0, len(self.entries), PREWARM_CHUNK):
+            chunk = self.entries[start:start + PREWARM_CHUNK]
+            results = await asyncio.gather(*(_refresh(t, v) for t, v in chunk), return_exceptions=True)
+            refreshed += sum(1 for r in results if r is True)
+        self.runs += 1
+        self.refreshed += refreshed
+        return refreshed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "identifiers": len(self.entries),
+            "interval": SWR_HOT_INTERVAL,
+            "runs": self.runs,
+            "refreshed": self.refreshed
+        }
+
+prewarmer: Optional[Prewarmer] = None
+_task: Optional[asyncio.Task] = None
+
+async def _prewarm_loop() -> None:
+    while True:
+        try:
+            await prewarmer.run_once()
+        except Exception as e:
+            print(f"Erreur lors du préchargement: {e}")
+        await asyncio.sleep(SWR_HOT_INTERVAL)
+
+async def start_prewarm() -> None:
+    """Charge SWR_HOT_FILE et démarre le préchargement (appelé au démarrage de l'application)"""
+    global prewarmer, _task
+    if not SWR_HOT_FILE or _task is not None:
+        return
+    try:
+        prewarmer = Prewarmer(load_hot_list(SWR_HOT_FILE))
+    except OSError as e:
+        print(f"Liste de préchargement illisible ({SWR_HOT_FILE}): {e}")
+        return
+    _task = asyncio.create_task(_prewarm_loop())
+
+async def stop_prewarm() -> None:
+    """Arrête le préchargement"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+def prewarm_stats() -> Optional[Dict[str, Any]]:
+    return prewarmer.stats() if prewarmer is not None else None
@@ -0,0 +1,201 @@
+"""
+Limitation de débit et quotas journaliers par clé API
+=====================================================
+Deux contrôles, en O(1) par requête et sans entrée/sortie sur le chemin
+de la requête :
+
+- débit : un seau à jetons en mémoire par clé (rate_limit requêtes/s,
+  rafales jusqu'à burst) ;
+- quota journalier : un compteur local par clé, ajouté au dernier total
+  partagé connu. Un flush périodique (QUOTA_FLUSH_INTERVAL) envoie les
+  incréments de toutes les clés en un seul aller-retour au backend partagé
+  (Redis, ou fichier SQLite local, voir cache.py) et récupère les totaux
+  de tous les workers.
+
+Entre deux flushs, un worker ne voit pas la consommation des autres : le
+dépassement possible est borné par (nombre de workers x requêtes reçues
+pendant QUOTA_FLUSH_INTERVAL). Sans backend partagé, chaque processus
+compte pour lui seul.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from cache import backend_from_url, shared_backend
+
+QUOTA_FLUSH_INTERVAL = float(os.getenv("QUOTA_FLUSH_INTERVAL", "1"))
+# Backend des compteurs (par défaut celui du cache)
+QUOTA_BACKEND_URL = os.getenv("QUOTA_BACKEND_URL")
+# Durée de vie d'un compteur journalier dans le backend partagé
+COUNTER_TTL = 2 * 86400
+
+class TokenBucket:
+    """Seau à jetons : rate jetons/s, capacité capacity"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Consomme un jeton
+
+        Returns:
+            0 si le jeton est accordé, sinon le délai (s) avant le prochain
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+class UsageCounter:
+    """Compteurs journaliers : incréments locaux + totaux partagés, écrits par lots"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._totals: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}
+        self.flushes = 0
+        self.backend_errors = 0
+
+    def used(self, key: str) -> int:
+        return self._totals.get(key, 0) + self._pending.get(key, 0)
+
+    def add(self, key: str, amount: int = 1) -> None:
+        self._pending[key] = self._pending.get(key, 0) + amount
+
+    async def flush(self) -> None:
+        """Envoie les incréments en attente et relit les totaux des compteurs du jour"""
+        pending, self._pending = self._pending, {}
+        prefix = _counter_key("", datetime.now())
+        for key in [k for k in self._totals if not k.startswith(prefix)]:
+            del self._totals[key]
+
+        if self.backend is None:
+            for key, amount in pending.items():
+                self._totals[key] = self._totals.get(key, 0) + amount
+            return
+
+        # Les compteurs sans incrément (amount 0) sont relus pour voir les autres workers
+        increments = {key: 0 for key in self._totals}
+        increments.update(pending)
+        if not increments:
+            return
+        try:
+            totals = await asyncio.to_thread(self.backend.incr_many, increments, COUNTER_TTL)
+        except Exception:
+            self.backend_errors += 1
+            for key, amount in pending.items():
+                self.add(key, amount)
+            return
+        self.flushes += 1
+        # Les requêtes arrivées pendant l'appel sont restées dans _pending
+        self._totals.update(totals)
+
+def _counter_key(key_id: str, now: datetime) -> str:
+    return f"docverify:usage:{now:%Y-%m-%d}:{key_id}"
+
+def _seconds_until_midnight(now: datetime) -> int:
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, int((midnight - now).total_seconds()))
+
+class RateLimiter:
+    """Débit et quota journalier par clé API"""
+
+    def __init__(self, usage: UsageCounter):
+        self.usage = usage
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._key_ids: Dict[str, str] = {}
+        self.rejected = 0
+
+    def _key_id(self, api_key: str) -> str:
+        """Empreinte de la clé : la clé elle-même n'est jamais écrite dans le backend"""
+        key_id = self._key_ids.get(api_key)
+        if key_id is None:
+            key_id = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+            self._key_ids[api_key] = key_id
+        return key_id
+
+    def used_today(self, api_key: str) -> int:
+        return self.usage.used(_counter_key(self._key_id(api_key), datetime.now()))
+
+    def check(
+        self,
+        api_key: str,
+        rate_limit: float,
+        burst: float,
+        daily_limit: int
+    ) -> Tuple[bool, Optional[int], Optional[str]]:
+        """
+        Compte une requête si la clé est dans ses limites
+
+        Returns:
+            (allowed, retry_after en secondes, error_message)
+        """
+        now = datetime.now()
+        counter = _counter_key(self._key_id(api_key), now)
+        if self.usage.used(counter) >= daily_limit:
+            self.rejected += 1
+            return False, _seconds_until_midnight(now), f"Quota journalier atteint ({daily_limit} requêtes)"
+
+        bucket = self._buckets.get(api_key)
+        if bucket is None:
+            bucket = self._buckets[api_key] = TokenBucket(rate_limit, burst)
+        wait = bucket.take()
+        if wait:
+            self.rejected += 1
+            return False, max(1, int(wait + 0.999)), f"Trop de requêtes (maximum {rate_limit:g} par seconde)"
+
+        self.usage.add(counter)
+        return True, None, None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "keys": len(self._buckets),
+            "rejected": self.rejected,
+            "flushes": self.usage.flushes,
+            "backend": type(self.usage.backend).__name__ if self.usage.backend is not None else None,
+            "backend_errors": self.usage.backend_errors
+        }
+
+def _quota_backend():
+    if QUOTA_BACKEND_URL is None:
+        return shared_backend
+    return backend_from_url(QUOTA_BACKEND_URL)
+
+rate_limiter = RateLimiter(UsageCounter(_quota_backend()))
+
+# ============ FLUSH PÉRIODIQUE ============
+
+_flusher: Optional[asyncio.Task] = None
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(QUOTA_FLUSH_INTERVAL)
+        await rate_limiter.usage.flush()
+
+async def start_usage_flusher() -> None:
+    """Démarre le flush périodique des compteurs (appelé au démarrage de l'application)"""
+    global _flusher
+    if _flusher is None:
+        _flusher = asyncio.create_task(_flush_loop())
+
+async def stop_usage_flusher() -> None:
+    """Arrête le flush périodique, après un dernier envoi des compteurs"""
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        await asyncio.gather(_flusher, return_exceptions=True)
+        _flusher = None
+    await rate_limiter.usage.flush()
@@ -0,0 +1,195 @@
+"""
+Voie rapide des entrées mal formées
+===================================
+Une grande part du trafic des endpoints unitaires est faite d'entrées
+invalides (faute de frappe, mauvaise longueur), rejetées par validators.py
+avant tout appel amont. RejectionLane, middleware ASGI placé devant
+FastAPI, les traite sans passer par le routage, la validation Pydantic de
+la requête ni la construction de la réponse :
+
+- le corps JSON est lu et le validateur du document appliqué directement ;
+- si l'entrée est valide, ou si la requête sort du cas simple (corps non
+  JSON, champ absent ou d'un autre type...), elle est transmise telle quelle
+  à FastAPI, qui la traite comme avant ;
+- sinon la clé API est contrôlée (mêmes 403 / 429) puis le corps de réponse
+  est renvoyé pré-encodé : seul le timestamp est ajouté.
+
+Les réponses d'échec portent un code stable (champ code, voir
+validators.ERROR_CODES) en plus du message. REJECTION_LANE=0 désactive la
+voie rapide (les endpoints renvoient alors les mêmes corps).
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from metrics import record_fast_rejection, record_validation_failure
+from serialization import dumps, loads
+from validators import (
+    error_code,
+    validate_iban_fr,
+    validate_siren,
+    validate_siret,
+    validate_tva_intracommunautaire
+)
+
+REJECTION_LANE = os.getenv("REJECTION_LANE", "1") == "1"
+# Corps plus grands : transmis à FastAPI sans examen
+REJECTION_MAX_BODY = 4096
+
+# Chemin -> (type de document, champ de l'identifiant, validateur, options booléennes)
+LANE_ROUTES: Dict[str, Tuple[str, str, Callable, Tuple[str, ...]]] = {
+    "/api/v1/verify/siret": ("siret", "siret", validate_siret, ("include_company_data",)),
+    "/api/v1/verify/siren": ("siren", "siren", validate_siren, ("include_company_data",)),
+    "/api/v1/verify/tva": ("tva", "numero_tva", validate_tva_intracommunautaire, ("verify_vies",)),
+    "/api/v1/verify/iban": ("iban", "iban", validate_iban_fr, ())
+}
+
+# ============ RÉPONSES PRÉ-ENCODÉES ============
+
+# Message -> corps encodé jusqu'au timestamp ; les messages à partie
+# variable (longueur trouvée, code pays) restent en nombre borné
+_prefixes: Dict[str, bytes] = {}
+_MAX_PREFIXES = 1024
+
+def rejection_body(error_msg: str) -> bytes:
+    """Corps APIResponse d'un échec de validation, encodé une fois par message"""
+    prefix = _prefixes.get(error_msg)
+    if prefix is None:
+        body = dumps({"success": False, "data": None, "error": error_msg, "code": error_code(error_msg), "timestamp": ""})
+        prefix = body[:-2]  # sans '"}' final
+        if len(_prefixes) < _MAX_PREFIXES:
+            _prefixes[error_msg] = prefix
+    return prefix + datetime.now().isoformat().encode() + b'"}'
+
+def rejection_response(error_msg: str) -> Response:
+    return Response(content=rejection_body(error_msg), media_type="application/json")
+
+# ============ MIDDLEWARE ============
+
+_counts: Dict[Tuple[str, Optional[str]], int] = {}
+
+def lane_error(path: str, body: bytes) -> Optional[Tuple[str, str]]:
+    """
+    (type de document, message d'erreur) si le corps est une requête bien
+    formée dont l'identifiant est invalide ; None dans tous les autres cas
+    """
+    document, field, validate, options = LANE_ROUTES[path]
+    try:
+        payload = loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    value = payload.get(field)
+    if not isinstance(value, str):
+        return None
+    # Options d'un autre type : laissées à la validation Pydantic (422 ou conversion)
+    if any(not isinstance(payload.get(name, False), bool) for name in options):
+        return None
+    result = validate(value)
+    if result[0]:
+        return None
+    return document, result[-1]
+
+class RejectionLane:
+    """
+    Middleware ASGI : répond directement aux entrées invalides des endpoints unitaires
+
+    authorize(x_api_key) lève HTTPException comme la dépendance des routes ;
+    routes (app.routes) sert à étiqueter les métriques HTTP par route.
+    """
+
+    def __init__(self, app, authorize: Callable[[Optional[str]], Any], routes=None):
+        self.app = app
+        self.authorize = authorize
+        self.routes = routes
+        self._route_by_path: Dict[str, Any] = {}
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not REJECTION_LANE
+            or scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in LANE_ROUTES
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_type = headers.get(b"content-type", b"")
+        if not content_type.startswith(b"application/json"):
+            await self.app(scope, receive, send)
+            return
+
+        # Lecture du corps (borné) ; les messages lus sont rejoués si la requête est transmise
+        messages = []
+        body = b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body", False) or len(body) > REJECTION_MAX_BODY:
+                break
+
+        failure = None
+        if messages[-1]["type"] == "http.request" and not messages[-1].get("more_body", False):
+            failure = lane_error(scope["path"], body)
+        if failure is None:
+            await self.app(scope, _replay(messages, receive), send)
+            return
+
+        scope["route"] = self._route(scope["path"])
+        api_key = headers.get(b"x-api-key")
+        try:
+            self.authorize(api_key.decode("latin-1") if api_key is not None else None)
+        except HTTPException as e:
+            await _send(send, e.status_code, dumps({"detail": e.detail}), e.headers)
+            return
+
+        document, error_msg = failure
+        code = error_code(error_msg)
+        record_validation_failure(document, code)
+        record_fast_rejection(document, code)
+        _counts[(document, code)] = _counts.get((document, code), 0) + 1
+        await _send(send, 200, rejection_body(error_msg))
+
+    def _route(self, path: str) -> Any:
+        route = self._route_by_path.get(path)
+        if route is None and self.routes is not None:
+            route = next((r for r in self.routes if getattr(r, "path", None) == path), None)
+            self._route_by_path[path] = route
+        return route
+
+def _replay(messages, receive):
+    """receive qui renvoie d'abord les messages déjà lus"""
+    pending = list(messages)
+
+    async def replay():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay
+
+async def _send(send, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+    raw_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode())
+    ]
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+def rejection_stats() -> Dict[str, Any]:
+    """Rejets de la voie rapide par document et code"""
+    by_document: Dict[str, Dict[str, int]] = {}
+    for (document, code), count in _counts.items():
+        by_document.setdefault(document, {})[code or "other"] = count
+    return {"enabled": REJECTION_LANE, "rejected": by_document}
@@ -0,0 +1,162 @@
+"""
+Cache des réponses de vérification et requêtes conditionnelles
+==============================================================
+Deux vérifications identiques (même identifiant normalisé, mêmes options)
+renvoient le même corps, au timestamp près. Les réponses réussies des
+endpoints unitaires sont donc conservées déjà sérialisées :
+
+- une requête identique reçoit le corps en cache (timestamp d'origine),
+  sans validation, appel amont ni sérialisation ;
+- chaque réponse porte un ETag fort, empreinte du corps hors timestamp :
+  il ne change que si le résultat change, y compris après expiration de
+  l'entrée ou d'un worker à l'autre ;
+- If-None-Match avec cet ETag : 304 sans corps ;
+- Cache-Control: private, max-age = fraîcheur restante des données
+  (RESPONSE_CACHE_TTL pour un résultat purement local, durées « douces »
+  Sirene / VIES moins l'âge des données amont, data_age).
+
+L'âge des données (data_age) figure dans le corps mais pas dans l'ETag : une
+même fiche, rafraîchie ou relue plus tard, garde la même empreinte. Le corps
+en cache est conservé découpé autour des valeurs de data_age, complétées à
+chaque envoi du temps écoulé depuis la mise en cache.
+
+Les échecs de validation et les réponses dont les données amont manquent
+(service indisponible, identifiant inconnu) ne sont pas mis en cache.
+Avec CACHE_BACKEND_URL, les entrées sont partagées entre les workers.
+"""
+
+import hashlib
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from cache import TieredCache, shared_backend
+from serialization import dumps
+from validators import SIRENE_CACHE_TTL, SIRENE_SOFT_TTL, VIES_INVALID_TTL, VIES_SOFT_TTL, VIES_VALID_TTL
+
+# Durée de vie des réponses sans données amont (format seul, IBAN) : le
+# résultat ne dépend que de l'identifiant
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "50000"))
+
+# Valeur d'un champ data_age dans un corps sérialisé (un nom de champ dans une
+# chaîne JSON aurait ses guillemets échappés)
+_DATA_AGE = re.compile(rb'(?<="data_age":)(\d+)')
+
+class ResponseCache:
+    """Corps JSON sérialisés, avec ETag et date d'expiration, par clé de requête"""
+
+    def __init__(self, maxsize: int, ttl: float, backend=None):
+        self.cache = TieredCache("responses", maxsize=maxsize, ttl=ttl, backend=backend)
+        self.not_modified = 0
+
+    async def lookup(self, request: Request, key: str) -> Optional[Response]:
+        """Réponse en cache (200, ou 304 si le client a déjà cette version), sinon None"""
+        found, entry = await self.cache.aget(key)
+        if not found:
+            return None
+        now = time.time()
+        max_age = max(0, int(entry["expires_at"] - now))
+        body = _aged_body(entry, int(now - entry["stored_at"])) if "ages" in entry else entry["body"].encode()
+        return self._respond(request, body, entry["etag"], max_age)
+
+    async def store(self, request: Request, key: str, payload: Dict[str, Any], ttl: Optional[float]) -> Response:
+        """
+        Sérialise une réponse, la met en cache pour ttl secondes (None : pas
+        de cache) et la renvoie avec ses en-têtes de validation
+        """
+        content = dumps({k: v for k, v in payload.items() if k != "timestamp"})
+        fingerprint = dumps(_without_age(payload["data"])) if _has_age(payload["data"]) else content
+        etag = f'"{hashlib.sha256(fingerprint).hexdigest()[:32]}"'
+        # Le timestamp est ajouté en dernier champ, hors empreinte
+        body = content[:-1] + b',"timestamp":' + dumps(payload["timestamp"]) + b"}"
+        if not ttl:
+            return self._respond(request, body, etag, None)
+        now = time.time()
+        entry = {"etag": etag, "expires_at": now + ttl}
+        if fingerprint is content:
+            entry["body"] = body.decode()
+        else:
+            entry.update(_split_ages(body), stored_at=now)
+        await self.cache.aset(key, entry, ttl)
+        return self._respond(request, body, etag, int(ttl))
+
+    def _respond(self, request: Request, body: bytes, etag: str, max_age: Optional[int]) -> Response:
+        # Sans durée de fraîcheur, le client doit revalider à chaque fois
+        cache_control = f"private, max-age={max_age}" if max_age is not None else "private, no-cache"
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "not_modified": self.not_modified}
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible d'If-None-Match (liste d'ETags ou *) avec un ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def _has_age(data: Any) -> bool:
+    """data_age au premier ou second niveau (fiche company, résultat vies)"""
+    if not isinstance(data, dict):
+        return False
+    return "data_age" in data or any(isinstance(v, dict) and "data_age" in v for v in data.values())
+
+def _without_age(data: Any) -> Any:
+    if isinstance(data, dict):
+        return {k: _without_age(v) for k, v in data.items() if k != "data_age"}
+    return data
+
+def _split_ages(body: bytes) -> Dict[str, Any]:
+    """Corps découpé autour des valeurs de data_age : {"parts": [n + 1 morceaux], "ages": [n âges]}"""
+    pieces = _DATA_AGE.split(body)
+    return {"parts": [p.decode() for p in pieces[0::2]], "ages": [int(a) for a in pieces[1::2]]}
+
+def _aged_body(entry: Dict[str, Any], elapsed: int) -> bytes:
+    """Corps reconstitué, chaque data_age augmenté du temps écoulé depuis la mise en cache"""
+    parts = entry["parts"]
+    chunks = [parts[0]]
+    for age, part in zip(entry["ages"], parts[1:]):
+        chunks += (str(age + elapsed), part)
+    return "".join(chunks).encode()
+
+def response_key(endpoint: str, identifier: str, **options: bool) -> str:
+    """Clé de cache : endpoint, identifiant normalisé et options de la requête"""
+    flags = ",".join(f"{name}={int(value)}" for name, value in sorted(options.items()))
+    return f"{endpoint}:{identifier}:{flags}"
+
+def sirene_response_ttl(company: Optional[Dict[str, Any]]) -> Optional[float]:
+    """
+    Fiche Sirene absente (inconnue ou service indisponible), ou servie
+    périmée pendant son rafraîchissement : pas de cache
+    """
+    if not company:
+        return None
+    if "data_age" not in company:
+        # Index local : pas d'âge, durée du cache Sirene
+        return SIRENE_CACHE_TTL
+    return _remaining(SIRENE_SOFT_TTL, company["data_age"])
+
+def vies_response_ttl(vies: Dict[str, Any]) -> Optional[float]:
+    """Résultat VIES définitif (valid true ou false) et encore frais seulement"""
+    if vies.get("valid") is True:
+        return _remaining(min(VIES_SOFT_TTL, VIES_VALID_TTL), vies.get("data_age", 0))
+    if vies.get("valid") is False:
+        return _remaining(min(VIES_SOFT_TTL, VIES_INVALID_TTL), vies.get("data_age", 0))
+    return None
+
+def _remaining(ttl: float, age: float) -> Optional[float]:
+    return ttl - age if ttl > age else None
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, backend=shared_backend)
@@ -0,0 +1,70 @@
+"""
+Sérialisation JSON des réponses
+===============================
+Les endpoints construisent leurs réponses en dictionnaires déjà conformes
+aux modèles déclarés (APIResponse, BatchResponse, JobStatus) et les
+renvoient en FastJSONResponse : FastAPI ne revalide alors pas la réponse
+contre son response_model, qui ne sert plus qu'à la documentation OpenAPI.
+Sans cela, chaque résultat d'un batch ou d'un job est reconstruit en
+modèle Pydantic, puis reconverti en dictionnaire avant json.dumps.
+
+orjson (pip install orjson) sérialise directement en UTF-8 ; à défaut, repli
+sur json avec une sortie équivalente (compacte, sans échappement ASCII).
+"""
+
+import importlib.util
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+    def dumps(obj: Any) -> bytes:
+        """Sérialise en JSON UTF-8 compact"""
+        return orjson.dumps(obj)
+
+    def dumps_lines(items) -> bytes:
+        """Une ligne NDJSON par élément"""
+        return b"".join([orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE) for item in items])
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        """Sérialise en JSON UTF-8 compact"""
+        return _encoder.encode(obj).encode("utf-8")
+
+    def dumps_lines(items) -> bytes:
+        """Une ligne NDJSON par élément"""
+        return "".join([_encoder.encode(item) + "\n" for item in items]).encode("utf-8")
+
+    loads = json.loads
+
+class FastJSONResponse(Response):
+    """Réponse JSON sérialisée sans passer par les modèles Pydantic"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def api_response(
+    success: bool,
+    data: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+    code: Optional[str] = None
+) -> Dict[str, Any]:
+    """Corps d'une réponse unitaire, dans l'ordre des champs d'APIResponse"""
+    return {
+        "success": success,
+        "data": data,
+        "error": error,
+        "code": code,
+        "timestamp": datetime.now().isoformat()
+    }
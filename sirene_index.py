@@ -0,0 +1,365 @@
+"""
+Index local des fichiers stock Sirene
+=====================================
+L'INSEE publie chaque mois la base Sirene complète sous forme de fichiers
+stock (StockUniteLegale, StockEtablissement). Ce module :
+
+- importe ces CSV en flux, une ligne à la fois, dans un index compact sur disque ;
+- fournit une recherche par SIREN/SIRET qui renvoie le même dictionnaire que
+  get_company_info_from_sirene (denomination, adresse, code_naf, statut...).
+
+Format de l'index (un couple de fichiers par type, "siren" et "siret") :
+
+- <type>.dat : les enregistrements bout à bout, champs séparés par \\x1f (UTF-8) ;
+- <type>.idx : entrées de largeur fixe (2 entiers 64 bits, ordre natif),
+  triées par clé : identifiant numérique, puis (position << 16 | longueur)
+  de l'enregistrement dans le .dat.
+
+Le .idx est ouvert avec mmap et parcouru par recherche dichotomique : une
+recherche coûte une vingtaine d'accès mémoire, sans rien charger au démarrage.
+
+Usage:
+    python sirene_index.py --unites StockUniteLegale_utf8.zip \\
+        --etablissements StockEtablissement_utf8.zip --out data/sirene_index
+"""
+
+import argparse
+import csv
+import heapq
+import io
+import json
+import mmap
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+FIELD_SEP = "\x1f"
+# Nombre d'entrées d'index gardées en mémoire avant écriture d'un segment trié
+CHUNK_ENTRIES = 1_000_000
+MAX_RECORD_LENGTH = 0xFFFF
+
+SIREN_COLUMNS = [
+    "siren",
+    "denominationUniteLegale",
+    "prenom1UniteLegale",
+    "nomUniteLegale",
+    "categorieJuridiqueUniteLegale",
+    "activitePrincipaleUniteLegale",
+    "dateCreationUniteLegale",
+    "etatAdministratifUniteLegale"
+]
+
+SIRET_COLUMNS = [
+    "siret",
+    "siren",
+    "numeroVoieEtablissement",
+    "libelleVoieEtablissement",
+    "codePostalEtablissement",
+    "libelleCommuneEtablissement",
+    "activitePrincipaleEtablissement",
+    "dateCreationEtablissement",
+    "etatAdministratifEtablissement"
+]
+
+# ============ IMPORT ============
+
+def _open_csv(path: str) -> io.TextIOBase:
+    """Ouvre un fichier stock, directement ou depuis l'archive zip de l'INSEE"""
+    if path.endswith(".zip"):
+        archive = zipfile.ZipFile(path)
+        name = next(n for n in archive.namelist() if n.endswith(".csv"))
+        return io.TextIOWrapper(archive.open(name), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+def _read_rows(path: str, columns: List[str]) -> Iterator[List[str]]:
+    """Lit le CSV ligne à ligne et ne garde que les colonnes utiles, dans l'ordre"""
+    with _open_csv(path) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(c) for c in columns]
+        for row in reader:
+            yield [row[p] for p in positions]
+
+def _siren_record(row: List[str]) -> List[str]:
+    siren, denomination, prenom, nom, categorie, naf, creation, etat = row
+    # Même règle que _parse_sirene_data pour les entrepreneurs individuels
+    denomination = denomination or f"{prenom} {nom}".strip()
+    return [siren, denomination, categorie, naf, creation, etat]
+
+class _IndexWriter:
+    """
+    Écrit un index trié sans jamais garder toutes les clés en mémoire
+
+    Les fichiers stock sont déjà triés : les segments sont alors simplement mis
+    bout à bout. Sinon, chaque segment est trié puis les segments sont fusionnés.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buffer: List[int] = []
+        self._runs: List[str] = []
+        self._last_key = -1
+        self._sorted = True
+        self.count = 0
+
+    def add(self, key: int, offset: int, length: int) -> None:
+        if key <= self._last_key:
+            self._sorted = False
+        self._last_key = key
+        self._buffer.append((key << 64) | (offset << 16) | length)
+        self.count += 1
+        if len(self._buffer) >= CHUNK_ENTRIES:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        if not self._sorted:
+            self._buffer.sort()
+        fd, run_path = tempfile.mkstemp(prefix="sirene_run_", dir=os.path.dirname(self.path))
+        with os.fdopen(fd, "wb") as f:
+            _write_entries(f, self._buffer)
+        self._runs.append(run_path)
+        self._buffer = []
+
+    def close(self) -> None:
+        self._flush()
+        with open(self.path, "wb") as out:
+            if self._sorted:
+                for run in self._runs:
+                    with open(run, "rb") as f:
+                        while True:
+                            block = f.read(1 << 20)
+                            if not block:
+                                break
+                            out.write(block)
+            else:
+                merged = heapq.merge(*(_read_entries(run) for run in self._runs))
+                batch: List[int] = []
+                for entry in merged:
+                    batch.append(entry)
+                    if len(batch) >= CHUNK_ENTRIES:
+                        _write_entries(out, batch)
+                        batch = []
+                _write_entries(out, batch)
+        for run in self._runs:
+            os.remove(run)
+        self._runs = []
+
+def _write_entries(f, entries: Iterable[int]) -> None:
+    flat = array("Q")
+    for entry in entries:
+        flat.append(entry >> 64)
+        flat.append(entry & 0xFFFFFFFFFFFFFFFF)
+    flat.tofile(f)
+
+def _read_entries(path: str) -> Iterator[int]:
+    with open(path, "rb") as f:
+        while True:
+            flat = array("Q")
+            try:
+                flat.fromfile(f, 2 * 65536)
+            except EOFError:
+                pass
+            if not flat:
+                return
+            for i in range(0, len(flat), 2):
+                yield (flat[i] << 64) | flat[i + 1]
+
+def build_index(rows: Iterable[List[str]], out_dir: str, name: str) -> int:
+    """
+    Écrit <name>.dat et <name>.idx à partir de lignes dont la 1re colonne est la clé
+
+    Returns:
+        Nombre d'enregistrements indexés
+    """
+    writer = _IndexWriter(os.path.join(out_dir, f"{name}.idx"))
+    offset = 0
+    with open(os.path.join(out_dir, f"{name}.dat"), "wb") as dat:
+        for row in rows:
+            key = row[0]
+            if not key.isdigit():
+                continue
+            record = FIELD_SEP.join(row[1:]).encode("utf-8")
+            if len(record) > MAX_RECORD_LENGTH:
+                # Tronqué sur une frontière de caractère : un caractère
+                # multi-octets coupé rendrait l'enregistrement illisible
+                record = record[:MAX_RECORD_LENGTH].decode("utf-8", "ignore").encode("utf-8")
+            dat.write(record)
+            writer.add(int(key), offset, len(record))
+            offset += len(record)
+    writer.close()
+    return writer.count
+
+def import_stock_files(
+    out_dir: str,
+    unites_path: Optional[str] = None,
+    etablissements_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """Importe les fichiers stock INSEE et écrit les métadonnées de l'index"""
+    os.makedirs(out_dir, exist_ok=True)
+    meta: Dict[str, Any] = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "byteorder": sys.byteorder}
+
+    if unites_path:
+        start = time.perf_counter()
+        rows = (_siren_record(row) for row in _read_rows(unites_path, SIREN_COLUMNS))
+        meta["siren"] = {
+            "source": os.path.basename(unites_path),
+            "count": build_index(rows, out_dir, "siren"),
+            "seconds": round(time.perf_counter() - start, 2)
+        }
+
+    if etablissements_path:
+        start = time.perf_counter()
+        rows = _read_rows(etablissements_path, SIRET_COLUMNS)
+        meta["siret"] = {
+            "source": os.path.basename(etablissements_path),
+            "count": build_index(rows, out_dir, "siret"),
+            "seconds": round(time.perf_counter() - start, 2)
+        }
+
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+# ============ RECHERCHE ============
+
+class MappedIndex:
+    """Un couple .idx/.dat ouvert en mmap (recherche dichotomique par clé entière)"""
+
+    def __init__(self, out_dir: str, name: str):
+        self._idx_file = open(os.path.join(out_dir, f"{name}.idx"), "rb")
+        self._dat_file = open(os.path.join(out_dir, f"{name}.dat"), "rb")
+        self._idx_map = _mmap(self._idx_file)
+        self._dat_map = _mmap(self._dat_file)
+        self._entries = memoryview(self._idx_map).cast("Q") if self._idx_map else memoryview(array("Q"))
+        self.count = len(self._entries) // 2
+
+    def get(self, key: int) -> Optional[List[str]]:
+        entries = self._entries
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            k = entries[2 * mid]
+            if k < key:
+                lo = mid + 1
+            elif k > key:
+                hi = mid
+            else:
+                packed = entries[2 * mid + 1]
+                offset, length = packed >> 16, packed & 0xFFFF
+                return self._dat_map[offset:offset + length].decode("utf-8").split(FIELD_SEP)
+        return None
+
+def _mmap(f) -> Optional[mmap.mmap]:
+    if os.fstat(f.fileno()).st_size == 0:
+        return None
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class SireneIndex:
+    """Recherche SIREN/SIRET dans un index construit par import_stock_files"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("byteorder", sys.byteorder) != sys.byteorder:
+            raise ValueError("Index Sirene construit sur une machine d'ordre d'octets différent")
+        self._siren = MappedIndex(path, "siren") if "siren" in self.meta else None
+        self._siret = MappedIndex(path, "siret") if "siret" in self.meta else None
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, identifier: str, type: str = "siret") -> Optional[Dict[str, Any]]:
+        """
+        Recherche une entreprise dans l'index
+
+        Returns:
+            Même dictionnaire que get_company_info_from_sirene, ou None si absent
+        """
+        identifier = identifier.strip()
+        if not identifier.isdigit():
+            return None
+        result = self._lookup_siret(identifier) if type == "siret" else self._lookup_siren(identifier)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def _lookup_siren(self, siren: str) -> Optional[Dict[str, Any]]:
+        if self._siren is None:
+            return None
+        record = self._siren.get(int(siren))
+        if record is None:
+            return None
+        denomination, categorie, naf, creation, etat = record
+        return {
+            "siren": siren,
+            "denomination": denomination,
+            "categorie_juridique": categorie or None,
+            "code_naf": naf or None,
+            "date_creation": creation or None,
+            "statut": "Actif" if etat == "A" else "Fermé"
+        }
+
+    def _lookup_siret(self, siret: str) -> Optional[Dict[str, Any]]:
+        if self._siret is None:
+            return None
+        record = self._siret.get(int(siret))
+        if record is None:
+            return None
+        siren, numero, voie, code_postal, ville, naf, creation, etat = record
+        unit = self._siren.get(int(siren)) if self._siren is not None else None
+        return {
+            "siret": siret,
+            "siren": siren,
+            "denomination": unit[0] if unit else "",
+            "adresse": {
+                "numero": numero or None,
+                "voie": voie or None,
+                "code_postal": code_postal or None,
+                "ville": ville or None
+            },
+            "code_naf": naf or None,
+            "date_creation": creation or None,
+            "statut": "Actif" if etat == "A" else "Fermé"
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "siren_count": self._siren.count if self._siren else 0,
+            "siret_count": self._siret.count if self._siret else 0,
+            "created_at": self.meta.get("created_at"),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+_index: Optional[SireneIndex] = None
+_index_loaded = False
+
+def get_sirene_index() -> Optional[SireneIndex]:
+    """Index configuré par SIRENE_INDEX_DIR, ouvert au premier appel (None si absent)"""
+    global _index, _index_loaded
+    if not _index_loaded:
+        _index_loaded = True
+        path = os.getenv("SIRENE_INDEX_DIR")
+        if path and os.path.exists(os.path.join(path, "meta.json")):
+            _index = SireneIndex(path)
+    return _index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import des fichiers stock Sirene dans un index local")
+    parser.add_argument("--unites", help="StockUniteLegale (.csv ou .zip)")
+    parser.add_argument("--etablissements", help="StockEtablissement (.csv ou .zip)")
+    parser.add_argument("--out", required=True, help="Répertoire de l'index")
+    args = parser.parse_args()
+
+    if not args.unites and not args.etablissements:
+        parser.error("indiquer au moins --unites ou --etablissements")
+
+    print(json.dumps(import_stock_files(args.out, args.unites, args.etablissements), indent=2))
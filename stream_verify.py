@@ -0,0 +1,290 @@
+"""
+Vérification de fichiers en flux
+================================
+Vérifie un fichier de documents (CSV ou NDJSON) de taille quelconque :
+
+- le corps de la requête est lu morceau par morceau, jamais en entier ;
+- chaque ligne est validée localement (batch.check_document) ;
+- l'enrichissement amont (Sirene, VIES), optionnel, est lancé en parallèle
+  sous un plafond de concurrence ;
+- les résultats sont renvoyés en NDJSON, dans l'ordre du fichier, au fur et
+  à mesure : les premiers arrivent avant la fin de l'envoi du fichier.
+
+Le nombre de documents lus mais pas encore renvoyés est borné (STREAM_WINDOW) :
+quand la fenêtre est pleine, la lecture du fichier attend. La mémoire reste
+donc constante quelle que soit la taille du fichier.
+
+Formats acceptés (un document par ligne) :
+
+- CSV avec en-tête : colonnes value et type (type peut être fixé pour tout
+  le fichier par le paramètre type), include_company_data et verify_vies
+  optionnelles ;
+- NDJSON : {"type": "siret", "value": "...", "include_company_data": true}
+"""
+
+import asyncio
+import codecs
+import csv
+import json
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from batch import Lookup, check_document, failure, is_grouped, lookup_call, merge_lookup
+from serialization import dumps_lines
+
+# Nombre maximal d'appels amont simultanés pour un même fichier
+STREAM_CONCURRENCY = int(os.getenv("STREAM_CONCURRENCY", "20"))
+# Nombre maximal de documents lus mais pas encore renvoyés
+STREAM_WINDOW = int(os.getenv("STREAM_WINDOW", "1000"))
+# Longueur maximale d'une ligne du fichier (octets)
+STREAM_MAX_LINE = 64 * 1024
+
+TRUE_VALUES = {"1", "true", "oui", "yes", "o", "y"}
+
+# ============ LECTURE DU FICHIER ============
+
+async def iter_line_batches(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    """
+    Découpe un flux d'octets en lignes complètes
+
+    Produit, pour chaque morceau reçu, la liste des lignes qu'il termine.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        if len(tail) > STREAM_MAX_LINE:
+            raise ValueError(f"Ligne trop longue (plus de {STREAM_MAX_LINE} caractères)")
+        if lines:
+            yield [line.rstrip("\r") for line in lines]
+    tail += decoder.decode(b"", final=True)
+    if tail.strip():
+        yield [tail.rstrip("\r")]
+
+def _as_bool(value: Any, default: bool = True) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+def _document(row: Dict[str, Any], default_type: Optional[str]) -> Dict[str, Any]:
+    """Normalise une ligne du fichier en document (type, value, options)"""
+    return {
+        "type": str(row.get("type") or default_type or "").strip().lower(),
+        "value": str(row.get("value") or ""),
+        "include_company_data": _as_bool(row.get("include_company_data")),
+        "verify_vies": _as_bool(row.get("verify_vies"))
+    }
+
+class _LineSource:
+    """Lignes d'un lot, lues par csv.reader, en retenant si elles sont épuisées"""
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.consumed = 0
+        self.exhausted = False
+
+    def __iter__(self) -> "_LineSource":
+        return self
+
+    def __next__(self) -> str:
+        if self.consumed == len(self.lines):
+            self.exhausted = True
+            raise StopIteration
+        self.consumed += 1
+        return self.lines[self.consumed - 1]
+
+def _unclosed_quote(lines: List[str]) -> Dict[str, Any]:
+    return {"type": "", "value": "\n".join(lines)[:100], "error": "Ligne CSV invalide: guillemet non fermé"}
+
+async def read_documents(
+    chunks: AsyncIterator[bytes],
+    format: str,
+    default_type: Optional[str] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Lit les documents d'un fichier CSV ou NDJSON, un lot par morceau reçu
+
+    Une ligne illisible donne un document dont le champ "error" est renseigné.
+    En CSV, un champ entre guillemets peut contenir des retours à la ligne et
+    s'étendre sur plusieurs morceaux : les lignes d'un enregistrement
+    inachevé sont reprises avec le lot suivant (au plus STREAM_MAX_LINE
+    caractères, au-delà ou en fin de fichier : guillemet non fermé).
+    """
+    header: Optional[List[str]] = None
+    carry: List[str] = []
+    async for lines in iter_line_batches(chunks):
+        documents: List[Dict[str, Any]] = []
+        if format == "csv":
+            lines = carry + lines
+            carry = []
+            source = _LineSource(lines)
+            reader = csv.reader(source)
+            while True:
+                start = source.consumed
+                row = next(reader, None)
+                if row is None:
+                    break
+                if source.exhausted:
+                    # Lot terminé au milieu d'un champ entre guillemets
+                    carry = lines[start:]
+                    if sum(map(len, carry)) > STREAM_MAX_LINE:
+                        documents.append(_unclosed_quote(carry))
+                        carry = []
+                    break
+                if not row or not any(cell.strip() for cell in row):
+                    continue
+                if header is None:
+                    header = [cell.strip().lower() for cell in row]
+                    if "value" not in header:
+                        raise ValueError("Colonne 'value' absente de l'en-tête CSV")
+                    continue
+                documents.append(_document(dict(zip(header, row)), default_type))
+        else:
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError("objet JSON attendu")
+                    documents.append(_document(row, default_type))
+                except ValueError as e:
+                    documents.append({"type": "", "value": line[:100], "error": f"Ligne NDJSON invalide: {e}"})
+        if documents:
+            yield documents
+    if carry:
+        yield [_unclosed_quote(carry)]
+
+# ============ VÉRIFICATION ============
+
+def _check(document: Dict[str, Any], enrich: bool) -> Tuple[Dict[str, Any], Optional[Lookup]]:
+    """Validation locale d'un document lu dans le fichier"""
+    if "error" in document:
+        return failure(document["error"], "INVALID_LINE"), None
+    try:
+        result, lookup = check_document(
+            document["type"],
+            document["value"],
+            include_company_data=document["include_company_data"],
+            verify_vies=document["verify_vies"]
+        )
+    except Exception as e:
+        return failure(str(e)), None
+    return result, lookup if enrich else None
+
+def _finish(result: Dict[str, Any], task: Optional[asyncio.Task], service: Optional[str]) -> Dict[str, Any]:
+    """Complète le résultat avec la réponse amont, une fois la tâche terminée"""
+    if task is not None:
+        if task.exception() is not None:
+            result["success"] = False
+            result["error"] = str(task.exception())
+            result["code"] = "UPSTREAM_ERROR"
+        else:
+            merge_lookup(result, service, task.result())
+    return result
+
+async def verify_documents(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    enrich: bool = False,
+    concurrency: int = STREAM_CONCURRENCY,
+    window: int = STREAM_WINDOW
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Vérifie les documents au fil de l'eau
+
+    Produit, après chaque lot lu, les résultats déjà prêts (dans l'ordre
+    du fichier). Quand window documents attendent une réponse amont, la
+    lecture est suspendue jusqu'à ce que le plus ancien soit terminé.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    pending: Deque[Tuple[Dict[str, Any], Optional[asyncio.Task], Optional[str]]] = deque()
+    index = 0
+
+    async def bounded(call):
+        async with semaphore:
+            return await call()
+
+    def ready() -> List[Dict[str, Any]]:
+        out = []
+        while pending and (pending[0][1] is None or pending[0][1].done()):
+            out.append(_finish(*pending.popleft()))
+        return out
+
+    try:
+        async for documents in batches:
+            for document in documents:
+                result, lookup = _check(document, enrich)
+                result = {"index": index, "type": document["type"], "value": document["value"], **result}
+                index += 1
+                if lookup is None:
+                    pending.append((result, None, None))
+                else:
+                    call = lookup_call(lookup)
+                    task = asyncio.create_task(call() if is_grouped(lookup) else bounded(call))
+                    pending.append((result, task, lookup[0]))
+
+                if len(pending) >= window:
+                    out = ready()
+                    if not out:
+                        await asyncio.wait([pending[0][1]])
+                        out = ready()
+                    yield out
+
+            out = ready()
+            if out:
+                yield out
+
+        while pending:
+            if pending[0][1] is not None:
+                await asyncio.wait([pending[0][1]])
+            yield ready()
+    finally:
+        for _, task, _ in pending:
+            if task is not None:
+                task.cancel()
+
+async def stream_verification(
+    chunks: AsyncIterator[bytes],
+    format: str,
+    default_type: Optional[str] = None,
+    enrich: bool = False
+) -> AsyncIterator[bytes]:
+    """Corps NDJSON de la réponse : une ligne par document, puis une ligne de synthèse"""
+    total = 0
+    valid = 0
+    error: Optional[str] = None
+    try:
+        async for results in verify_documents(read_documents(chunks, format, default_type), enrich):
+            total += len(results)
+            valid += sum(1 for r in results if r["success"])
+            yield dumps_lines(results)
+    except ClientDisconnect:
+        return
+    except (ValueError, csv.Error) as e:
+        error = f"Fichier illisible: {e}"
+    summary = {"summary": True, "total": total, "valid": valid, "invalid": total - valid, "error": error}
+    yield dumps_lines([summary])
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Réponse NDJSON produite pendant la lecture du corps de la requête
+
+    StreamingResponse surveille la déconnexion du client en lisant elle-même
+    les messages ASGI entrants, ce qui lui ferait consommer le corps de la
+    requête. Ici, seule la lecture du corps (request.stream) les consomme :
+    une déconnexion y lève ClientDisconnect.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,168 @@
+"""
+Clients HTTP partagés vers les services amont (INSEE Sirene, VIES)
+==================================================================
+Un pool de connexions par service amont et par processus, créé au démarrage
+de l'application (lifespan FastAPI) et fermé à l'arrêt :
+
+- keep-alive : les connexions TLS sont réutilisées entre les requêtes
+  (UPSTREAM_KEEPALIVE_EXPIRY secondes d'inactivité au plus) ;
+- HTTP/2 (UPSTREAM_HTTP2, nécessite le paquet h2) : négocié par ALPN, les
+  requêtes simultanées sont multiplexées sur une connexion ; repli
+  automatique en HTTP/1.1 si le service ne le propose pas ;
+- taille : UPSTREAM_MAX_CONNECTIONS / UPSTREAM_MAX_KEEPALIVE par worker,
+  surchargeables par service (UPSTREAM_SIRENE_MAX_CONNECTIONS,
+  UPSTREAM_VIES_MAX_KEEPALIVE...).
+
+L'occupation des pools est relevée toutes les UPSTREAM_POOL_SAMPLE_INTERVAL
+secondes (métrique docverify_upstream_pool_connections, voir metrics.py).
+Les fonctions synchrones (scripts) ont leurs propres pools, créés à la demande.
+
+httpx n'est importé qu'à la création du premier client : avec
+start_http_client(eager=False) (LAZY_STARTUP), ni httpx ni ses dépendances
+ne sont chargés avant le premier appel amont.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+from metrics import record_pool_usage
+
+UPSTREAMS = ("sirene", "vies")
+
+def _upstream_int(upstream: str, name: str, default: int) -> int:
+    """Réglage propre à un service (UPSTREAM_SIRENE_X), sinon valeur commune"""
+    value = os.getenv(f"UPSTREAM_{upstream.upper()}_{name}")
+    return int(value) if value else default
+
+# Taille des pools de connexions par worker (valeurs communes)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "1") == "1"
+UPSTREAM_POOL_SAMPLE_INTERVAL = float(os.getenv("UPSTREAM_POOL_SAMPLE_INTERVAL", "5"))
+
+# HTTP/2 seulement si h2 est installé (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_sync_clients: Dict[str, httpx.Client] = {}
+_limits: Dict[str, int] = {}
+_sampler: Optional[asyncio.Task] = None
+
+def _pool_limits(upstream: str) -> httpx.Limits:
+    import httpx
+
+    return httpx.Limits(
+        max_connections=_upstream_int(upstream, "MAX_CONNECTIONS", UPSTREAM_MAX_CONNECTIONS),
+        max_keepalive_connections=_upstream_int(upstream, "MAX_KEEPALIVE", UPSTREAM_MAX_KEEPALIVE),
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY
+    )
+
+def create_http_client(upstream: str) -> httpx.AsyncClient:
+    """Crée le client httpx (et son pool) d'un service amont"""
+    import httpx
+
+    limits = _pool_limits(upstream)
+    _limits[upstream] = limits.max_connections
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(limits=limits, http2=UPSTREAM_HTTP2 and HTTP2_AVAILABLE),
+        timeout=httpx.Timeout(10.0)
+    )
+
+def create_sync_http_client(upstream: str) -> httpx.Client:
+    """Équivalent synchrone de create_http_client"""
+    import httpx
+
+    return httpx.Client(
+        transport=httpx.HTTPTransport(limits=_pool_limits(upstream), http2=UPSTREAM_HTTP2 and HTTP2_AVAILABLE),
+        timeout=httpx.Timeout(10.0)
+    )
+
+async def start_http_client(client: Optional[httpx.AsyncClient] = None, eager: bool = True) -> None:
+    """
+    Initialise les clients partagés (appelé au démarrage de l'application)
+
+    client : client à utiliser pour tous les services à la place des pools
+    par défaut (bouchons, benchmarks) ; à fournir avant le démarrage.
+    eager : False pour ne créer chaque pool qu'à son premier appel.
+    """
+    global _sampler
+    for upstream in UPSTREAMS:
+        if client is not None:
+            _clients[upstream] = client
+        elif eager and upstream not in _clients:
+            _clients[upstream] = create_http_client(upstream)
+    if _sampler is None:
+        _sampler = asyncio.create_task(_sample_pools())
+
+async def close_http_client() -> None:
+    """Ferme les clients partagés et libère leurs connexions"""
+    global _sampler
+    if _sampler is not None:
+        _sampler.cancel()
+        await asyncio.gather(_sampler, return_exceptions=True)
+        _sampler = None
+    # Un même client peut servir plusieurs services (client fourni)
+    for client in {id(c): c for c in _clients.values()}.values():
+        await client.aclose()
+    _clients.clear()
+    for upstream in UPSTREAMS:
+        record_pool_usage(upstream, 0, 0, 0)
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    """
+    Retourne le client partagé d'un service amont ("sirene" ou "vies")
+
+    Hors de l'application (scripts, REPL), le client est créé à la demande.
+    """
+    client = _clients.get(upstream)
+    if client is None:
+        client = _clients[upstream] = create_http_client(upstream)
+    return client
+
+def get_sync_http_client(upstream: str) -> httpx.Client:
+    """Client synchrone d'un service amont, pour les fonctions bloquantes"""
+    client = _sync_clients.get(upstream)
+    if client is None:
+        client = _sync_clients[upstream] = create_sync_http_client(upstream)
+    return client
+
+# ============ OCCUPATION DES POOLS ============
+
+def pool_stats(upstream: str) -> Optional[Dict[str, Any]]:
+    """Connexions ouvertes du pool d'un service (None si pool inconnu)"""
+    client = _clients.get(upstream)
+    # Le pool httpcore n'est accessible que par le transport créé ici
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    if pool is None or upstream not in _limits:
+        return None
+    active = idle = http2 = 0
+    for connection in pool.connections:
+        if connection.is_closed():
+            continue
+        if connection.is_idle():
+            idle += 1
+        else:
+            active += 1
+        http2 += "HTTP/2" in connection.info()
+    return {
+        "active": active,
+        "idle": idle,
+        "http2": http2,
+        "max_connections": _limits[upstream]
+    }
+
+async def _sample_pools() -> None:
+    while True:
+        for upstream in UPSTREAMS:
+            stats = pool_stats(upstream)
+            if stats is not None:
+                record_pool_usage(upstream, stats["active"], stats["idle"], stats["max_connections"])
+        await asyncio.sleep(UPSTREAM_POOL_SAMPLE_INTERVAL)
@@ -2,28 +2,122 @@
 Fonctions de validation pour documents français
 """
 
-import re
-import requests
-from typing import Tuple, Optional, Dict, Any
-import xml.etree.ElementTree as ET
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Tuple, Optional, Dict, Any, List
+
+# httpx n'est chargé qu'au premier appel amont (démarrage à froid : les
+# validations locales ne l'importent jamais)
+if TYPE_CHECKING:
+    import httpx
+
+from upstream import get_http_client, get_sync_http_client
+from cache import TieredCache, SingleFlight, MicroBatcher, BackgroundRefresher, shared_backend
+from sirene_index import get_sirene_index
+from bank_directory import get_bank_directory
+from breaker import CircuitBreaker, BreakerGroup
+from insee_auth import insee_tokens
+from metrics import upstream_call, record_circuit_open
+from vat_numbers import TVA_CHECKSUM_ERROR, vat_number_error
+from vies_client import (
+    REQUEST_HEADERS as VIES_REQUEST_HEADERS,
+    ViesError,
+    encode_request as encode_vies_request,
+    parse_response as parse_vies_response
+)
 
 # ============ VALIDATION SIRET/SIREN ============
 
+# Les validateurs sont appelés pour chaque document : ni liste ni motif
+# construits à chaque appel. Le nettoyage utilise str.replace, plus rapide
+# que str.translate sur des chaînes aussi courtes, et les formats sont
+# vérifiés par les méthodes de str plutôt que par des expressions régulières.
+
+# Chiffre ASCII -> somme des chiffres de son double (Luhn)
+_LUHN_DOUBLED = bytes.maketrans(b"0123456789", b"0246813579")
+# Contribution Luhn d'un bloc de 3 chiffres : chiffre du milieu doublé
+# (udu), ou les deux autres (dud) ; un SIREN est la suite udu, dud, udu
+_DOUBLED_SUM = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+_LUHN_UDU = {f"{a}{b}{c}": a + _DOUBLED_SUM[b] + c for a in range(10) for b in range(10) for c in range(10)}
+_LUHN_DUD = {f"{a}{b}{c}": _DOUBLED_SUM[a] + b + _DOUBLED_SUM[c] for a in range(10) for b in range(10) for c in range(10)}
+
+SIREN_FORMAT_ERROR = "Le SIREN doit contenir exactement 9 chiffres"
+SIREN_LUHN_ERROR = "Le SIREN n'est pas valide (échec de l'algorithme de Luhn)"
+SIRET_FORMAT_ERROR = "Le SIRET doit contenir exactement 14 chiffres"
+SIRET_LUHN_ERROR = "Le SIRET n'est pas valide (échec de l'algorithme de Luhn)"
+SIRET_SIREN_ERROR = f"Le SIREN contenu dans le SIRET n'est pas valide: {SIREN_LUHN_ERROR}"
+TVA_FORMAT_ERROR = "Format invalide. Le numéro de TVA doit commencer par 2 lettres suivies de chiffres"
+TVA_FR_FORMAT_ERROR = "Format TVA française invalide. Format attendu: FR + 2 caractères + 9 chiffres"
+TVA_SIREN_ERROR = f"SIREN invalide dans le numéro de TVA: {SIREN_LUHN_ERROR}"
+IBAN_COUNTRY_ERROR = "L'IBAN doit commencer par 'FR' pour la France"
+IBAN_FORMAT_ERROR = "Format IBAN invalide"
+IBAN_CHECKSUM_ERROR = "Clé de contrôle IBAN invalide"
+IBAN_RIB_KEY_ERROR = "Clé RIB invalide"
+
+# Codes d'erreur stables, renvoyés avec les messages (champ code des
+# réponses) : les clients s'appuient sur eux plutôt que sur le texte
+ERROR_CODES = {
+    SIREN_FORMAT_ERROR: "SIREN_FORMAT",
+    SIREN_LUHN_ERROR: "SIREN_LUHN",
+    SIRET_FORMAT_ERROR: "SIRET_FORMAT",
+    SIRET_LUHN_ERROR: "SIRET_LUHN",
+    SIRET_SIREN_ERROR: "SIRET_SIREN_LUHN",
+    TVA_FORMAT_ERROR: "TVA_FORMAT",
+    TVA_FR_FORMAT_ERROR: "TVA_FR_FORMAT",
+    TVA_CHECKSUM_ERROR: "TVA_CHECKSUM",
+    IBAN_COUNTRY_ERROR: "IBAN_COUNTRY",
+    IBAN_FORMAT_ERROR: "IBAN_FORMAT",
+    IBAN_CHECKSUM_ERROR: "IBAN_CHECKSUM",
+    IBAN_RIB_KEY_ERROR: "IBAN_RIB_KEY"
+}
+# Messages à partie variable, reconnus par leur début
+_ERROR_PREFIXES = (
+    ("SIREN invalide dans le numéro de TVA", "TVA_SIREN"),
+    ("Code pays", "TVA_COUNTRY"),
+    ("Format TVA invalide pour", "TVA_COUNTRY_FORMAT"),
+    ("Un IBAN français doit contenir", "IBAN_LENGTH"),
+    ("Type de document inconnu", "UNKNOWN_TYPE")
+)
+
+def error_code(error_msg: Optional[str]) -> Optional[str]:
+    """Code stable d'un message d'erreur de validation (None si inconnu)"""
+    if not error_msg:
+        return None
+    code = ERROR_CODES.get(error_msg)
+    if code is None:
+        for prefix, prefix_code in _ERROR_PREFIXES:
+            if error_msg.startswith(prefix):
+                return prefix_code
+    return code
+
+def _luhn_digits(digits: str) -> bool:
+    """Luhn sur une chaîne de chiffres décimaux (str.isdecimal)"""
+    if not digits.isascii():
+        # Chiffres Unicode (arabes, etc.) : ramenés à leurs équivalents ASCII
+        digits = "".join(str(int(d)) for d in digits)
+    if len(digits) == 9:
+        # SIREN (seul ou en tête de SIRET) : trois blocs lus dans une table
+        return (_LUHN_UDU[digits[:3]] + _LUHN_DUD[digits[3:6]] + _LUHN_UDU[digits[6:]]) % 10 == 0
+    raw = digits.encode()
+    # Codes ASCII : chaque chiffre compte pour son code moins 48
+    return (sum(raw[-1::-2]) + sum(raw[-2::-2].translate(_LUHN_DOUBLED)) - 48 * len(raw)) % 10 == 0
+
 def validate_luhn(number: str) -> bool:
     """
     Algorithme de Luhn pour valider SIREN/SIRET
     https://fr.wikipedia.org/wiki/Formule_de_Luhn
     """
-    def digits_of(n):
-        return [int(d) for d in str(n)]
+    number = str(number)
+    if number.isascii() and number.isdigit():
+        return _luhn_digits(number)
     
-    digits = digits_of(number)
-    odd_digits = digits[-1::-2]
-    even_digits = digits[-2::-2]
-    
-    checksum = sum(odd_digits)
-    for d in even_digits:
-        checksum += sum(digits_of(d * 2))
+    # Autres entrées (chiffres non ASCII, caractères invalides) : calcul
+    # générique, qui lève ValueError sur un caractère non numérique
+    digits = [int(d) for d in number]
+    checksum = sum(digits[-1::-2])
+    for d in digits[-2::-2]:
+        checksum += sum(int(x) for x in str(d * 2))
     
     return checksum % 10 == 0
 
@@ -34,16 +128,19 @@ def validate_siren(siren: str) -> Tuple[bool, Optional[str]]:
     Returns:
         (is_valid, error_message)
     """
-    # Nettoyer l'input
-    siren = siren.strip().replace(" ", "").replace("-", "")
+    # Nettoyer l'input, sauf s'il n'est fait que de chiffres (cas courant)
+    if not siren.isdecimal():
+        siren = siren.strip().replace(" ", "").replace("-", "")
+        if not siren.isdecimal():
+            return False, SIREN_FORMAT_ERROR
     
-    # Vérifier que c'est 9 chiffres
-    if not re.match(r'^\d{9}$', siren):
-        return False, "Le SIREN doit contenir exactement 9 chiffres"
+    # Vérifier que c'est 9 chiffres (isdecimal : même définition que \d)
+    if len(siren) != 9:
+        return False, SIREN_FORMAT_ERROR
     
     # Vérifier avec l'algorithme de Luhn
-    if not validate_luhn(siren):
-        return False, "Le SIREN n'est pas valide (échec de l'algorithme de Luhn)"
+    if not _luhn_digits(siren):
+        return False, SIREN_LUHN_ERROR
     
     return True, None
 
@@ -54,25 +151,227 @@ def validate_siret(siret: str) -> Tuple[bool, Optional[str]]:
     Returns:
         (is_valid, error_message)
     """
-    # Nettoyer l'input
-    siret = siret.strip().replace(" ", "").replace("-", "")
+    # Nettoyer l'input, sauf s'il n'est fait que de chiffres (cas courant)
+    if not siret.isdecimal():
+        siret = siret.strip().replace(" ", "").replace("-", "")
+        if not siret.isdecimal():
+            return False, SIRET_FORMAT_ERROR
     
     # Vérifier que c'est 14 chiffres
-    if not re.match(r'^\d{14}$', siret):
-        return False, "Le SIRET doit contenir exactement 14 chiffres"
+    if len(siret) != 14:
+        return False, SIRET_FORMAT_ERROR
     
     # Vérifier avec l'algorithme de Luhn
-    if not validate_luhn(siret):
-        return False, "Le SIRET n'est pas valide (échec de l'algorithme de Luhn)"
+    if not _luhn_digits(siret):
+        return False, SIRET_LUHN_ERROR
     
-    # Vérifier que le SIREN (9 premiers chiffres) est valide
-    siren = siret[:9]
-    siren_valid, siren_error = validate_siren(siren)
-    if not siren_valid:
-        return False, f"Le SIREN contenu dans le SIRET n'est pas valide: {siren_error}"
+    # Vérifier que le SIREN (9 premiers chiffres) est valide : le format est
+    # déjà garanti, seul Luhn reste à vérifier
+    if not _luhn_digits(siret[:9]):
+        return False, SIRET_SIREN_ERROR
     
     return True, None
 
+# Surchargeables pour pointer vers des bouchons (voir benchmarks/stubs.py)
+SIRENE_BASE_URL = os.getenv("SIRENE_BASE_URL", "https://api.insee.fr/entreprises/sirene/V3.11")
+VIES_URL = os.getenv("VIES_URL", "https://ec.europa.eu/taxation_customs/vies/services/checkVatService")
+# Délai maximal d'un appel amont ; le délai effectif s'adapte à la latence
+# observée (voir breaker.py)
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+
+# Cache Sirene : les fiches entreprise changent rarement d'une minute à l'autre.
+# Les 404 sont mis en cache moins longtemps (cache négatif).
+SIRENE_CACHE_TTL = float(os.getenv("SIRENE_CACHE_TTL", "21600"))
+SIRENE_NEGATIVE_TTL = float(os.getenv("SIRENE_NEGATIVE_TTL", "300"))
+SIRENE_CACHE_SIZE = int(os.getenv("SIRENE_CACHE_SIZE", "50000"))
+
+sirene_cache = TieredCache(
+    "sirene",
+    maxsize=SIRENE_CACHE_SIZE,
+    ttl=SIRENE_CACHE_TTL,
+    backend=shared_backend
+)
+
+# Recherches groupées (batch, fichiers, jobs) : jusqu'à SIRENE_BULK_SIZE
+# identifiants par requête multicritère, réunis pendant SIRENE_BULK_WINDOW
+# secondes (1 ou 0 : une requête par identifiant)
+SIRENE_BULK_SIZE = int(os.getenv("SIRENE_BULK_SIZE", "100"))
+SIRENE_BULK_WINDOW = float(os.getenv("SIRENE_BULK_WINDOW", "0.01"))
+
+sirene_breaker = CircuitBreaker("sirene", max_timeout=UPSTREAM_TIMEOUT)
+
+# Stale-while-revalidate : une entrée plus vieille que la durée « douce »
+# est servie immédiatement (avec son âge, data_age) et rafraîchie en tâche
+# de fond ; la durée du cache reste la limite au-delà de laquelle l'amont
+# est attendu. Rafraîchissements limités à SWR_REFRESH_CONCURRENCY appels
+# simultanés par service, SWR_MAX_PENDING en attente au plus.
+SIRENE_SOFT_TTL = float(os.getenv("SIRENE_SOFT_TTL", "3600"))
+SWR_REFRESH_CONCURRENCY = int(os.getenv("SWR_REFRESH_CONCURRENCY", "4"))
+SWR_MAX_PENDING = int(os.getenv("SWR_MAX_PENDING", "1000"))
+
+sirene_refresher = BackgroundRefresher("sirene", SWR_REFRESH_CONCURRENCY, SWR_MAX_PENDING)
+
+def _is_sirene_identifier(identifier: str, type: str) -> bool:
+    """SIRET de 14 chiffres ou SIREN de 9, sans autre caractère (terme sûr d'une requête q)"""
+    return len(identifier) == (14 if type == "siret" else 9) and identifier.isascii() and identifier.isdigit()
+
+def _sirene_cache_key(identifier: str, type: str) -> str:
+    """Clé de cache : SIRET et SIREN sont rangés séparément"""
+    return f"{type}:{identifier}"
+
+def _lookup_sirene_index(identifier: str, type: str) -> Optional[Dict[str, Any]]:
+    """Recherche dans l'index local des fichiers stock, s'il est configuré"""
+    index = get_sirene_index()
+    if index is None:
+        return None
+    return index.lookup(identifier, type)
+
+def _sirene_ttl(result: Optional[Dict[str, Any]]) -> float:
+    return SIRENE_CACHE_TTL if result is not None else SIRENE_NEGATIVE_TTL
+
+def _record_sirene_call(status_code: int, latency: float) -> None:
+    """Les erreurs serveur et le dépassement de quota comptent comme des échecs"""
+    if status_code >= 500 or status_code == 429:
+        sirene_breaker.record_failure()
+    else:
+        sirene_breaker.record_success(latency)
+
+def _sirene_headers() -> Dict[str, str]:
+    # Jeton OAuth2 courant si des identifiants INSEE sont configurés (voir insee_auth.py)
+    return {
+        "Accept": "application/json",
+        **insee_tokens.header()
+    }
+
+def _sirene_request(identifier: str, type: str) -> Tuple[str, Dict[str, str]]:
+    """Construit l'URL et les en-têtes d'une requête Sirene"""
+    if type == "siret":
+        url = f"{SIRENE_BASE_URL}/siret/{identifier}"
+    else:
+        url = f"{SIRENE_BASE_URL}/siren/{identifier}"
+    
+    return url, _sirene_headers()
+
+async def _sirene_send(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    """Requête Sirene authentifiée ; sur un 401, le jeton est renouvelé et la requête rejouée une fois"""
+    # Premier appel avec LAZY_STARTUP (renouvellement pas encore démarré),
+    # ou jeton absent ou expiré après des échecs de renouvellement
+    await insee_tokens.ensure()
+    token = insee_tokens.token
+    response = await client.request(method, url, headers=_sirene_headers(), **kwargs)
+    if response.status_code == 401 and insee_tokens.enabled:
+        await insee_tokens.refresh(stale=token)
+        response = await client.request(method, url, headers=_sirene_headers(), **kwargs)
+    return response
+
+def _with_current_period(item: Dict[str, Any], periods_key: str) -> Dict[str, Any]:
+    """
+    Ajoute à une unité légale ou un établissement les champs de sa période
+    courante (dénomination, état, activité...), que l'API range dans
+    periodesUniteLegale / periodesEtablissement
+    """
+    periods = item.get(periods_key)
+    if not periods:
+        return item
+    return {**periods[0], **{k: v for k, v in item.items() if k != periods_key}}
+
+def _parse_sirene_data(data: Dict[str, Any], type: str) -> Optional[Dict[str, Any]]:
+    """Extrait les données essentielles d'une réponse Sirene"""
+    if type == "siret" and "etablissement" in data:
+        etab = _with_current_period(data["etablissement"], "periodesEtablissement")
+        unit = etab.get("uniteLegale", {})
+        
+        return {
+            "siret": etab.get("siret"),
+            "siren": etab.get("siren"),
+            "denomination": unit.get("denominationUniteLegale") or 
+                           f"{unit.get('prenom1UniteLegale', '')} {unit.get('nomUniteLegale', '')}".strip(),
+            "adresse": {
+                "numero": etab.get("adresseEtablissement", {}).get("numeroVoieEtablissement"),
+                "voie": etab.get("adresseEtablissement", {}).get("libelleVoieEtablissement"),
+                "code_postal": etab.get("adresseEtablissement", {}).get("codePostalEtablissement"),
+                "ville": etab.get("adresseEtablissement", {}).get("libelleCommuneEtablissement")
+            },
+            "code_naf": etab.get("activitePrincipaleEtablissement"),
+            "date_creation": etab.get("dateCreationEtablissement"),
+            "statut": "Actif" if etab.get("etatAdministratifEtablissement") == "A" else "Fermé"
+        }
+    
+    elif type == "siren" and "uniteLegale" in data:
+        unit = _with_current_period(data["uniteLegale"], "periodesUniteLegale")
+        
+        return {
+            "siren": unit.get("siren"),
+            "denomination": unit.get("denominationUniteLegale") or 
+                           f"{unit.get('prenom1UniteLegale', '')} {unit.get('nomUniteLegale', '')}".strip(),
+            "categorie_juridique": unit.get("categorieJuridiqueUniteLegale"),
+            "code_naf": unit.get("activitePrincipaleUniteLegale"),
+            "date_creation": unit.get("dateCreationUniteLegale"),
+            "statut": "Actif" if unit.get("etatAdministratifUniteLegale") == "A" else "Fermé"
+        }
+    
+    return None
+
+async def _fetch_sirene_bulk(
+    group: Tuple[str, Any],
+    identifiers: List[str]
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Recherche multicritère de plusieurs SIRET (ou SIREN) en une requête
+
+    group : (type, budget) ; voir sirene_batcher. Seuls les identifiants
+    bien formés entrent dans la requête : un terme mal formé ferait
+    rejeter la recherche de tout le groupe.
+
+    Returns:
+        {identifiant: données}, sans les identifiants inconnus de l'INSEE
+    """
+    type, budget = group
+    terms = [identifier for identifier in identifiers if _is_sirene_identifier(identifier, type)]
+    if not terms:
+        return {}
+    # POST : la requête q dépasserait la longueur d'URL admise en GET
+    form = {
+        "q": " OR ".join(f"{type}:{identifier}" for identifier in terms),
+        "nombre": str(len(terms))
+    }
+    
+    if budget is not None:
+        await budget.acquire()
+    try:
+        with upstream_call("sirene") as call:
+            response = await _sirene_send(
+                get_http_client("sirene"),
+                "POST",
+                f"{SIRENE_BASE_URL}/{type}",
+                data=form,
+                timeout=sirene_breaker.timeout()
+            )
+            call.status = response.status_code
+    except Exception:
+        sirene_breaker.record_failure()
+        raise
+    _record_sirene_call(response.status_code, call.duration)
+    
+    # 404 : aucun des identifiants n'est connu
+    if response.status_code == 404:
+        return {}
+    if response.status_code != 200:
+        raise RuntimeError(f"Erreur Sirene: {response.status_code}")
+    
+    if type == "siret":
+        items = [{"etablissement": e} for e in response.json().get("etablissements", [])]
+    else:
+        items = [{"uniteLegale": u} for u in response.json().get("unitesLegales", [])]
+    results = {}
+    for item in items:
+        result = _parse_sirene_data(item, type)
+        if result is not None:
+            results[result[type]] = result
+    return results
+
+sirene_batcher = MicroBatcher(_fetch_sirene_bulk, window=SIRENE_BULK_WINDOW, max_size=max(1, SIRENE_BULK_SIZE))
+
 def get_company_info_from_sirene(
     identifier: str,
     type: str = "siret"
@@ -80,6 +379,9 @@ def get_company_info_from_sirene(
     """
     Récupère les informations d'une entreprise depuis l'API Sirene de l'INSEE
     
+    Version synchrone (bloquante), conservée pour les scripts.
+    Les endpoints de l'API utilisent get_company_info_from_sirene_async.
+    
     Args:
         identifier: SIREN ou SIRET
         type: "siren" ou "siret"
@@ -87,176 +389,441 @@ def get_company_info_from_sirene(
     Returns:
         Dictionnaire avec les données ou None
     """
+    local = _lookup_sirene_index(identifier, type)
+    if local is not None:
+        return local
+    
+    key = _sirene_cache_key(identifier, type)
+    found, cached = sirene_cache.get(key)
+    if found:
+        return cached
+    
+    if not sirene_breaker.allow():
+        record_circuit_open("sirene")
+        return None
+    
     try:
-        # API Sirene ouverte de l'INSEE
-        # Note: En production, utiliser une clé API pour plus de requêtes
-        if type == "siret":
-            url = f"https://api.insee.fr/entreprises/sirene/V3.11/siret/{identifier}"
-        else:
-            url = f"https://api.insee.fr/entreprises/sirene/V3.11/siren/{identifier}"
+        insee_tokens.ensure_sync()
+        url, headers = _sirene_request(identifier, type)
         
-        # En production, ajouter votre clé API INSEE
-        headers = {
-            "Accept": "application/json"
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
+        with upstream_call("sirene") as call:
+            response = get_sync_http_client("sirene").get(url, headers=headers, timeout=sirene_breaker.timeout())
+            if response.status_code == 401 and insee_tokens.enabled:
+                insee_tokens.fetch_sync()
+                url, headers = _sirene_request(identifier, type)
+                response = get_sync_http_client("sirene").get(url, headers=headers, timeout=sirene_breaker.timeout())
+            call.status = response.status_code
+        _record_sirene_call(response.status_code, call.duration)
         
         if response.status_code == 200:
-            data = response.json()
-            
-            # Parser les données essentielles
-            if type == "siret" and "etablissement" in data:
-                etab = data["etablissement"]
-                unit = etab.get("uniteLegale", {})
-                
-                return {
-                    "siret": etab.get("siret"),
-                    "siren": etab.get("siren"),
-                    "denomination": unit.get("denominationUniteLegale") or 
-                                   f"{unit.get('prenom1UniteLegale', '')} {unit.get('nomUniteLegale', '')}".strip(),
-                    "adresse": {
-                        "numero": etab.get("adresseEtablissement", {}).get("numeroVoieEtablissement"),
-                        "voie": etab.get("adresseEtablissement", {}).get("libelleVoieEtablissement"),
-                        "code_postal": etab.get("adresseEtablissement", {}).get("codePostalEtablissement"),
-                        "ville": etab.get("adresseEtablissement", {}).get("libelleCommuneEtablissement")
-                    },
-                    "code_naf": etab.get("activitePrincipaleEtablissement"),
-                    "date_creation": etab.get("dateCreationEtablissement"),
-                    "statut": "Actif" if etab.get("etatAdministratifEtablissement") == "A" else "Fermé"
-                }
-            
-            elif type == "siren" and "uniteLegale" in data:
-                unit = data["uniteLegale"]
-                
-                return {
-                    "siren": unit.get("siren"),
-                    "denomination": unit.get("denominationUniteLegale") or 
-                                   f"{unit.get('prenom1UniteLegale', '')} {unit.get('nomUniteLegale', '')}".strip(),
-                    "categorie_juridique": unit.get("categorieJuridiqueUniteLegale"),
-                    "code_naf": unit.get("activitePrincipaleUniteLegale"),
-                    "date_creation": unit.get("dateCreationUniteLegale"),
-                    "statut": "Actif" if unit.get("etatAdministratifUniteLegale") == "A" else "Fermé"
-                }
+            result = _parse_sirene_data(response.json(), type)
+            sirene_cache.set(key, result, _sirene_ttl(result))
+            return result
+        
+        if response.status_code == 404:
+            sirene_cache.set(key, None, SIRENE_NEGATIVE_TTL)
         
         return None
         
     except Exception as e:
+        sirene_breaker.record_failure()
+        print(f"Erreur lors de la récupération des données Sirene: {e}")
+        return None
+
+async def get_company_info_from_sirene_async(
+    identifier: str,
+    type: str = "siret",
+    client: Optional[httpx.AsyncClient] = None,
+    budget=None,
+    bulk: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Version asynchrone de get_company_info_from_sirene
+    
+    Utilise le client HTTP mutualisé de l'application (voir upstream.py)
+    pour ne jamais bloquer la boucle d'événements.
+    
+    Args:
+        identifier: SIREN ou SIRET
+        type: "siren" ou "siret"
+        client: client httpx à utiliser (par défaut le client partagé)
+        budget: budget d'appels amont (objet exposant acquire()), consommé
+                uniquement si l'API Sirene est réellement appelée
+        bulk: regrouper la recherche avec les recherches simultanées en une
+              requête multicritère (quelques millisecondes d'attente en plus) ;
+              une panne amont lève alors une exception, que les lots
+              rapportent en erreur du document, au lieu de renvoyer None
+    
+    Returns:
+        Dictionnaire avec les données ou None
+    """
+    local = _lookup_sirene_index(identifier, type)
+    if local is not None:
+        return local
+    
+    key = _sirene_cache_key(identifier, type)
+    found, cached, age = await sirene_cache.aget_with_age(key)
+    if found:
+        if cached is not None and age > SIRENE_SOFT_TTL:
+            sirene_refresher.schedule(key, lambda: _fetch_sirene_upstream(key, identifier, type, bulk=True))
+        return _with_data_age(cached, age)
+    
+    return _with_data_age(await _fetch_sirene_upstream(key, identifier, type, client, budget, bulk), 0)
+
+async def refresh_sirene(identifier: str, type: str = "siret", min_age: float = 0.0) -> bool:
+    """
+    Rafraîchit l'entrée en cache d'un identifiant absente ou plus vieille que
+    min_age secondes (préchargement, voir prewarm.py) ; False si inutile
+    """
+    if _lookup_sirene_index(identifier, type) is not None:
+        return False
+    key = _sirene_cache_key(identifier, type)
+    found, _, age = await sirene_cache.aget_with_age(key)
+    if found and age < min_age:
+        return False
+    await sirene_refresher.refresh(key, lambda: _fetch_sirene_upstream(key, identifier, type, bulk=True))
+    return True
+
+async def _fetch_sirene_upstream(
+    key: str,
+    identifier: str,
+    type: str,
+    client: Optional[httpx.AsyncClient] = None,
+    budget=None,
+    bulk: bool = False
+) -> Optional[Dict[str, Any]]:
+    """Appel Sirene effectif, dont le résultat alimente le cache"""
+    # Service en panne : échec immédiat plutôt qu'une attente du délai
+    if not sirene_breaker.allow():
+        record_circuit_open("sirene")
+        if bulk:
+            raise RuntimeError("Service Sirene indisponible, réessayer plus tard")
+        return None
+    
+    # Identifiant mal formé : requête unitaire, pour ne pas faire échouer le groupe
+    if bulk and SIRENE_BULK_SIZE > 1 and client is None and _is_sirene_identifier(identifier, type):
+        result = await sirene_batcher.load((type, budget), identifier)
+        await sirene_cache.aset(key, result, _sirene_ttl(result))
+        return result
+    
+    try:
+        url, _ = _sirene_request(identifier, type)
+        
+        if budget is not None:
+            await budget.acquire()
+        if client is None:
+            client = get_http_client("sirene")
+        with upstream_call("sirene") as call:
+            response = await _sirene_send(client, "GET", url, timeout=sirene_breaker.timeout())
+            call.status = response.status_code
+        _record_sirene_call(response.status_code, call.duration)
+        
+        if response.status_code == 200:
+            result = _parse_sirene_data(response.json(), type)
+            await sirene_cache.aset(key, result, _sirene_ttl(result))
+            return result
+        
+        if response.status_code == 404:
+            await sirene_cache.aset(key, None, SIRENE_NEGATIVE_TTL)
+            return None
+        
+    except Exception as e:
+        sirene_breaker.record_failure()
+        if bulk:
+            raise
         print(f"Erreur lors de la récupération des données Sirene: {e}")
         return None
+    
+    # Autre réponse (quota dépassé, erreur serveur) : pas de données
+    if bulk:
+        raise RuntimeError(f"Erreur Sirene: {response.status_code}")
+    return None
+
+def _with_data_age(result: Optional[Dict[str, Any]], age: float) -> Optional[Dict[str, Any]]:
+    """Copie du résultat avec son âge en secondes (la valeur en cache reste inchangée)"""
+    if result is None:
+        return None
+    return {**result, "data_age": int(age)}
 
 # ============ VALIDATION TVA INTRACOMMUNAUTAIRE ============
 
+
+EU_VAT_COUNTRIES = frozenset({
+    "AT", "BE", "BG", "CY", "CZ", "DE", "DK", "EE", "EL", "ES",
+    "FI", "FR", "HR", "HU", "IE", "IT", "LT", "LU", "LV", "MT",
+    "NL", "PL", "PT", "RO", "SE", "SI", "SK"
+})
+
 def validate_tva_intracommunautaire(numero_tva: str) -> Tuple[bool, Optional[str], Optional[str]]:
     """
     Valide le format d'un numéro de TVA intracommunautaire
     
+    Le format et la clé de contrôle propres à chaque État membre sont
+    vérifiés (voir vat_numbers.py) : un numéro refusé ici n'est jamais
+    soumis à VIES.
+    
     Returns:
         (is_valid, country_code, error_message)
     """
-    # Nettoyer l'input
-    numero_tva = numero_tva.strip().upper().replace(" ", "").replace(".", "")
-    
-    # Vérifier le format de base (2 lettres + chiffres)
-    if not re.match(r'^[A-Z]{2}[A-Z0-9]+$', numero_tva):
-        return False, None, "Format invalide. Le numéro de TVA doit commencer par 2 lettres suivies de chiffres"
-    
+    # Nettoyer l'input, sauf s'il est déjà en forme canonique (cas courant).
+    # Format de base (2 lettres + chiffres) : [A-Z]{2}[A-Z0-9]+, les
+    # minuscules ayant été converties (bytes.isalnum : ASCII seulement) ;
+    # puis le pays, avant tout calcul
+    raw = numero_tva.encode()
+    if not (raw.isalnum() and raw.isupper()):
+        numero_tva = numero_tva.strip().upper().replace(" ", "").replace(".", "")
+        if not numero_tva.encode().isalnum():
+            return False, None, TVA_FORMAT_ERROR
     country_code = numero_tva[:2]
+    if country_code not in EU_VAT_COUNTRIES or len(numero_tva) == 2:
+        # Un pays de l'UE est fait de deux lettres : le détail du format
+        # n'est vérifié qu'en cas de refus
+        if len(numero_tva) <= 2 or not country_code.isalpha():
+            return False, None, TVA_FORMAT_ERROR
+        return False, country_code, f"Code pays '{country_code}' non reconnu pour un numéro de TVA UE"
     
     # Validation spécifique France
     if country_code == "FR":
         # Format FR: FR + 2 chiffres (clé) + 9 chiffres (SIREN)
-        if not re.match(r'^FR[0-9A-Z]{2}\d{9}$', numero_tva):
-            return False, country_code, "Format TVA française invalide. Format attendu: FR + 2 caractères + 9 chiffres"
-        
         siren = numero_tva[4:]
-        siren_valid, siren_error = validate_siren(siren)
-        if not siren_valid:
-            return False, country_code, f"SIREN invalide dans le numéro de TVA: {siren_error}"
-    
-    # Autres pays européens (validation de base)
-    eu_countries = [
-        "AT", "BE", "BG", "CY", "CZ", "DE", "DK", "EE", "EL", "ES",
-        "FI", "FR", "HR", "HU", "IE", "IT", "LT", "LU", "LV", "MT",
-        "NL", "PL", "PT", "RO", "SE", "SI", "SK"
-    ]
-    
-    if country_code not in eu_countries:
-        return False, country_code, f"Code pays '{country_code}' non reconnu pour un numéro de TVA UE"
+        if not (len(numero_tva) == 13 and siren.isdigit()):
+            return False, country_code, TVA_FR_FORMAT_ERROR
+        
+        # SIREN de 9 chiffres ASCII : seul Luhn reste à vérifier
+        if not _luhn_digits(siren):
+            return False, country_code, TVA_SIREN_ERROR
+        # Clé numérique : (12 + 3 * (SIREN % 97)) % 97, sans passer par la
+        # table des pays (clés alphanumériques des anciens numéros : vat_numbers)
+        key = numero_tva[2:4]
+        if key.isdigit():
+            if int(key) != (12 + 3 * (int(siren) % 97)) % 97:
+                return False, country_code, TVA_CHECKSUM_ERROR
+            return True, country_code, None
+    
+    # Format et clé de contrôle du pays
+    error_msg = vat_number_error(country_code, numero_tva[2:])
+    if error_msg is not None:
+        return False, country_code, error_msg
     
     return True, country_code, None
 
+# Cache VIES : durées distinctes selon la réponse. Les erreurs (valid: None)
+# ne sont gardées que brièvement, pour absorber les rafales pendant une panne,
+# et ne remplacent jamais une réponse définitive.
+VIES_VALID_TTL = float(os.getenv("VIES_VALID_TTL", "86400"))
+VIES_INVALID_TTL = float(os.getenv("VIES_INVALID_TTL", "3600"))
+VIES_ERROR_TTL = float(os.getenv("VIES_ERROR_TTL", "30"))
+VIES_CACHE_SIZE = int(os.getenv("VIES_CACHE_SIZE", "50000"))
+
+vies_cache = TieredCache(
+    "vies",
+    maxsize=VIES_CACHE_SIZE,
+    ttl=VIES_VALID_TTL,
+    backend=shared_backend
+)
+vies_flight = SingleFlight()
+# Un disjoncteur par État membre : une panne allemande ne bloque pas la France
+vies_breakers = BreakerGroup("vies", max_timeout=UPSTREAM_TIMEOUT)
+# Résultat définitif plus vieux que VIES_SOFT_TTL : servi et revérifié en
+# tâche de fond (voir SIRENE_SOFT_TTL)
+VIES_SOFT_TTL = float(os.getenv("VIES_SOFT_TTL", "21600"))
+vies_refresher = BackgroundRefresher("vies", SWR_REFRESH_CONCURRENCY, SWR_MAX_PENDING)
+
+def _vies_cache_key(numero_tva: str) -> str:
+    """Clé de cache et de déduplication : code pays + numéro"""
+    return numero_tva.strip().upper().replace(" ", "")
+
+def _vies_ttl(result: Dict[str, Any]) -> float:
+    if result.get("valid") is True:
+        return VIES_VALID_TTL
+    # Refus de VIES (saisie invalide, numéro bloqué) : la même requête serait refusée
+    if result.get("valid") is False or result.get("retryable") is False:
+        return VIES_INVALID_TTL
+    return VIES_ERROR_TTL
+
+def _vies_unavailable(country_code: str) -> Dict[str, Any]:
+    """Réponse immédiate quand le disjoncteur du pays est ouvert (jamais mise en cache)"""
+    return {
+        "valid": None,
+        "error": f"Service VIES indisponible pour {country_code}, réessayer plus tard",
+        "checked_at": "VIES"
+    }
+
+def _vies_error(error: ViesError) -> Dict[str, Any]:
+    """Résultat sans verdict d'un fault VIES ou d'une réponse HTTP inattendue"""
+    return {
+        "valid": None,
+        "error": f"Erreur lors de la vérification VIES: {error.code}",
+        "fault": error.code,
+        "retryable": error.retryable,
+        "checked_at": "VIES"
+    }
+
+def _vies_result(status_code: int, content: bytes) -> Dict[str, Any]:
+    """Transforme la réponse HTTP de VIES en dictionnaire de résultat"""
+    try:
+        result = parse_vies_response(status_code, content)
+    except ViesError as e:
+        return _vies_error(e)
+    result["checked_at"] = "VIES"
+    return result
+
+def _record_vies_call(breaker: CircuitBreaker, result: Dict[str, Any], latency: float) -> None:
+    """
+    Une réponse sans verdict réessayable (État membre indisponible ou
+    surchargé, erreur HTTP) est un échec : le disjoncteur du pays espace
+    alors les appels. Un refus (INVALID_INPUT, IP_BLOCKED...) n'en est pas un.
+    """
+    if result.get("valid") is None and result.get("retryable", True):
+        breaker.record_failure()
+    else:
+        breaker.record_success(latency)
+
 def check_tva_vies(numero_tva: str) -> Dict[str, Any]:
     """
     Vérifie un numéro de TVA auprès du système VIES de l'UE
     
+    Version synchrone (bloquante), conservée pour les scripts.
+    Les endpoints de l'API utilisent check_tva_vies_async.
+    
     Returns:
         Dictionnaire avec le résultat de la vérification
     """
+    key = _vies_cache_key(numero_tva)
+    found, cached = vies_cache.get(key)
+    if found:
+        return cached
+    
+    breaker = vies_breakers.get(key[:2])
+    if not breaker.allow():
+        record_circuit_open("vies")
+        return _vies_unavailable(key[:2])
+    
     try:
-        numero_tva = numero_tva.strip().upper().replace(" ", "")
-        country_code = numero_tva[:2]
-        vat_number = numero_tva[2:]
-        
-        # URL du service SOAP VIES
-        url = "https://ec.europa.eu/taxation_customs/vies/services/checkVatService"
+        soap_request = encode_vies_request(numero_tva)
         
-        # Créer la requête SOAP
-        soap_request = f"""<?xml version="1.0" encoding="UTF-8"?>
-<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
-                  xmlns:urn="urn:ec.europa.eu:taxud:vies:services:checkVat:types">
-    <soapenv:Header/>
-    <soapenv:Body>
-        <urn:checkVat>
-            <urn:countryCode>{country_code}</urn:countryCode>
-            <urn:vatNumber>{vat_number}</urn:vatNumber>
-        </urn:checkVat>
-    </soapenv:Body>
-</soapenv:Envelope>"""
+        with upstream_call("vies") as call:
+            response = get_sync_http_client("vies").post(VIES_URL, content=soap_request, headers=VIES_REQUEST_HEADERS, timeout=breaker.timeout())
+            call.status = response.status_code
         
-        headers = {
-            "Content-Type": "text/xml; charset=utf-8",
-            "SOAPAction": ""
+        result = _vies_result(response.status_code, response.content)
+        _record_vies_call(breaker, result, call.duration)
+    
+    except Exception as e:
+        breaker.record_failure()
+        result = {
+            "valid": None,
+            "error": f"Erreur VIES: {str(e)}",
+            "checked_at": "VIES"
         }
+    
+    vies_cache.set(key, result, _vies_ttl(result))
+    return result
+
+async def check_tva_vies_async(
+    numero_tva: str,
+    client: Optional[httpx.AsyncClient] = None,
+    budget=None
+) -> Dict[str, Any]:
+    """
+    Version asynchrone de check_tva_vies
+    
+    Les vérifications simultanées d'un même numéro partagent un seul appel
+    VIES, et les résultats sont mis en cache (voir _vies_ttl). Le budget
+    éventuel n'est consommé que par un appel VIES effectif.
+    
+    Returns:
+        Dictionnaire avec le résultat de la vérification
+    """
+    key = _vies_cache_key(numero_tva)
+    found, cached, age = await vies_cache.aget_with_age(key)
+    if found:
+        if cached.get("valid") is not None and age > VIES_SOFT_TTL:
+            vies_refresher.schedule(key, lambda: _refresh_vies(key, numero_tva))
+        return _with_data_age(cached, age)
+    
+    result = await vies_flight.do(key, lambda: _check_tva_vies_upstream(key, numero_tva, client, budget))
+    return _with_data_age(result, 0)
+
+async def refresh_vies(numero_tva: str, min_age: float = 0.0) -> bool:
+    """Comme refresh_sirene, pour un numéro de TVA"""
+    key = _vies_cache_key(numero_tva)
+    found, _, age = await vies_cache.aget_with_age(key)
+    if found and age < min_age:
+        return False
+    await vies_refresher.refresh(key, lambda: _refresh_vies(key, numero_tva))
+    return True
+
+async def _refresh_vies(key: str, numero_tva: str) -> None:
+    # Partage l'appel avec une éventuelle vérification simultanée du même numéro
+    await vies_flight.do(key, lambda: _check_tva_vies_upstream(key, numero_tva, None, keep_definitive=True))
+
+async def _check_tva_vies_upstream(
+    key: str,
+    numero_tva: str,
+    client: Optional[httpx.AsyncClient],
+    budget=None,
+    keep_definitive: bool = False
+) -> Dict[str, Any]:
+    """
+    Appel VIES effectif, dont le résultat alimente le cache
+
+    keep_definitive (rafraîchissement) : une erreur ne remplace pas le
+    résultat définitif encore en cache.
+    """
+    # État membre en panne : échec immédiat plutôt qu'une attente du délai
+    breaker = vies_breakers.get(key[:2])
+    if not breaker.allow():
+        record_circuit_open("vies")
+        return _vies_unavailable(key[:2])
+    
+    try:
+        soap_request = encode_vies_request(numero_tva)
         
-        response = requests.post(url, data=soap_request, headers=headers, timeout=10)
+        if budget is not None:
+            await budget.acquire()
+        if client is None:
+            client = get_http_client("vies")
+        with upstream_call("vies") as call:
+            response = await client.post(VIES_URL, content=soap_request, headers=VIES_REQUEST_HEADERS, timeout=breaker.timeout())
+            call.status = response.status_code
         
-        if response.status_code == 200:
-            # Parser la réponse XML
-            root = ET.fromstring(response.content)
-            
-            # Namespaces
-            ns = {
-                'soap': 'http://schemas.xmlsoap.org/soap/envelope/',
-                'vies': 'urn:ec.europa.eu:taxud:vies:services:checkVat:types'
-            }
-            
-            valid = root.find('.//vies:valid', ns)
-            name = root.find('.//vies:name', ns)
-            address = root.find('.//vies:address', ns)
-            
-            return {
-                "valid": valid.text == "true" if valid is not None else False,
-                "name": name.text if name is not None else None,
-                "address": address.text if address is not None else None,
-                "checked_at": "VIES"
-            }
-        else:
-            return {
-                "valid": None,
-                "error": f"Erreur lors de la vérification VIES: {response.status_code}",
-                "checked_at": "VIES"
-            }
+        result = _vies_result(response.status_code, response.content)
+        _record_vies_call(breaker, result, call.duration)
     
     except Exception as e:
-        return {
+        breaker.record_failure()
+        result = {
             "valid": None,
             "error": f"Erreur VIES: {str(e)}",
             "checked_at": "VIES"
         }
+    
+    if result.get("valid") is not None or not keep_definitive:
+        await vies_cache.aset(key, result, _vies_ttl(result))
+    return result
 
 # ============ VALIDATION IBAN FRANÇAIS ============
 
+# Lettres -> nombres pour le MOD 97 (A=10, B=11, ..., Z=35) : chaque
+# caractère devient l'octet dont l'écriture hexadécimale est son nombre
+# (B -> 0x11), un chiffre d -> 0xdf, le "f" étant retiré ensuite
+_IBAN_HEX = bytes.maketrans(
+    b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    bytes(int(f"{d}f", 16) for d in range(10)) + bytes(int(str(v), 16) for v in range(10, 36))
+)
+# Lettres -> chiffres pour la clé RIB (A et J = 1, B, K et S = 2...)
+# (table d'octets : une lettre donne un chiffre, bytes.translate suffit)
+_RIB_LETTERS = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"12345678912345678923456789")
+# Décalage du reste du BBAN derrière "FR" et la clé (6 chiffres) : 10^6 mod 97
+_IBAN_SHIFT = 10**6 % 97
+# Seul un premier caractère F (ou un tiret, retiré au nettoyage) peut donner "FR"
+_IBAN_FIRST = ("F", "f", "-")
+
+def _iban_digits(raw: bytes) -> str:
+    """BBAN alphanumérique (ASCII majuscules) -> chiffres du MOD 97, lettres remplacées par 10 à 35"""
+    return raw.translate(_IBAN_HEX).hex().replace("f", "")
+
 def validate_iban_fr(iban: str) -> Tuple[bool, Optional[Dict[str, Any]], Optional[str]]:
     """
     Valide un IBAN français (27 caractères)
@@ -264,88 +831,71 @@ def validate_iban_fr(iban: str) -> Tuple[bool, Optional[Dict[str, Any]], Optiona
     Returns:
         (is_valid, details, error_message)
     """
+    # Pays d'abord, avant même le nettoyage : un IBAN étranger est refusé
+    # sur son premier caractère
+    if iban.lstrip()[:1] not in _IBAN_FIRST:
+        return False, None, IBAN_COUNTRY_ERROR
+    
     # Nettoyer l'input
     iban = iban.strip().upper().replace(" ", "").replace("-", "")
     
     # Vérifier que c'est un IBAN français
     if not iban.startswith("FR"):
-        return False, None, "L'IBAN doit commencer par 'FR' pour la France"
+        return False, None, IBAN_COUNTRY_ERROR
     
     # Vérifier la longueur (27 caractères pour France)
     if len(iban) != 27:
         return False, None, f"Un IBAN français doit contenir 27 caractères (trouvé: {len(iban)})"
     
-    # Vérifier le format: FR + 2 chiffres (clé) + 23 caractères
-    if not re.match(r'^FR\d{2}[0-9A-Z]{23}$', iban):
-        return False, None, "Format IBAN invalide"
-    
     # Extraire les composants
-    country = iban[0:2]
     check_digits = iban[2:4]
     bban = iban[4:]  # BBAN = Basic Bank Account Number (RIB)
-    
-    # Valider la clé de contrôle IBAN (algorithme MOD 97)
-    # Déplacer les 4 premiers caractères à la fin
-    rearranged = bban + country + check_digits
-    
-    # Remplacer les lettres par des chiffres (A=10, B=11, ..., Z=35)
-    numeric_string = ""
-    for char in rearranged:
-        if char.isalpha():
-            numeric_string += str(ord(char) - ord('A') + 10)
-        else:
-            numeric_string += char
-    
-    # Calculer le modulo 97
-    mod_result = int(numeric_string) % 97
-    
-    if mod_result != 1:
-        return False, None, "Clé de contrôle IBAN invalide"
+    raw = bban.encode()
+    
+    # Vérifier le format: FR + 2 chiffres (clé) + 23 caractères [0-9A-Z]
+    # (méthodes de bytes : ASCII seulement, et plus rapides que celles de str)
+    if not (check_digits.isdecimal() and raw.isalnum()):
+        return False, None, IBAN_FORMAT_ERROR
+    
+    # Valider la clé de contrôle IBAN (algorithme MOD 97) : les 4 premiers
+    # caractères passent à la fin, les lettres deviennent des nombres
+    # (FR = 1527), et le reste de la division entière doit valoir 1.
+    # Clé RIB : code banque + code guichet + numéro de compte + clé, lettres
+    # transcodées, doit être divisible par 97.
+    if raw.isdigit():
+        # BBAN tout en chiffres (cas courant) : un seul reste, replié pour
+        # l'IBAN (BBAN * 10^6 + 1527 * 100 + clé) et repris pour le RIB
+        remainder = int(bban) % 97
+        if (remainder * _IBAN_SHIFT + 152700 + int(check_digits)) % 97 != 1:
+            return False, None, IBAN_CHECKSUM_ERROR
+        if remainder != 0:
+            return False, None, IBAN_RIB_KEY_ERROR
+    else:
+        if ((int(_iban_digits(raw)) % 97) * _IBAN_SHIFT + 152700 + int(check_digits)) % 97 != 1:
+            return False, None, IBAN_CHECKSUM_ERROR
+        if not bban[21:23].isdigit() or int(raw.translate(_RIB_LETTERS)) % 97 != 0:
+            return False, None, IBAN_RIB_KEY_ERROR
     
     # Extraire les détails du RIB français
     # Format BBAN français: 5 (code banque) + 5 (code guichet) + 11 (numéro compte) + 2 (clé RIB)
-    code_banque = bban[0:5]
-    code_guichet = bban[5:10]
-    numero_compte = bban[10:21]
-    cle_rib = bban[21:23]
-    
-    # Valider la clé RIB (algorithme MOD 97 français)
-    rib_string = f"{code_banque}{code_guichet}{numero_compte}"
-    
-    # Remplacer les lettres dans le numéro de compte
-    rib_numeric = ""
-    for char in rib_string:
-        if char.isalpha():
-            # Conversion spéciale pour les lettres en RIB français
-            conversion = {
-                'A': '1', 'B': '2', 'C': '3', 'D': '4', 'E': '5', 'F': '6',
-                'G': '7', 'H': '8', 'I': '9', 'J': '1', 'K': '2', 'L': '3',
-                'M': '4', 'N': '5', 'O': '6', 'P': '7', 'Q': '8', 'R': '9',
-                'S': '2', 'T': '3', 'U': '4', 'V': '5', 'W': '6', 'X': '7',
-                'Y': '8', 'Z': '9'
-            }
-            rib_numeric += conversion.get(char, '0')
-        else:
-            rib_numeric += char
-    
-    # Calculer la clé RIB
-    rib_mod = int(rib_numeric) % 97
-    calculated_key = 97 - rib_mod
-    
-    # La clé RIB devrait correspondre (vérification souple car méthode peut varier)
-    
     details = {
         "iban": iban,
         "country": "France",
         "check_digits": check_digits,
-        "code_banque": code_banque,
-        "code_guichet": code_guichet,
-        "numero_compte": numero_compte,
-        "cle_rib": cle_rib,
+        "code_banque": bban[0:5],
+        "code_guichet": bban[5:10],
+        "numero_compte": bban[10:21],
+        "cle_rib": bban[21:23],
         "format_valid": True,
-        "iban_check_valid": True
+        "iban_check_valid": True,
+        "rib_check_valid": True
     }
     
+    # Banque et guichet d'après l'annuaire local, s'il est configuré
+    directory = get_bank_directory()
+    if directory is not None:
+        details["banque"] = directory.lookup(bban[0:5], bban[5:10])
+    
     return True, details, None
 
 # ============ FONCTION UTILITAIRE ============
@@ -354,3 +904,16 @@ def format_iban_display(iban: str) -> str:
     """Formate un IBAN pour l'affichage (groupes de 4 caractères)"""
     iban = iban.replace(" ", "")
     return " ".join([iban[i:i+4] for i in range(0, len(iban), 4)])
+
+def normalize_identifier(type: str, value: str) -> str:
+    """
+    Forme normalisée d'un identifiant, telle que vue par son validateur
+    (espaces, tirets ou points retirés, majuscules) : deux saisies d'un même
+    numéro ont la même forme normalisée
+    """
+    value = value.strip()
+    if type in ("siret", "siren"):
+        return value.replace(" ", "").replace("-", "")
+    if type == "tva":
+        return value.upper().replace(" ", "").replace(".", "")
+    return value.upper().replace(" ", "").replace("-", "")
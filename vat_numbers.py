@@ -0,0 +1,318 @@
+"""
+Formats et clés de contrôle des numéros de TVA des États membres
+================================================================
+Table par code pays (préfixe VIES, EL pour la Grèce) : motif du numéro
+national (longueurs, lettres autorisées) et algorithme de la clé de
+contrôle publié par chaque administration fiscale. Un numéro mal formé ou
+dont la clé est fausse est refusé localement, sans appel VIES.
+
+Les numéros attribués aux personnes physiques (numéro de naissance
+tchèque ou slovaque, EGN bulgare, CNP roumain, code personnel letton)
+ne sont contrôlés que par leur clé, sans vérification de la date
+qu'ils contiennent : le doute profite au numéro, VIES tranchant ensuite.
+"""
+
+import re
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+TVA_CHECKSUM_ERROR = "Clé de contrôle du numéro de TVA invalide"
+
+def country_format_error(country_code: str) -> str:
+    return f"Format TVA invalide pour {country_code}: {VAT_RULES[country_code].expected}"
+
+# ============ ALGORITHMES COMMUNS ============
+
+def _weighted(number: str, weights) -> int:
+    return sum(w * int(n) for w, n in zip(weights, number))
+
+def _luhn_checksum(number: str) -> int:
+    """0 pour un numéro valide selon Luhn"""
+    total = 0
+    for i, c in enumerate(reversed(number)):
+        d = int(c) * (2 if i % 2 else 1)
+        total += d - 9 if d > 9 else d
+    return total % 10
+
+def _mod_11_10_rows() -> List[list]:
+    # Une ligne par état, indexée par le code ASCII du chiffre, qui donne
+    # directement la ligne de l'état suivant (ni addition ni multiplication
+    # dans la boucle)
+    rows: List[list] = [[] for _ in range(10)]
+    for check, row in enumerate(rows):
+        row.extend(
+            rows[(((check or 10) * 2) % 11 + code - 48) % 10] if 48 <= code < 58 else rows[0]
+            for code in range(128)
+        )
+    return rows
+
+_MOD_11_10_ROWS = _mod_11_10_rows()
+
+def _mod_11_10(number: str) -> bool:
+    """ISO 7064 MOD 11,10 (Allemagne, Croatie), numéro de chiffres ASCII"""
+    row = _MOD_11_10_ROWS[5]
+    for n in number.encode():
+        row = row[n]
+    return row is _MOD_11_10_ROWS[1]
+
+def _mod_97_10(number: str) -> bool:
+    """ISO 7064 MOD 97-10, lettres converties (A=10...)"""
+    return int("".join(str(int(c, 36)) for c in number)) % 97 == 1
+
+# ============ RÈGLES PAR PAYS ============
+
+def _at(n: str) -> bool:
+    return (6 - _luhn_checksum(n[1:8])) % 10 == int(n[8])
+
+def _be(n: str) -> bool:
+    return (int(n[:8]) + int(n[8:])) % 97 == 0
+
+def _bg(n: str) -> bool:
+    if len(n) == 9:
+        check = sum((i + 1) * int(c) for i, c in enumerate(n[:8])) % 11
+        if check == 10:
+            check = sum((i + 3) * int(c) for i, c in enumerate(n[:8])) % 11
+        return check % 10 == int(n[8])
+    # Personne physique (EGN), étranger (PNF) ou autre assujetti
+    return (
+        _weighted(n, (2, 4, 8, 5, 10, 9, 7, 3, 6)) % 11 % 10 == int(n[9])
+        or _weighted(n, (21, 19, 17, 13, 11, 9, 7, 3, 1)) % 10 == int(n[9])
+        or (11 - _weighted(n, (4, 3, 2, 7, 6, 5, 4, 3, 2))) % 11 == int(n[9])
+    )
+
+_CY_ODD = (1, 0, 5, 7, 9, 13, 15, 17, 19, 21)
+
+def _cy(n: str) -> bool:
+    if n.startswith("12"):
+        return False
+    total = sum(_CY_ODD[int(c)] for c in n[0:8:2]) + sum(int(c) for c in n[1:8:2])
+    return chr(65 + total % 26) == n[8]
+
+def _cz(n: str) -> bool:
+    if len(n) == 8:
+        if n[0] == "9":
+            return False
+        check = (11 - sum((8 - i) * int(c) for i, c in enumerate(n[:7]))) % 11
+        return (check or 1) % 10 == int(n[7])
+    if len(n) == 9 and n[0] == "6":
+        check = sum((8 - i) * int(c) for i, c in enumerate(n[1:8])) % 11
+        return (8 - (10 - check) % 11) % 10 == int(n[8])
+    # Numéro de naissance : clé sur 10 chiffres seulement
+    return len(n) == 9 or int(n[:9]) % 11 % 10 == int(n[9])
+
+def _dk(n: str) -> bool:
+    return _weighted(n, (2, 7, 6, 5, 4, 3, 2, 1)) % 11 == 0
+
+def _ee(n: str) -> bool:
+    return _weighted(n, (3, 7, 1, 3, 7, 1, 3, 7, 1)) % 10 == 0
+
+def _el(n: str) -> bool:
+    # Ancien format sur 8 chiffres
+    n = n.zfill(9)
+    total = 0
+    for c in n[:8]:
+        total = total * 2 + int(c)
+    return total * 2 % 11 % 10 == int(n[8])
+
+_ES_DNI = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+def _es(n: str) -> bool:
+    first, last = n[0], n[8]
+    if first.isdigit():
+        return _ES_DNI[int(n[:8]) % 23] == last
+    if first in "XYZ":
+        return _ES_DNI[int(str("XYZ".index(first)) + n[1:8]) % 23] == last
+    if first in "KLM":
+        return _ES_DNI[int(n[1:8]) % 23] == last
+    if first in "ABCDEFGHJNPQRSUVW":
+        check = (10 - _luhn_checksum(n[1:8] + "0")) % 10
+        return last in (str(check), "JABCDEFGHI"[check])
+    return False
+
+def _fi(n: str) -> bool:
+    return _weighted(n, (7, 9, 10, 5, 8, 4, 2, 1)) % 11 == 0
+
+# Clés alphanumériques françaises : ni I ni O
+_FR_ALPHABET = "0123456789ABCDEFGHJKLMNPQRSTUVWXYZ"
+
+def _fr(n: str) -> bool:
+    key, siren = n[:2], int(n[2:])
+    if key.isdigit():
+        return int(key) == (12 + 3 * (siren % 97)) % 97
+    if key[0] not in _FR_ALPHABET or key[1] not in _FR_ALPHABET:
+        return False
+    if key[0].isdigit():
+        check = _FR_ALPHABET.index(key[0]) * 24 + _FR_ALPHABET.index(key[1]) - 10
+    else:
+        check = _FR_ALPHABET.index(key[0]) * 34 + _FR_ALPHABET.index(key[1]) - 100
+    return (siren + 1 + check // 11) % 11 == check % 11
+
+def _hu(n: str) -> bool:
+    return _weighted(n, (9, 7, 3, 1, 9, 7, 3, 1)) % 10 == 0
+
+_IE_ALPHABET = "WABCDEFGHIJKLMNOPQRSTUV"
+
+def _ie(n: str) -> bool:
+    if n[:7].isdigit():
+        digits, extra = n[:7], n[8:]
+    elif n[1] in "ABCDEFGHIJKLMNOPQRSTUVWXYZ+*":
+        # Ancien format : la lettre en deuxième position ne compte pas
+        digits, extra = "0" + n[2:7] + n[0], ""
+    else:
+        return False
+    if any(c not in _IE_ALPHABET for c in extra):
+        return False
+    total = sum((8 - i) * int(c) for i, c in enumerate(digits)) + 9 * _IE_ALPHABET.index(extra or "W")
+    return _IE_ALPHABET[total % 23] == n[7]
+
+def _it(n: str) -> bool:
+    if int(n[:7]) == 0:
+        return False
+    office = n[7:10]
+    if not ("001" <= office <= "100" or office in ("120", "121", "888", "999")):
+        return False
+    return _luhn_checksum(n) == 0
+
+def _lt(n: str) -> bool:
+    if n[-2] != "1":
+        return False
+    check = sum((1 + i % 9) * int(c) for i, c in enumerate(n[:-1])) % 11
+    if check == 10:
+        check = sum((1 + (i + 2) % 9) * int(c) for i, c in enumerate(n[:-1]))
+    return check % 11 % 10 == int(n[-1])
+
+def _lu(n: str) -> bool:
+    return int(n[:6]) % 89 == int(n[6:])
+
+def _lv(n: str) -> bool:
+    if n[0] > "3":
+        return _weighted(n, (9, 1, 4, 8, 3, 10, 2, 5, 7, 6, 1)) % 11 == 3
+    return (1 + _weighted(n, (10, 5, 8, 4, 2, 1, 6, 3, 7, 9))) % 11 % 10 == int(n[10])
+
+def _mt(n: str) -> bool:
+    return _weighted(n, (3, 4, 6, 7, 8, 9, 10, 1)) % 37 == 0
+
+def _nl(n: str) -> bool:
+    if int(n[:9]) == 0 or int(n[10:]) == 0:
+        return False
+    # Numéro fiscal (BSN / RSIN), ou identifiant des entrepreneurs individuels depuis 2020
+    bsn = (sum((9 - i) * int(c) for i, c in enumerate(n[:8])) - int(n[8])) % 11 == 0
+    return bsn or _mod_97_10("NL" + n)
+
+def _pl(n: str) -> bool:
+    return _weighted(n, (6, 5, 7, 2, 3, 4, 5, 6, 7, -1)) % 11 == 0
+
+def _pt(n: str) -> bool:
+    return (11 - sum((9 - i) * int(c) for i, c in enumerate(n[:8]))) % 11 % 10 == int(n[8])
+
+def _ro(n: str) -> bool:
+    if len(n) == 13:
+        # CNP (personne physique)
+        check = _weighted(n, (2, 7, 9, 1, 4, 6, 3, 5, 8, 2, 7, 9)) % 11
+        return (1 if check == 10 else check) == int(n[12])
+    body = n[:-1].zfill(9)
+    return 10 * _weighted(body, (7, 5, 3, 2, 1, 7, 5, 3, 2)) % 11 % 10 == int(n[-1])
+
+def _se(n: str) -> bool:
+    return _luhn_checksum(n[:10]) == 0
+
+def _si(n: str) -> bool:
+    check = 11 - sum((8 - i) * int(c) for i, c in enumerate(n[:7])) % 11
+    return (0 if check == 10 else check) == int(n[7])
+
+def _sk(n: str) -> bool:
+    # Numéro de naissance, ou entreprise (3e chiffre 2, 3, 4, 7, 8 ou 9)
+    if int(n[:9]) % 11 % 10 == int(n[9]):
+        return True
+    return n[0] != "0" and n[2] in "234789" and int(n) % 11 == 0
+
+class VatRule(NamedTuple):
+    pattern: "re.Pattern[str]"
+    expected: str
+    check: Callable[[str], bool]
+
+# Motif « chiffres seulement » : \d{n}, \d{n,m} ou [1-9]\d{n}, éventuellement
+# en alternatives (|) de même premier chiffre
+_DIGITS_PATTERN = re.compile(r"(\[1-9\])?\\d\{(\d+)(?:,(\d+))?\}")
+
+def _digit_lengths(pattern: str) -> Optional[Tuple[FrozenSet[int], str]]:
+    """Longueurs admises et plus petit premier chiffre d'un motif de chiffres (None sinon)"""
+    lengths = set()
+    nonzero = set()
+    for part in pattern.split("|"):
+        match = _DIGITS_PATTERN.fullmatch(part)
+        if match is None:
+            return None
+        first = match[1] is not None
+        nonzero.add(first)
+        lengths.update(range(int(match[2]) + first, int(match[3] or match[2]) + first + 1))
+    if len(nonzero) != 1:
+        return None
+    return frozenset(lengths), "1" if nonzero.pop() else "0"
+
+def _rule(pattern: str, expected: str, check: Callable[[str], bool]) -> VatRule:
+    # re.ASCII : \d ne reconnaît que les chiffres 0-9
+    return VatRule(re.compile(pattern, re.ASCII), expected, check)
+
+VAT_RULES: Dict[str, VatRule] = {
+    "AT": _rule(r"U\d{8}", "U + 8 chiffres", _at),
+    "BE": _rule(r"[01]\d{9}", "10 chiffres commençant par 0 ou 1", _be),
+    "BG": _rule(r"\d{9,10}", "9 ou 10 chiffres", _bg),
+    "CY": _rule(r"\d{8}[A-Z]", "8 chiffres + 1 lettre", _cy),
+    "CZ": _rule(r"\d{8,10}", "8 à 10 chiffres", _cz),
+    "DE": _rule(r"[1-9]\d{8}", "9 chiffres", _mod_11_10),
+    "DK": _rule(r"[1-9]\d{7}", "8 chiffres", _dk),
+    "EE": _rule(r"\d{9}", "9 chiffres", _ee),
+    "EL": _rule(r"\d{8,9}", "8 ou 9 chiffres", _el),
+    "ES": _rule(r"[0-9A-Z]\d{7}[0-9A-Z]", "9 caractères (lettre ou chiffre, 7 chiffres, lettre ou chiffre)", _es),
+    "FI": _rule(r"\d{8}", "8 chiffres", _fi),
+    "FR": _rule(r"[0-9A-Z]{2}\d{9}", "2 caractères + 9 chiffres", _fr),
+    "HR": _rule(r"\d{11}", "11 chiffres", _mod_11_10),
+    "HU": _rule(r"\d{8}", "8 chiffres", _hu),
+    "IE": _rule(r"\d[0-9A-Z+*]\d{5}[A-W][A-W]?", "8 ou 9 caractères (7 chiffres + 1 ou 2 lettres)", _ie),
+    "IT": _rule(r"\d{11}", "11 chiffres", _it),
+    "LT": _rule(r"\d{9}|\d{12}", "9 ou 12 chiffres", _lt),
+    "LU": _rule(r"\d{8}", "8 chiffres", _lu),
+    "LV": _rule(r"\d{11}", "11 chiffres", _lv),
+    "MT": _rule(r"[1-9]\d{7}", "8 chiffres", _mt),
+    "NL": _rule(r"\d{9}B\d{2}", "9 chiffres + B + 2 chiffres", _nl),
+    "PL": _rule(r"\d{10}", "10 chiffres", _pl),
+    "PT": _rule(r"[1-9]\d{8}", "9 chiffres", _pt),
+    "RO": _rule(r"[1-9]\d{1,9}|\d{13}", "2 à 10 chiffres, ou 13 chiffres", _ro),
+    "SE": _rule(r"\d{10}01", "12 chiffres terminés par 01", _se),
+    "SI": _rule(r"[1-9]\d{7}", "8 chiffres", _si),
+    "SK": _rule(r"\d{10}", "10 chiffres", _sk),
+}
+
+# Pays dont le numéro n'est fait que de chiffres : longueurs, premier chiffre
+# et clé, vérifiés sans expression régulière (tuple simple, plus rapide à
+# dépaqueter que VatRule)
+def _digit_rules() -> Dict[str, Tuple[FrozenSet[int], str, Callable[[str], bool]]]:
+    rules = {}
+    for country_code, rule in VAT_RULES.items():
+        digits = _digit_lengths(rule.pattern.pattern)
+        if digits is not None:
+            rules[country_code] = (*digits, rule.check)
+    return rules
+
+_DIGIT_RULES = _digit_rules()
+
+def vat_number_error(country_code: str, number: str) -> Optional[str]:
+    """
+    Message d'erreur si le numéro national (sans code pays) n'a pas le
+    format ou la clé de contrôle du pays, None sinon (ou pays sans règle)
+    """
+    digit_rule = _DIGIT_RULES.get(country_code)
+    if digit_rule is not None:
+        # bytes.isdigit : chiffres ASCII seulement, comme \d avec re.ASCII
+        lengths, first, check = digit_rule
+        if not (len(number) in lengths and number.encode().isdigit() and number[0] >= first):
+            return country_format_error(country_code)
+        return None if check(number) else TVA_CHECKSUM_ERROR
+    rule = VAT_RULES.get(country_code)
+    if rule is None:
+        return None
+    if rule.pattern.fullmatch(number) is None:
+        return country_format_error(country_code)
+    if not rule.check(number):
+        return TVA_CHECKSUM_ERROR
+    return None
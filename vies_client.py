@@ -0,0 +1,156 @@
+"""
+Encodage et décodage SOAP du service VIES (checkVat)
+====================================================
+- Requête : enveloppe pré-encodée en octets, où ne sont insérés que le code
+  pays et le numéro, échappés pour XML s'ils contiennent autre chose que
+  des lettres et des chiffres.
+- Réponse : un seul parcours du corps relève valid, name, address,
+  requestDate, ou le fault SOAP (faultcode / faultstring), quel que soit le
+  préfixe d'espace de noms ; pas d'arbre XML construit ni de recherche
+  par descendants.
+- Faults : le code d'erreur VIES (faultstring) est traduit en exception
+  typée. ViesRetryableError : indisponibilité ou surcharge (État membre,
+  service, trop de requêtes simultanées), à retenter plus tard avec un
+  délai ; ViesRejectedError : requête refusée (saisie invalide, numéro ou
+  adresse IP bloqués), la rejouer ne changerait rien. Une réponse HTTP
+  sans fault ni verdict est toujours réessayable.
+"""
+
+import re
+from html import unescape
+from typing import Any, Dict, Optional
+
+VIES_NAMESPACE = "urn:ec.europa.eu:taxud:vies:services:checkVat:types"
+
+REQUEST_HEADERS = {
+    "Content-Type": "text/xml; charset=utf-8",
+    "SOAPAction": ""
+}
+
+# Enveloppe checkVat encodée une fois ; %s : code pays, puis numéro
+_ENVELOPE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" '
+    f'xmlns:urn="{VIES_NAMESPACE}">'
+    "<soapenv:Header/><soapenv:Body><urn:checkVat>\n"
+    "<urn:countryCode>%s</urn:countryCode>\n"
+    "<urn:vatNumber>%s</urn:vatNumber>\n"
+    "</urn:checkVat></soapenv:Body></soapenv:Envelope>"
+).encode()
+
+_XML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&apos;"})
+
+# Codes d'erreur VIES (faultstring) : réessayer plus tard peut aboutir
+RETRYABLE_FAULTS = frozenset({
+    "SERVICE_UNAVAILABLE",
+    "MS_UNAVAILABLE",
+    "TIMEOUT",
+    "GLOBAL_MAX_CONCURRENT_REQ",
+    "GLOBAL_MAX_CONCURRENT_REQ_TIME",
+    "MS_MAX_CONCURRENT_REQ",
+    "MS_MAX_CONCURRENT_REQ_TIME"
+})
+# ... la même requête sera toujours refusée
+REJECTED_FAULTS = frozenset({
+    "INVALID_INPUT",
+    "INVALID_REQUESTER_INFO",
+    "VAT_BLOCKED",
+    "IP_BLOCKED"
+})
+
+# ============ ERREURS ============
+
+class ViesError(Exception):
+    """Réponse VIES sans verdict : fault SOAP ou réponse HTTP inattendue"""
+
+    retryable = False
+
+    def __init__(self, code: str, status_code: int):
+        super().__init__(code)
+        self.code = code
+        self.status_code = status_code
+
+class ViesRetryableError(ViesError):
+    """Indisponibilité ou surcharge : réessayer plus tard, en espaçant les appels"""
+
+    retryable = True
+
+class ViesRejectedError(ViesError):
+    """Requête refusée : inutile de la rejouer telle quelle"""
+
+def fault_error(code: str, status_code: int) -> ViesError:
+    """Exception correspondant à un code d'erreur VIES (inconnu : réessayable)"""
+    if code in REJECTED_FAULTS:
+        return ViesRejectedError(code, status_code)
+    return ViesRetryableError(code, status_code)
+
+# ============ REQUÊTE ============
+
+def encode_request(numero_tva: str) -> bytes:
+    """Enveloppe SOAP checkVat d'un numéro de TVA (code pays inclus)"""
+    numero_tva = numero_tva.strip().upper().replace(" ", "")
+    # Numéros validés en amont : lettres et chiffres, rien à échapper
+    if not numero_tva.isalnum():
+        return _ENVELOPE % (numero_tva[:2].translate(_XML_ESCAPES).encode(), numero_tva[2:].translate(_XML_ESCAPES).encode())
+    raw = numero_tva.encode()
+    return _ENVELOPE % (raw[:2], raw[2:])
+
+# ============ RÉPONSE ============
+
+# Élément utile, avec ou sans préfixe d'espace de noms : nom local, "/" s'il
+# est vide (<x/>), puis son texte
+_ELEMENT = re.compile(
+    rb"<(?:[A-Za-z_][\w.-]*:)?(valid|name|address|requestDate|faultcode|faultstring)(?:\s[^>]*?)?(/?)>([^<]*)"
+)
+_FIELDS = {
+    b"valid": "valid",
+    b"name": "name",
+    b"address": "address",
+    b"requestDate": "request_date",
+    b"faultcode": "faultcode",
+    b"faultstring": "faultstring"
+}
+
+def scan_response(content: bytes) -> Dict[str, Optional[str]]:
+    """Champs utiles de la réponse (première occurrence de chacun, None si vide), en un parcours"""
+    fields: Dict[str, Optional[str]] = {}
+    for match in _ELEMENT.finditer(content):
+        field = _FIELDS[match[1]]
+        if field in fields:
+            continue
+        text = match[3]
+        if not text and not match[2] and content.startswith(b"<![CDATA[", match.end()):
+            start = match.end() + 9
+            fields[field] = content[start:content.find(b"]]>", start)].decode() or None
+            continue
+        value = text.decode()
+        fields[field] = (unescape(value) if b"&" in text else value) or None
+    return fields
+
+def parse_response(status_code: int, content: bytes) -> Dict[str, Any]:
+    """
+    Résultat d'une réponse checkVat
+
+    Returns:
+        {"valid", "name", "address", "request_date"}
+
+    Raises:
+        ViesRejectedError : fault SOAP de REJECTED_FAULTS
+        ViesRetryableError : autre fault SOAP, ou réponse HTTP sans verdict
+        (HTTP_<code>)
+    """
+    fields = scan_response(content) if content else {}
+    fault = fields.get("faultstring") or fields.get("faultcode")
+    if fault:
+        raise fault_error(fault.strip(), status_code)
+    if status_code != 200 or "valid" not in fields:
+        # Proxy, passerelle ou réponse tronquée : rien ne dit que VIES a refusé
+        # la requête, elle n'est donc ni mise en cache comme refus ni comptée
+        # comme un succès par le disjoncteur
+        raise ViesRetryableError(f"HTTP_{status_code}", status_code)
+    return {
+        "valid": (fields["valid"] or "").strip() == "true",
+        "name": fields.get("name"),
+        "address": fields.get("address"),
+        "request_date": fields.get("request_date")
+    }